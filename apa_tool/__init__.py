@@ -0,0 +1,6 @@
+"""
+Engine code shared by the APA Streamlit apps.
+
+Modules in this package must not import Streamlit so they can be used from
+scripts and worker processes as well as from the UI.
+"""
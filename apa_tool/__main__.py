@@ -0,0 +1,5 @@
+import sys
+
+from apa_tool.cli import main
+
+sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+APA 7 reference-list and in-text strings built from reference records.
+
+A reference record is the dict the References Manager edits: a "type" from
+REF_TYPES, "authors" (a list of {"last", "initials", "suffix"} or
+{"is_org": True, "org_name": ...}), "year", "title" and the per-type fields
+read by apa_reference_string.
+"""
+import re
+
+from apa_tool.normalize import author_key, fold
+
+# Bump whenever apa_reference_string (or the keys below) would produce
+# different output for an existing record; stored formatted strings from an
+# older version are then recomputed (see library.ReferenceLibrary).
+FORMATTER_VERSION = 3
+
+REF_TYPES = [
+    "Journal article",
+    "Book",
+    "Book chapter",
+    "Website",
+    "Report / Government document",
+    "Conference paper",
+    "Thesis / Dissertation",
+]
+
+def _strip(s): return (s or "").strip()
+
+def sentence_case(title: str) -> str:
+    t = _strip(title)
+    if not t:
+        return t
+    # simple sentence-case: first char upper, rest lower
+    return t[:1].upper() + t[1:].lower()
+
+def title_case_keep(title: str) -> str:
+    # For journals/books in APA: generally title case; we won't enforce aggressively.
+    return _strip(title)
+
+def normalize_year(y):
+    """
+    Record or scanned year as "2020", "2020a" or "n.d." (also for anything
+    unrecognized). The same-author-same-year suffix is kept so "2020a"
+    matches its own entry.
+    """
+    if isinstance(y, int):
+        return str(y)
+    y = _strip(None if y is None else str(y)).lower()
+    return y if re.fullmatch(r"\d{4}[a-z]?", y) else "n.d."
+
+# Paper fonts offered by both apps and the CLI: "<family> <size>".
+FONT_CHOICES = ["Times New Roman 12", "Calibri 11", "Arial 11"]
+
+def font_from_choice(font_choice: str):
+    """Map a font choice such as "Times New Roman 12" to (name, size_pt)."""
+    if "Times New Roman" in font_choice:
+        return "Times New Roman", 12
+    if "Calibri" in font_choice:
+        return "Calibri", 11
+    return "Arial", 11
+
+def format_author_list_apa(authors):
+    """
+    authors can be dict: {"is_org": True, "org_name": "..."}
+    or list of {"last": "...", "initials": "J. A.", "suffix": ""}
+    """
+    if isinstance(authors, dict) and authors.get("is_org"):
+        return _strip(authors.get("org_name"))
+
+    if not authors:
+        return ""
+
+    formatted = []
+    for a in authors:
+        last = _strip(a.get("last"))
+        initials = _strip(a.get("initials"))
+        suffix = _strip(a.get("suffix"))
+        name = f"{last}, {initials}".strip().strip(",")
+        if suffix:
+            name = f"{name}, {suffix}"
+        formatted.append(name)
+
+    # APA: up to 20 authors; join with commas, ampersand before last
+    if len(formatted) == 1:
+        return formatted[0]
+    if len(formatted) == 2:
+        return f"{formatted[0]}, & {formatted[1]}"
+    return ", ".join(formatted[:-1]) + f", & {formatted[-1]}"
+
+def first_author_key(authors):
+    """Sort key of the first author: folded full surname or organization name."""
+    if isinstance(authors, dict) and authors.get("is_org"):
+        return fold(_strip(authors.get("org_name"))) or "unknown"
+    if not authors:
+        return "unknown"
+    return fold(_strip(authors[0].get("last"))) or "unknown"
+
+def intext_parenthetical(authors, year):
+    y = normalize_year(year)
+    if isinstance(authors, dict) and authors.get("is_org"):
+        org = _strip(authors.get("org_name")) or "Unknown"
+        return f"({org}, {y})"
+    if not authors:
+        return f"(Unknown, {y})"
+    if len(authors) == 1:
+        return f"({_strip(authors[0].get('last')) or 'Unknown'}, {y})"
+    if len(authors) == 2:
+        return f"({_strip(authors[0].get('last')) or 'Unknown'} & {_strip(authors[1].get('last')) or 'Unknown'}, {y})"
+    return f"({_strip(authors[0].get('last')) or 'Unknown'} et al., {y})"
+
+def intext_narrative(authors, year):
+    y = normalize_year(year)
+    if isinstance(authors, dict) and authors.get("is_org"):
+        org = _strip(authors.get("org_name")) or "Unknown"
+        return f"{org} ({y})"
+    if not authors:
+        return f"Unknown ({y})"
+    if len(authors) == 1:
+        return f"{_strip(authors[0].get('last')) or 'Unknown'} ({y})"
+    if len(authors) == 2:
+        return f"{_strip(authors[0].get('last')) or 'Unknown'} and {_strip(authors[1].get('last')) or 'Unknown'} ({y})"
+    return f"{_strip(authors[0].get('last')) or 'Unknown'} et al. ({y})"
+
+def apa_reference_string(ref):
+    """
+    Produces a decent APA 7 reference string for common types.
+    This is not a perfect APA engine (APA has many edge cases),
+    but it's strong enough for real use and easy to refine.
+    """
+    rtype = ref.get("type")
+    authors = ref.get("authors")
+    year = normalize_year(ref.get("year"))
+    title = _strip(ref.get("title"))
+    if ref.get("auto_sentence_case", True):
+        title = sentence_case(title)
+
+    doi = _strip(ref.get("doi"))
+    url = _strip(ref.get("url"))
+
+    author_str = format_author_list_apa(authors)
+    base = f"{author_str} ({year}). {title}."
+
+    if rtype == "Journal article":
+        journal = title_case_keep(ref.get("journal"))
+        volume = _strip(ref.get("volume"))
+        issue = _strip(ref.get("issue"))
+        pages = _strip(ref.get("pages"))
+        issue_part = f"({issue})" if issue else ""
+        jpart = f" {journal}, {volume}{issue_part}, {pages}."
+        tail = f" {doi}" if doi else (f" {url}" if url else "")
+        return (base + jpart + tail).replace("..", ".").strip()
+
+    if rtype == "Book":
+        publisher = _strip(ref.get("publisher"))
+        edition = _strip(ref.get("edition"))
+        ed_part = f" ({edition} ed.)." if edition else ""
+        tail = f" {doi}" if doi else (f" {url}" if url else "")
+        return f"{author_str} ({year}). {title}.{ed_part} {publisher}.{tail}".replace("..", ".").strip()
+
+    if rtype == "Book chapter":
+        chapter_title = title
+        book_title = title_case_keep(ref.get("book_title"))
+        editors = ref.get("editors") or []
+        editors_str = format_author_list_apa(editors)
+        pages = _strip(ref.get("pages"))
+        publisher = _strip(ref.get("publisher"))
+        tail = f" {doi}" if doi else (f" {url}" if url else "")
+        # Simplified: In E. E. Editor (Ed.), Book title (pp. x–y). Publisher.
+        ed_label = "(Ed.)" if len(editors) == 1 else "(Eds.)" if len(editors) > 1 else ""
+        in_part = f"In {editors_str} {ed_label}, {book_title}"
+        if pages:
+            in_part += f" (pp. {pages})"
+        in_part += f". {publisher}."
+        return f"{author_str} ({year}). {chapter_title}. {in_part}{tail}".replace("..", ".").strip()
+
+    if rtype == "Website":
+        site = _strip(ref.get("site_name"))
+        use_ret = bool(ref.get("use_retrieval_date"))
+        retrieval_date = _strip(ref.get("retrieval_date"))
+        ret_part = f" Retrieved {retrieval_date}," if (use_ret and retrieval_date) else ""
+        tail = url or doi
+        tail = f" {tail}" if tail else ""
+        # If author same as site, APA sometimes omits site; we won't overdo it in v1.
+        return f"{author_str} ({year}). {title}. {site}.{ret_part}{tail}".replace("..", ".").strip()
+
+    if rtype == "Report / Government document":
+        publisher = _strip(ref.get("publisher"))
+        report_no = _strip(ref.get("report_number"))
+        rep_part = f" (Report No. {report_no})." if report_no else ""
+        tail = f" {url}" if url else (f" {doi}" if doi else "")
+        return f"{author_str} ({year}). {title}.{rep_part} {publisher}.{tail}".replace("..", ".").strip()
+
+    if rtype == "Conference paper":
+        conf = _strip(ref.get("conference_name"))
+        loc = _strip(ref.get("conference_location"))
+        loc_part = f", {loc}" if loc else ""
+        tail = f" {url}" if url else (f" {doi}" if doi else "")
+        return f"{author_str} ({year}). {title}. {conf}{loc_part}.{tail}".replace("..", ".").strip()
+
+    if rtype == "Thesis / Dissertation":
+        uni = _strip(ref.get("university"))
+        ttype = _strip(ref.get("thesis_type")) or "Dissertation"
+        tail = f" {url}" if url else ""
+        return f"{author_str} ({year}). {title} [{ttype}, {uni}].{tail}".replace("..", ".").strip()
+
+    tail = f" {doi}" if doi else (f" {url}" if url else "")
+    return (base + tail).replace("..", ".").strip()
+
+def reference_key_guess(ref):
+    """
+    Makes a simple key that matches the scan logic:
+    - first author's last name (or org), as normalize.author_key
+    - year
+    """
+    return (author_key(first_author_name(ref.get("authors"))), normalize_year(ref.get("year")))
+
+def first_author_name(authors) -> str:
+    """First author's last name or the organization name, as entered ("" if none)."""
+    if isinstance(authors, dict) and authors.get("is_org"):
+        return _strip(authors.get("org_name"))
+    if isinstance(authors, list) and authors:
+        return _strip(authors[0].get("last"))
+    return ""
@@ -0,0 +1,103 @@
+"""
+Content-hash keyed cache of parsed uploads.
+
+Streamlit re-runs the whole script on every interaction, so without this
+each "Run" / "Scan" click re-parses the same .docx bytes. Entries are keyed
+by the SHA-256 of the upload, evicted least-recently-used, and bounded both
+by entry count and by an approximate total size in bytes.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+# paragraphs:     tuple of reader.StreamParagraph(text, style_id, story), one
+#                 per paragraph of every story (reader.iter_paragraphs order)
+# references_idx: index of the "References" heading paragraph, or None
+# citations:      tuple of checker.Citation, in document order
+# nbytes:         approximate memory held by the entry
+ParsedUpload = namedtuple(
+    "ParsedUpload", ["paragraphs", "references_idx", "citations", "nbytes"]
+)
+
+def content_hash(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def estimate_nbytes(paragraphs, citations=()) -> int:
+    """Rough size of an entry: the paragraph records plus the citations."""
+    n = sys.getsizeof(paragraphs) + sys.getsizeof(citations)
+    for p in paragraphs:
+        n += sys.getsizeof(p) + sys.getsizeof(p.text)
+    for c in citations:
+        # Key strings repeat across citations; count the record and span only.
+        n += sys.getsizeof(c) + sys.getsizeof(c.key) + sys.getsizeof(c.span)
+    return n
+
+def make_parsed_upload(paragraphs, references_idx, citations):
+    paragraphs = tuple(paragraphs)
+    nbytes = estimate_nbytes(paragraphs, citations)
+    return ParsedUpload(paragraphs, references_idx, citations, nbytes)
+
+class ParseCache:
+    """
+    LRU map of content hash -> ParsedUpload.
+
+    Safe to share between Streamlit sessions (hold it in st.cache_resource):
+    the key is derived from the bytes themselves and entries are immutable.
+    """
+
+    def __init__(self, max_entries=32, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def get(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return entry
+
+    def put(self, digest, entry):
+        with self._lock:
+            old = self._entries.pop(digest, None)
+            if old is not None:
+                self._total_bytes -= old.nbytes
+            if entry.nbytes > self.max_bytes:
+                # Never cache something that would evict everything else.
+                return
+            self._entries[digest] = entry
+            self._total_bytes += entry.nbytes
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.nbytes
+
+    def get_or_parse(self, data, parse):
+        """Return the cached entry for `data`, calling `parse(data)` on a miss."""
+        digest = content_hash(data)
+        entry = self.get(digest)
+        if entry is None:
+            entry = parse(data)
+            self.put(digest, entry)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
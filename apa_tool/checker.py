@@ -0,0 +1,163 @@
+"""
+Citation and reference-list checking on plain paragraph text.
+
+Everything here works on strings or on any paragraph-like object with a
+`.text` attribute (python-docx paragraphs or reader.StreamParagraph), so it
+runs without building a python-docx Document. Paragraphs without a `.story`
+count as body text.
+"""
+import re
+from collections import namedtuple
+
+from apa_tool.apa_format import normalize_year
+from apa_tool.normalize import PARTICLES, author_key, fold
+from apa_tool.reader import BODY
+
+# -----------------------------
+# Citation detection (best-effort)
+# -----------------------------
+# A capitalized surname: Latin letters with diacritics (precomposed or
+# followed by combining marks), apostrophes and hyphens ("Müller",
+# "O’Brien", "Smith‐Jones"). Folded into a key by normalize.author_key.
+NAME_START = "A-ZÀ-ÖØ-ÞĀ-ž"
+NAME_CHARS = "A-Za-zÀ-ÖØ-öø-ÿĀ-ž\u0300-\u036f’'ʼ\\-‐‑"
+SURNAME = f"[{NAME_START}][{NAME_CHARS}]+"
+
+# Parenthetical "(Smith & Lee, 2020)" and narrative "Smith (2020)" as one
+# alternation so a paragraph is scanned once. The two never overlap: a
+# parenthetical match contains no inner parentheses and a narrative "(year)"
+# contains no comma.
+CITATION_RE = re.compile(
+    r"(?P<paren>\((?P<authors>[^()]+?),\s*(?P<pyear>\d{4}[a-z]?|n\.d\.)\))"
+    rf"|(?P<narr>\b(?P<author>{SURNAME})\s*\((?P<nyear>\d{{4}}[a-z]?|n\.d\.)\))"
+)
+
+# Lowercase surname prefixes written before the capitalized part of a
+# reference entry's first author ("van Dijk, J.", "de la Cruz, M.").
+PARTICLE_PREFIX = "(?:(?:" + "|".join(sorted(PARTICLES, key=len, reverse=True)) + r")\s+)*"
+
+_ENTRY_AUTHOR_RE = re.compile(rf"^{PARTICLE_PREFIX}({SURNAME}),\s")
+_ENTRY_START_RE = re.compile(rf"^{PARTICLE_PREFIX}[{NAME_START}]")
+
+PARENTHETICAL = "parenthetical"
+NARRATIVE = "narrative"
+
+# kind:            PARENTHETICAL or NARRATIVE
+# key:             (first-author token, year), as used by the reference check
+# paragraph_index: index into the paragraph sequence that was scanned
+# span:            (start, end) character offsets within that paragraph's text
+Citation = namedtuple("Citation", ["kind", "key", "paragraph_index", "span"])
+
+def first_author_of(authors: str) -> str:
+    """First author of a parenthetical author list ("Lee & Kim", "Lee et al.")."""
+    first = authors.split("&")[0]
+    first = first.split(" and ")[0]
+    return first.split("et al.")[0]
+
+def scan_text_citations(text: str, paragraph_index=0):
+    """Yield a Citation for every parenthetical and narrative match in `text`."""
+    for m in CITATION_RE.finditer(text):
+        if m.group("paren") is not None:
+            kind = PARENTHETICAL
+            key = (author_key(first_author_of(m.group("authors"))), normalize_year(m.group("pyear")))
+        else:
+            kind = NARRATIVE
+            key = (author_key(m.group("author")), normalize_year(m.group("nyear")))
+        yield Citation(kind, key, paragraph_index, m.span())
+
+def iter_citations(paragraphs):
+    """Single pass over paragraph-like objects (anything with `.text`)."""
+    for i, p in enumerate(paragraphs):
+        yield from scan_text_citations(p.text, i)
+
+def extract_intext_citations(all_text: str):
+    return {c.key for c in scan_text_citations(all_text)}
+
+# -----------------------------
+# References section parsing (best-effort)
+# -----------------------------
+def is_body(p) -> bool:
+    """Main text flow, not a table cell, text box, header/footer or note."""
+    return getattr(p, "story", BODY) == BODY
+
+def find_references_start(paragraphs):
+    for i, p in enumerate(paragraphs):
+        if p.text.strip().lower() == "references" and is_body(p):
+            return i
+    return None
+
+def reference_paragraphs(paragraphs, references_idx):
+    """The body paragraphs after the References heading (what split_reference_entries reads)."""
+    return [p for p in paragraphs[references_idx + 1 :] if is_body(p)]
+
+def split_reference_entries(ref_paragraphs):
+    entries = []
+    current = ""
+
+    def looks_like_new_entry(t: str) -> bool:
+        t = t.strip()
+        if not t:
+            return False
+        if _ENTRY_AUTHOR_RE.match(t):
+            return True
+        if _ENTRY_START_RE.match(t) and re.search(r"\(\s*(\d{4}[a-z]?|n\.d\.)\s*\)", t[:80]):
+            return True
+        return False
+
+    for p in ref_paragraphs:
+        t = p.text.strip()
+        if not t:
+            continue
+        if looks_like_new_entry(t):
+            if current:
+                entries.append(current.strip())
+            current = t
+        else:
+            current = (current + " " + t).strip()
+
+    if current:
+        entries.append(current.strip())
+
+    return entries
+
+def extract_reference_keys(reference_entries):
+    keys = set()
+    detailed = []
+
+    for entry in reference_entries:
+        ym = re.search(r"\(\s*(\d{4}[a-z]?|n\.d\.)\s*\)", entry)
+        year = normalize_year(ym.group(1) if ym else "n.d.")
+
+        # "Smith, J. (2020)", "van Dijk, J. (2020)" or "Organization. (2020)"
+        k = (author_key(entry.split("(", 1)[0]), year)
+        keys.add(k)
+        detailed.append({"entry": entry, "key": k})
+
+    return keys, detailed
+
+def sort_reference_entries_apa(reference_entries):
+    """
+    Sort APA references alphabetically by:
+    - first author last name
+    - organization name if no author
+    - year as secondary key
+    """
+    def sort_key(entry):
+        entry = entry.strip()
+
+        # Author surname at start: "Smith, J." or "van Dijk, J." (filed
+        # under the surname proper, as author_key does)
+        m = _ENTRY_AUTHOR_RE.match(entry)
+        if m:
+            author = fold(m.group(1))
+        else:
+            # Organization author fallback
+            author = "".join(filter(str.isalpha, fold(entry.split("(")[0])))
+
+        # Year
+        ym = re.search(r"\(\s*(\d{4}[a-z]?|n\.d\.)\s*\)", entry)
+        year = ym.group(1) if ym else "n.d."
+
+        return (author, year)
+
+    return sorted(reference_entries, key=sort_key)
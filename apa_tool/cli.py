@@ -0,0 +1,175 @@
+"""
+Headless batch interface: ``python -m apa_tool check|format ...``.
+
+Each input file is handled in its own worker process (one per core by
+default) and a JSON object per file is written to stdout as soon as that file
+finishes, so results can be piped into jq or a spreadsheet while a large
+batch is still running.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Only the Streamlit-free, python-docx-free constants at import time; the
+# workers import the check / format engine when they run.
+from apa_tool.apa_format import FONT_CHOICES
+
+def expand_inputs(paths):
+    """Files are taken as-is; directories contribute their *.docx files."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.lower().endswith(".docx") and not name.startswith("~$")
+            )
+        else:
+            files.append(path)
+    return files
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def check_file(path):
+    from apa_tool.pipeline import check_parsed, parse_upload
+
+    parsed = parse_upload(_read_bytes(path))
+    report = check_parsed(parsed)
+    if report is None:
+        return {"file": path, "references_found": False, "cited_count": len({c.key for c in parsed.citations})}
+    return {
+        "file": path,
+        "references_found": True,
+        "cited_count": report["cited_count"],
+        "ref_count": report["ref_count"],
+        "cited_not_in_refs": report["cited_not_in_refs"],
+        "refs_not_cited": report["refs_not_cited"],
+        "suggestions": report["suggestions"],
+    }
+
+def unique_names(names):
+    """Upload names, numbered where they repeat ("paper.docx", "paper (2).docx")."""
+    seen = set()
+    unique = []
+    for name in names:
+        stem, ext = os.path.splitext(os.path.basename(name))
+        candidate, n = f"{stem}{ext}", 1
+        while candidate.lower() in seen:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+        seen.add(candidate.lower())
+        unique.append(candidate)
+    return unique
+
+def output_name(path):
+    """File name format_file writes for `path` ("paper.docx" -> "paper_APA_formatted.docx")."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return f"{stem}_APA_formatted.docx"
+
+def output_collisions(files):
+    """
+    {output name: input paths} for inputs that format_file would write to
+    the same file ("a/paper.docx" and "b/paper.docx"). Names are compared
+    case-insensitively, as on Windows and macOS file systems.
+    """
+    by_name = {}
+    for path in files:
+        by_name.setdefault(output_name(path).lower(), []).append(path)
+    return {output_name(paths[0]): paths for paths in by_name.values() if len(paths) > 1}
+
+def format_file(path, out_dir, font_choice, add_pnums, format_refs, also_check, use_styles=False):
+    from apa_tool.pipeline import format_docx_to
+
+    out_path = os.path.join(out_dir, output_name(path))
+    refs_rebuilt, report = format_docx_to(
+        _read_bytes(path), out_path, font_choice=font_choice, add_pnums=add_pnums, format_refs=format_refs,
+        use_styles=use_styles, check=also_check,
+    )
+
+    result = {"file": path, "output": out_path, "references_formatted": refs_rebuilt}
+    if also_check and report is None:
+        result["references_found"] = False
+    if report is not None:
+        result["cited_not_in_refs"] = report["cited_not_in_refs"]
+        result["refs_not_cited"] = report["refs_not_cited"]
+        result["suggestions"] = report["suggestions"]
+    return result
+
+def submit_files(pool, fn, files, *args):
+    """{future: path} for `fn(path, *args)` submitted to `pool` for every file."""
+    return {pool.submit(fn, path, *args): path for path in files}
+
+def iter_finished(futures):
+    """Each file's result as it finishes; a failed file yields {"file", "error"}."""
+    for fut in as_completed(futures):
+        try:
+            yield fut.result()
+        except Exception as e:
+            yield {"file": futures[fut], "error": f"{type(e).__name__}: {e}"}
+
+def iter_pool(fn, files, workers, *args, mp_context=None):
+    """
+    Fan `fn(path, *args)` out over a process pool of its own and yield each
+    file's result as it finishes; a failed file yields {"file", "error"}.
+    """
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+        yield from iter_finished(submit_files(pool, fn, files, *args))
+
+def run_pool(fn, files, workers, *args, out=sys.stdout):
+    """iter_pool, emitting JSON lines as files finish; returns the number of failures."""
+    failures = 0
+    for result in iter_pool(fn, files, workers, *args):
+        failures += "error" in result
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+    return failures
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="apa-tool", description="Batch APA checking and formatting for .docx files.")
+    parser.add_argument("-j", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU core)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    check = sub.add_parser("check", help="report citations missing from / never cited in References")
+    check.add_argument("inputs", nargs="+", help=".docx files or directories")
+
+    fmt = sub.add_parser("format", help="write APA-formatted copies into an output directory")
+    fmt.add_argument("inputs", nargs="+", help=".docx files or directories")
+    fmt.add_argument("out_dir", help="directory for the formatted files")
+    fmt.add_argument("--font", default=FONT_CHOICES[0], choices=FONT_CHOICES)
+    fmt.add_argument("--no-page-numbers", action="store_true", help="don't add page numbers (top-right)")
+    fmt.add_argument("--no-format-refs", action="store_true", help="don't rebuild the References section")
+    fmt.add_argument("--check", action="store_true", help="also include the citation check in each result")
+    fmt.add_argument("--styles", action="store_true",
+                     help='use "APA Body"/"APA Reference" paragraph styles instead of direct formatting')
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("apa-tool: no .docx files found", file=sys.stderr)
+        return 2
+    workers = args.workers or os.cpu_count() or 1
+
+    if args.command == "check":
+        failures = run_pool(check_file, files, workers)
+    else:
+        # Workers write their outputs concurrently; two inputs with one
+        # output name would overwrite each other.
+        collisions = output_collisions(files)
+        if collisions:
+            for name, paths in collisions.items():
+                print(f"apa-tool: {', '.join(paths)} would be written to the same file, {name}", file=sys.stderr)
+            print("apa-tool: rename the inputs or format them in separate runs", file=sys.stderr)
+            return 2
+        os.makedirs(args.out_dir, exist_ok=True)
+        failures = run_pool(
+            format_file, files, workers,
+            args.out_dir, args.font, not args.no_page_numbers, not args.no_format_refs, args.check, args.styles,
+        )
+    return 1 if failures else 0
@@ -0,0 +1,227 @@
+"""
+Duplicate detection for the reference library.
+
+Records are grouped without comparing every pair:
+
+- exact: same DOI, or the same normalized title (hashed) for the same first
+  author and year. These are plain dict buckets.
+- near: candidate pairs come from MinHash/LSH over the title's word
+  shingles (titles sharing most of their words land in a common band
+  bucket) and from a (folded first author, base year) block. Only
+  candidates are compared, on the exact Jaccard similarity of their
+  shingle sets.
+
+Pairs are joined into groups (union-find), so three copies of a record
+are one suggestion. Buckets and blocks bigger than MAX_BUCKET are not
+expanded into pairs; a huge bucket is a common title word or a prolific
+author, not a duplicate.
+
+Nearly every bucket holds a single record, so buckets are keyed by hashes
+and strings and hold a bare id until a second one arrives: the scan leaves
+few long-lived containers for the garbage collector to walk.
+"""
+import hashlib
+import itertools
+import re
+import unicodedata
+import zlib
+
+from apa_tool.matching import base_year, fold_surname
+
+# Near-duplicate titles must share at least this share of their shingles.
+NEAR_THRESHOLD = 0.7
+
+# LSH bands. Each band is a bottom-BAND_ROWS MinHash sketch under its own
+# permutation of the shingle hashes: two titles share a band when the
+# BAND_ROWS smallest hashes of their union are in both, which happens with
+# about Jaccard**BAND_ROWS probability (like BAND_ROWS one-value MinHash
+# rows, for one sort instead of BAND_ROWS separate minimums).
+NUM_BANDS = 12
+BAND_ROWS = 4
+
+MAX_BUCKET = 100
+
+_STOPWORDS = frozenset("a an and are as at by for from in into is of on or the to with".split())
+
+# One 32-bit XOR mask per band (a cheap stand-in for a random permutation).
+_MASKS = [zlib.crc32(f"minhash-{i}".encode()) for i in range(NUM_BANDS)]
+
+REASON_LABELS = {"doi": "same DOI", "title": "same title", "similar": "similar title"}
+
+def normalize_title(title: str) -> str:
+    """Folded, punctuation-free title: "The Self-Report: A Study." -> "the self report a study"."""
+    s = unicodedata.normalize("NFKD", title or "").encode("ascii", "ignore").decode("ascii").lower()
+    return " ".join(re.findall(r"[a-z0-9]+", s.replace("&", " and ")))
+
+def title_hash(normalized: str) -> bytes:
+    return hashlib.blake2b(normalized.encode(), digest_size=8).digest()
+
+def doi_key(doi: str) -> str:
+    """DOIs are case-insensitive; compare them without resolver prefixes."""
+    doi = (doi or "").strip().lower()
+    if not doi:
+        return ""
+    return re.sub(r"^(doi:\s*|https?://(dx\.)?doi\.org/)", "", doi)
+
+def shingles(normalized: str):
+    """Title word shingles (stopwords dropped unless nothing else is left)."""
+    words = normalized.split()
+    return frozenset(w for w in words if w not in _STOPWORDS) or frozenset(words)
+
+def shingle_hashes(shingle: str):
+    """The shingle's hash under every band's permutation."""
+    h = zlib.crc32(shingle.encode())
+    return tuple(h ^ mask for mask in _MASKS)
+
+class ShingleHashes(dict):
+    """shingle -> shingle_hashes(shingle), computed once per distinct shingle."""
+    def __missing__(self, shingle):
+        hashes = self[shingle] = shingle_hashes(shingle)
+        return hashes
+
+def minhash_bands(shingle_set, memo=None):
+    """LSH band keys of a non-empty shingle set, one per band."""
+    if memo is None:
+        memo = ShingleHashes()
+    return [hash(tuple(sorted(band)[:BAND_ROWS])) for band in zip(*map(memo.__getitem__, shingle_set))]
+
+def jaccard(a, b) -> float:
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+# A candidate bucket that outgrew MAX_BUCKET.
+_OVERFLOW = ()
+
+def _add(buckets, key, ref_id):
+    """
+    Candidate bucket members: a bare id until a second one arrives, then a
+    tuple of ids (which the garbage collector soon stops tracking), then
+    _OVERFLOW past MAX_BUCKET members.
+    """
+    first = buckets.setdefault(key, ref_id)
+    if first == ref_id or first is _OVERFLOW:
+        return
+    if type(first) is not tuple:
+        buckets[key] = (first, ref_id)
+    elif len(first) < MAX_BUCKET:
+        buckets[key] = first + (ref_id,)
+    else:
+        buckets[key] = _OVERFLOW
+
+def _shared(buckets):
+    """Candidate buckets with between two and MAX_BUCKET members."""
+    return (ids for ids in buckets.values() if type(ids) is tuple and ids)
+
+def find_duplicates(rows, threshold=NEAR_THRESHOLD):
+    """
+    Duplicate groups among library rows (id, author_key, year, title, doi),
+    given in list order.
+
+    Returns [{"ids", "reason", "score"}] with ids in list order, reason the
+    strongest link in the group ("doi", "title" or "similar") and score the
+    weakest link's title similarity (1.0 for exact duplicates). Groups are
+    sorted by score, best first.
+    """
+    order = {}
+    parent = {}
+    links = {}  # root -> (reasons, min score)
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(a, b, reason, score):
+        ra, rb = find(a), find(b)
+        reasons, low = links.pop(ra, (set(), 1.0))
+        if ra != rb:
+            other_reasons, other_low = links.pop(rb, (set(), 1.0))
+            reasons |= other_reasons
+            low = min(low, other_low)
+            parent[rb] = ra
+        reasons.add(reason)
+        links[ra] = (reasons, min(low, score))
+
+    firsts = {}  # DOI or title hash -> first id with it
+    lsh = [{} for _ in range(NUM_BANDS)]
+    blocks = {}
+    authors, years, titles = {}, {}, {}
+    folded_authors = {}
+    memo = ShingleHashes()  # titles share most of their words
+    for ref_id, author_key, year, title, doi in rows:
+        order[ref_id] = len(order)
+        parent[ref_id] = ref_id
+        folded = folded_authors.get(author_key)
+        if folded is None:
+            folded = folded_authors[author_key] = fold_surname(author_key)
+        normalized = normalize_title(title)
+        # Exact duplicates join the first record with their key, however many there are.
+        doi = doi_key(doi)
+        if doi:
+            first = firsts.setdefault(doi, ref_id)
+            if first != ref_id:
+                union(first, ref_id, "doi", 1.0)
+        if not normalized:
+            continue
+        first = firsts.setdefault(title_hash(f"{folded}\0{year}\0{normalized}"), ref_id)
+        if first != ref_id:
+            union(first, ref_id, "title", 1.0)
+        # Near-duplicate candidates: LSH band buckets and author/year blocks.
+        for band, key in zip(lsh, minhash_bands(shingles(normalized), memo)):
+            _add(band, key, ref_id)
+        year = base_year(year)
+        if folded:
+            _add(blocks, f"{folded}\0{year}", ref_id)
+        authors[ref_id], years[ref_id], titles[ref_id] = folded, year, normalized
+    del memo, firsts
+
+    shingle_sets = {}  # of the records that turn out to be candidates
+    seen = {}  # not a set: the collector skips dicts that hold only ints
+    for ids in itertools.chain(_shared(blocks), *map(_shared, lsh)):
+        for i, a in enumerate(ids):
+            for b in ids[i + 1 :]:
+                pair = order[a] << 32 | order[b]
+                if pair in seen:
+                    continue
+                seen[pair] = None
+                if find(a) == find(b):
+                    continue
+                # Similar titles alone are not enough ("Introduction"); the
+                # author or the year has to agree too.
+                if authors[a] != authors[b] and years[a] != years[b]:
+                    continue
+                for ref_id in (a, b):
+                    if ref_id not in shingle_sets:
+                        shingle_sets[ref_id] = shingles(titles[ref_id])
+                score = jaccard(shingle_sets[a], shingle_sets[b])
+                if score >= threshold:
+                    union(a, b, "similar", round(score, 3))
+
+    # Every root with links heads a group of two or more.
+    members = {root: [] for root in links}
+    for ref_id in order:
+        root = find(ref_id)
+        if root in members:
+            members[root].append(ref_id)
+    groups = []
+    for root, ids in members.items():
+        reasons, low = links[root]
+        reason = next(r for r in ("doi", "title", "similar") if r in reasons)
+        groups.append({"ids": ids, "reason": reason, "score": low})
+    groups.sort(key=lambda g: (-g["score"], order[g["ids"][0]]))
+    return groups
+
+def _is_empty(value):
+    return value in (None, "", [], {}) or (isinstance(value, dict) and not value.get("org_name"))
+
+def merge_records(records):
+    """
+    One record from duplicates: the first record, with fields it leaves
+    empty filled from the others (in order).
+    """
+    merged = dict(records[0])
+    for other in records[1:]:
+        for field, value in other.items():
+            if _is_empty(merged.get(field)) and not _is_empty(value):
+                merged[field] = value
+    return merged
@@ -0,0 +1,324 @@
+"""
+python-docx formatting passes used by the Format pipeline.
+
+This module and index.py are the only engine modules that import
+python-docx; the check path (reader, checker, report, pipeline.parse_upload)
+and the CLI load without it.
+"""
+from copy import deepcopy
+
+from docx import Document
+from docx.shared import Inches, Pt
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from apa_tool.apa_format import font_from_choice
+from apa_tool.checker import reference_paragraphs, sort_reference_entries_apa, split_reference_entries
+from apa_tool.index import DocumentIndex
+from apa_tool.reader import BODY, TABLE
+from apa_tool.timing import timed
+
+# -----------------------------
+# DOCX formatting helpers
+# -----------------------------
+def truncate_body_after(paragraph):
+    """
+    Remove every block (paragraphs, tables, ...) that follows `paragraph` in
+    the document body, in one slice deletion. The body's trailing
+    ``w:sectPr`` (page size, margins, headers) is kept.
+    """
+    p = paragraph._element
+    body = p.getparent()
+    while body.tag != qn("w:body"):
+        # A paragraph inside a content control: cut after the whole control.
+        p, body = body, body.getparent()
+    end = len(body)
+    if end and body[end - 1].tag == qn("w:sectPr"):
+        end -= 1
+    del body[body.index(p) + 1 : end]
+
+def _reference_paragraph_template(style_id=None):
+    """
+    An empty ``w:p`` for one reference entry: either APA hanging indent and
+    double spacing as direct formatting, or just a ``w:pStyle`` reference to
+    `style_id` (see ensure_apa_reference_style).
+    """
+    p = OxmlElement("w:p")
+    if style_id is not None:
+        p.style = style_id
+        return p
+    template = Paragraph(p, None)
+    template.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    template.paragraph_format.line_spacing = 2.0
+    template.paragraph_format.left_indent = Inches(0.5)
+    template.paragraph_format.first_line_indent = Inches(-0.5)
+    return p
+
+def append_reference_paragraphs(doc: Document, entries, style_id=None):
+    """
+    Append one hanging-indent paragraph per entry at the end of the body.
+
+    Each paragraph is a deep copy of a single prebuilt template, and all of
+    them are attached in one ``extend`` rather than one ``add_paragraph`` and
+    four property writes per entry.
+    """
+    body = doc.element.body
+    template = _reference_paragraph_template(style_id)
+    new_ps = []
+    for entry in entries:
+        p = deepcopy(template)
+        r = OxmlElement("w:r")
+        r.text = entry
+        p.append(r)
+        new_ps.append(p)
+
+    sect_pr = body.sectPr
+    body.extend(new_ps)
+    if sect_pr is not None:
+        # extend() put the entries after sectPr; move it back to the end.
+        body.append(sect_pr)
+    return new_ps
+
+def rebuild_references_section_sorted(doc: Document, use_styles=False, index=None):
+    """
+    Rebuilds the References section:
+    - Alphabetizes entries
+    - Applies APA hanging indent + double spacing (directly, or through the
+      "APA Reference" paragraph style when use_styles is set)
+    """
+    if index is None:
+        index = DocumentIndex(doc)
+    idx = index.references_idx
+    if idx is None:
+        return False
+
+    # Extract reference paragraphs
+    raw_entries = split_reference_entries(reference_paragraphs(index.paragraphs, idx))
+
+    if not raw_entries:
+        return False
+
+    # Sort alphabetically
+    sorted_entries = sort_reference_entries_apa(raw_entries)
+
+    # Drop everything after the heading, then reinsert sorted references
+    heading = index.elements[idx]
+    truncate_body_after(heading)
+    style_id = ensure_apa_reference_style(doc).style_id if use_styles else None
+    new_ps = append_reference_paragraphs(doc, sorted_entries, style_id=style_id)
+    index.replace_tail(idx + 1, new_ps, sorted_entries, style_id)
+
+    # Format heading
+    heading.text = "References"
+    index.set_text(idx, "References")
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    heading.paragraph_format.line_spacing = 2.0
+    # Explicit zero: with no value the heading inherits its style's indent
+    # ("APA Body" has a 0.5" first line) and is pushed off-center.
+    heading.paragraph_format.first_line_indent = Inches(0)
+    heading.paragraph_format.left_indent = None
+
+    return True
+
+def rebuild_references_section(doc: Document, formatted_refs, use_styles=False, index=None):
+    """
+    Replace the References section with already formatted (and ordered)
+    entries, adding the heading on a new page if the document has none.
+    With use_styles the entries get the "APA Reference" paragraph style
+    instead of direct formatting.
+    """
+    if index is None:
+        index = DocumentIndex(doc)
+    idx = index.references_idx
+
+    # If a References heading exists, delete everything after it to the end
+    if idx is not None:
+        heading_p = index.elements[idx]
+        truncate_body_after(heading_p)
+        index.replace_tail(idx + 1, [], [])
+        heading_p.style = doc.styles["Normal"]
+        heading_p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        heading_p.text = "References"
+        index.set_style(idx, heading_p._p.style)
+        index.set_text(idx, "References")
+    else:
+        # Add at end
+        pb = doc.add_page_break()
+        hp = doc.add_paragraph("References")
+        hp.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        hp.paragraph_format.line_spacing = 2.0
+        index.replace_tail(index.body_end, [pb._p, hp._p], [pb.text, hp.text])
+
+    # hanging indent + double spacing, appended in bulk after the heading
+    style_id = ensure_apa_reference_style(doc).style_id if use_styles else None
+    new_ps = append_reference_paragraphs(doc, formatted_refs, style_id=style_id)
+    index.replace_tail(index.body_end, new_ps, formatted_refs, style_id)
+
+def set_document_margins(doc: Document, inches=1.0):
+    for section in doc.sections:
+        section.top_margin = Inches(inches)
+        section.bottom_margin = Inches(inches)
+        section.left_margin = Inches(inches)
+        section.right_margin = Inches(inches)
+
+def set_default_font(doc: Document, font_name: str, font_size_pt: int):
+    style = doc.styles["Normal"]
+    style.font.name = font_name
+    style.font.size = Pt(font_size_pt)
+    style._element.rPr.rFonts.set(qn("w:eastAsia"), font_name)
+
+def add_page_number_top_right(doc: Document):
+    for section in doc.sections:
+        header = section.header
+        p = header.paragraphs[0] if header.paragraphs else header.add_paragraph()
+        p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+
+        # Clear existing runs
+        for r in list(p.runs):
+            r.text = ""
+
+        run = p.add_run()
+        fldChar1 = OxmlElement("w:fldChar")
+        fldChar1.set(qn("w:fldCharType"), "begin")
+
+        instrText = OxmlElement("w:instrText")
+        instrText.set(qn("xml:space"), "preserve")
+        instrText.text = " PAGE "
+
+        fldChar2 = OxmlElement("w:fldChar")
+        fldChar2.set(qn("w:fldCharType"), "end")
+
+        run._r.append(fldChar1)
+        run._r.append(instrText)
+        run._r.append(fldChar2)
+
+def apply_body_paragraph_formatting(doc: Document, double_space=True, first_line_indent_in=0.5, index=None):
+    """
+    Body paragraphs get double spacing and a first-line indent; table cells
+    only the spacing. Text boxes (fixed-size frames), headers, footers and
+    notes are left alone.
+    """
+    if index is None:
+        index = DocumentIndex(doc)
+    for p, rec, style_name in zip(index.elements, index.paragraphs, index.style_names):
+        if rec.story != BODY and rec.story != TABLE:
+            continue
+
+        # Double spacing everywhere by default
+        if double_space:
+            p.paragraph_format.line_spacing = 2.0
+
+        # Indent body paragraphs but avoid headings
+        if rec.story == BODY and "Heading" not in style_name and rec.text.strip():
+            p.paragraph_format.first_line_indent = Inches(first_line_indent_in)
+
+# -----------------------------
+# Style-based formatting
+# -----------------------------
+# Instead of writing spacing/indent into every paragraph's pPr, define the
+# APA paragraph formats once in styles.xml and point paragraphs at them.
+# Smaller document.xml, a faster pass and save, and the user can restyle the
+# whole paper from Word's Styles pane.
+APA_BODY_STYLE = "APA Body"
+APA_REFERENCE_STYLE = "APA Reference"
+
+def _get_or_add_paragraph_style(doc: Document, name: str):
+    styles = doc.styles
+    if name in styles:
+        return styles[name]
+    style = styles.add_style(name, WD_STYLE_TYPE.PARAGRAPH)
+    style.base_style = styles.default(WD_STYLE_TYPE.PARAGRAPH)
+    style.quick_style = True
+    return style
+
+def ensure_apa_body_style(doc: Document, double_space=True, first_line_indent_in=0.5):
+    """Define (or update) the "APA Body" paragraph style and return it."""
+    style = _get_or_add_paragraph_style(doc, APA_BODY_STYLE)
+    style.paragraph_format.line_spacing = 2.0 if double_space else None
+    style.paragraph_format.first_line_indent = Inches(first_line_indent_in)
+    return style
+
+def ensure_apa_reference_style(doc: Document):
+    """Define (or update) the "APA Reference" paragraph style and return it."""
+    style = _get_or_add_paragraph_style(doc, APA_REFERENCE_STYLE)
+    style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    style.paragraph_format.line_spacing = 2.0
+    style.paragraph_format.left_indent = Inches(0.5)
+    style.paragraph_format.first_line_indent = Inches(-0.5)
+    return style
+
+def apply_body_paragraph_styles(doc: Document, double_space=True, first_line_indent_in=0.5, index=None):
+    """
+    Style-based equivalent of apply_body_paragraph_formatting.
+
+    Paragraphs in the default (Normal) style are switched to "APA Body" and
+    any direct spacing/first-line indent on them is dropped so the style
+    wins. Paragraphs with some other style (headings, lists, quotes) keep it
+    and get the same direct formatting as before. Empty paragraphs, the
+    References heading and table cells keep their style and get direct
+    double spacing only, as in apply_body_paragraph_formatting.
+    """
+    body_style = ensure_apa_body_style(doc, double_space, first_line_indent_in)
+    if index is None:
+        index = DocumentIndex(doc)
+    body_id = body_style.style_id
+
+    for i, (p, rec) in enumerate(zip(index.elements, index.paragraphs)):
+        if rec.story != BODY:
+            if rec.story == TABLE and double_space:
+                p.paragraph_format.line_spacing = 2.0
+            continue
+
+        style_id = rec.style_id
+        indented = i != index.references_idx and rec.text.strip()
+        if indented and (style_id is None or style_id == index.default_style_id):
+            p_el = p._p
+            p_el.style = body_id
+            index.set_style(i, body_id)
+            if p_el.pPr.spacing is not None or p_el.pPr.ind is not None:
+                p.paragraph_format.line_spacing = None
+                p.paragraph_format.first_line_indent = None
+            continue
+
+        if double_space:
+            p.paragraph_format.line_spacing = 2.0
+        if indented and "Heading" not in index.style_names[i]:
+            p.paragraph_format.first_line_indent = Inches(first_line_indent_in)
+
+# -----------------------------
+# Whole-document pipeline
+# -----------------------------
+def apply_apa_formatting(doc: Document, font_choice="Times New Roman 12", add_pnums=True, format_refs=True,
+                         use_styles=False, index=None, timer=None):
+    """
+    Margins, default font, body spacing/indent, page numbers and (optionally)
+    a sorted References section. With use_styles, spacing and indents come
+    from the "APA Body" / "APA Reference" paragraph styles instead of being
+    written into every paragraph. Every pass reads the same DocumentIndex
+    (built here unless the caller already has one). Returns True if the
+    References section was rebuilt.
+    """
+    if index is None:
+        with timed(timer, "document index"):
+            index = DocumentIndex(doc)
+    with timed(timer, "format: margins + font"):
+        set_document_margins(doc, 1.0)
+        set_default_font(doc, *font_from_choice(font_choice))
+    with timed(timer, "format: body paragraphs"):
+        if use_styles:
+            apply_body_paragraph_styles(doc, double_space=True, first_line_indent_in=0.5, index=index)
+        else:
+            apply_body_paragraph_formatting(doc, double_space=True, first_line_indent_in=0.5, index=index)
+
+    if add_pnums:
+        with timed(timer, "format: page numbers"):
+            add_page_number_top_right(doc)
+
+    formatted_refs_applied = False
+    if format_refs:
+        with timed(timer, "format: references"):
+            formatted_refs_applied = rebuild_references_section_sorted(doc, use_styles=use_styles, index=index)
+    return formatted_refs_applied
@@ -0,0 +1,565 @@
+"""
+Incremental BibTeX, RIS and CSL-JSON importers.
+
+Each parser reads a text stream a block at a time and yields reference
+records in the app's schema (see apa_format: a REF_TYPES "type", "authors"
+as [{"last", "initials", "suffix"}] or {"is_org": True, "org_name"}, "year",
+"title" and the per-type fields apa_reference_string reads). A 30k-entry
+export is never decoded in one piece, so the caller can write records in
+chunks and report progress as it goes.
+
+The app's own JSON export is a JSON array like CSL-JSON; items whose "type"
+is already one of REF_TYPES are passed through unchanged.
+
+Mapping is best-effort: fields APA doesn't use are dropped, and unknown
+entry types fall back to a type guessed from the fields present.
+"""
+import json
+import re
+import unicodedata
+
+from apa_tool.apa_format import REF_TYPES
+
+BLOCK_SIZE = 64 * 1024
+
+SUFFIXES = {"jr": "Jr.", "sr": "Sr.", "ii": "II", "iii": "III", "iv": "IV"}
+
+# -----------------------------
+# Shared record helpers
+# -----------------------------
+def initials_from_given(given: str) -> str:
+    """"John Adam" -> "J. A."; "Jean-Paul" -> "J.-P."; "J.A." -> "J. A."."""
+    out = []
+    for word in re.split(r"[\s.]+", given or ""):
+        pieces = [p for p in word.split("-") if p]
+        if pieces:
+            out.append("-".join(p[0].upper() + "." for p in pieces))
+    return " ".join(out)
+
+def person(last, given="", suffix=""):
+    suffix = SUFFIXES.get((suffix or "").strip().strip(".").lower(), "")
+    return {"last": (last or "").strip(), "initials": initials_from_given(given), "suffix": suffix}
+
+def normalize_doi(doi: str) -> str:
+    doi = (doi or "").strip()
+    doi = re.sub(r"^(doi:\s*|https?://(dx\.)?doi\.org/)", "", doi, flags=re.I)
+    return f"https://doi.org/{doi}" if doi else ""
+
+def normalize_pages(pages: str) -> str:
+    return re.sub(r"\s*-{1,3}\s*", "–", (pages or "").strip())
+
+def year_value(text):
+    """Record "year": an int for a plain year, "2020a" kept as text, else "n.d."."""
+    m = re.search(r"\b(\d{4})([a-z]?)\b", str(text or ""))
+    if not m:
+        return "n.d."
+    return int(m.group(1)) if not m.group(2) else m.group(0)
+
+def guess_type(fields):
+    if fields.get("journal"):
+        return "Journal article"
+    if fields.get("book_title"):
+        return "Book chapter"
+    if fields.get("publisher"):
+        return "Book"
+    if fields.get("url"):
+        return "Website"
+    return "Report / Government document"
+
+def make_record(rtype, authors, year, title, **fields):
+    """A record shaped like the References Manager's, with empty per-type fields dropped."""
+    fields = {k: v for k, v in fields.items() if v}
+    if rtype not in REF_TYPES:
+        rtype = guess_type(fields)
+    is_org = isinstance(authors, dict)
+    record = {
+        "type": rtype,
+        "authors": authors,
+        "org_author": is_org,
+        "org_name": authors["org_name"] if is_org else "",
+        "year": year,
+        "title": (title or "").strip(),
+        "auto_sentence_case": True,
+        "doi": normalize_doi(fields.pop("doi", "")),
+        "url": (fields.pop("url", "") or "").strip(),
+    }
+    if "pages" in fields:
+        fields["pages"] = normalize_pages(fields["pages"])
+    if rtype == "Thesis / Dissertation":
+        fields.setdefault("thesis_type", "Dissertation")
+    record.update(fields)
+    return record
+
+# -----------------------------
+# BibTeX
+# -----------------------------
+_ACCENTS = {
+    '"': "\u0308", "'": "\u0301", "`": "\u0300", "^": "\u0302", "~": "\u0303", "=": "\u0304",
+    ".": "\u0307", "u": "\u0306", "v": "\u030c", "H": "\u030b", "c": "\u0327", "r": "\u030a",
+    "k": "\u0328",
+}
+_LATEX_SYMBOLS = {
+    "ss": "ß", "o": "ø", "O": "Ø", "ae": "æ", "AE": "Æ", "oe": "œ", "OE": "Œ",
+    "aa": "å", "AA": "Å", "l": "ł", "L": "Ł", "i": "ı", "j": "ȷ",
+}
+_ACCENT_RE = re.compile(r"\\([\"'`^~=.uvHckr])\s*\{?\s*(\\?[A-Za-z])\s*\}?")
+_SYMBOL_RE = re.compile(r"\\(ss|ae|AE|oe|OE|aa|AA|o|O|l|L|i|j)(?![A-Za-z])\s*")
+_LATEX_MARKUP_RE = re.compile(r"[\\{}~]|--")
+_ESCAPED_RE = re.compile(r"\\([&%$#_{}])")
+_COMMAND_RE = re.compile(r"\\[A-Za-z]+\s*")
+_BIB_MONTHS = {m: m for m in ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec")}
+
+def latex_to_text(s: str) -> str:
+    """The LaTeX found in reference exports (accents, escapes, braces, dashes) to plain text."""
+    if not _LATEX_MARKUP_RE.search(s):
+        return " ".join(s.split())
+    if "\\" in s:
+        s = _SYMBOL_RE.sub(lambda m: _LATEX_SYMBOLS[m.group(1)], s)
+        s = _ACCENT_RE.sub(lambda m: m.group(2).lstrip("\\").replace("ı", "i") + _ACCENTS[m.group(1)], s)
+        s = _ESCAPED_RE.sub(r"\1", s)
+        s = _COMMAND_RE.sub("", s)  # remaining commands (\emph, \textit, ...) keep their argument
+    s = s.replace("{", "").replace("}", "").replace("---", "—").replace("--", "–").replace("~", " ")
+    return unicodedata.normalize("NFC", " ".join(s.split()))
+
+def _split_top_level(s: str, sep_re):
+    """Split `s` on `sep_re` matches that are outside braces."""
+    if "{" not in s:
+        return sep_re.split(s)
+    parts, depth, start, i = [], 0, 0, 0
+    while i < len(s):
+        ch = s[i]
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        elif depth == 0:
+            m = sep_re.match(s, i)
+            if m:
+                parts.append(s[start:i])
+                start = i = m.end()
+                continue
+        i += 1
+    parts.append(s[start:])
+    return parts
+
+_AND_RE = re.compile(r"\s+and\s+", re.I)
+_COMMA_RE = re.compile(r"\s*,\s*")
+
+def bibtex_people(value: str):
+    """BibTeX name list -> person dicts, or an organization dict for one braced name."""
+    names = [n.strip() for n in _split_top_level(value.strip(), _AND_RE) if n.strip()]
+    if len(names) == 1 and names[0].startswith("{") and names[0].endswith("}") and "," not in names[0]:
+        return {"is_org": True, "org_name": latex_to_text(names[0])}
+    people = []
+    for name in names:
+        parts = [latex_to_text(p) for p in _split_top_level(name, _COMMA_RE)]
+        if len(parts) >= 3:  # "von Last, Jr, First"
+            people.append(person(parts[0], parts[2], parts[1]))
+        elif len(parts) == 2:  # "von Last, First"
+            people.append(person(parts[0], parts[1]))
+        else:  # "First von Last"
+            words = parts[0].split()
+            if not words:
+                continue
+            cut = len(words) - 1
+            for i, w in enumerate(words[:-1]):
+                if w[:1].islower():
+                    cut = i
+                    break
+            people.append(person(" ".join(words[cut:]), " ".join(words[:cut])))
+    return people
+
+_BIB_TYPES = {
+    "article": "Journal article",
+    "book": "Book",
+    "incollection": "Book chapter",
+    "inbook": "Book chapter",
+    "online": "Website",
+    "electronic": "Website",
+    "www": "Website",
+    "techreport": "Report / Government document",
+    "report": "Report / Government document",
+    "inproceedings": "Conference paper",
+    "conference": "Conference paper",
+    "phdthesis": "Thesis / Dissertation",
+    "mastersthesis": "Thesis / Dissertation",
+    "thesis": "Thesis / Dissertation",
+}
+
+def bibtex_to_record(entry_type, fields):
+    rtype = _BIB_TYPES.get(entry_type, "")
+    if entry_type == "misc" and fields.get("url"):
+        rtype = "Website"
+    authors = bibtex_people(fields["author"]) if fields.get("author") else []
+    editors = bibtex_people(fields["editor"]) if fields.get("editor") else []
+    text = {k: latex_to_text(v) for k, v in fields.items() if k not in ("author", "editor")}
+    thesis_type = ""
+    if rtype == "Thesis / Dissertation":
+        thesis_type = "Thesis" if entry_type == "mastersthesis" or "master" in text.get("type", "").lower() else "Dissertation"
+    return make_record(
+        rtype,
+        authors if authors or not editors else editors,
+        year_value(text.get("year") or text.get("date")),
+        text.get("title"),
+        journal=text.get("journal") or text.get("journaltitle"),
+        volume=text.get("volume"),
+        issue=text.get("number") if rtype == "Journal article" else "",
+        pages=text.get("pages"),
+        publisher=text.get("publisher") or text.get("institution") or text.get("organization"),
+        edition=text.get("edition"),
+        book_title=text.get("booktitle") if rtype == "Book chapter" else "",
+        editors=editors if rtype == "Book chapter" and isinstance(editors, list) else [],
+        site_name=text.get("howpublished") if rtype == "Website" else "",
+        report_number=text.get("number") if rtype == "Report / Government document" else "",
+        conference_name=text.get("booktitle") or text.get("eventtitle") if rtype == "Conference paper" else "",
+        conference_location=text.get("address") or text.get("venue") if rtype == "Conference paper" else "",
+        university=text.get("school") or text.get("institution") if rtype == "Thesis / Dissertation" else "",
+        thesis_type=thesis_type,
+        doi=text.get("doi"),
+        url=text.get("url"),
+    )
+
+_ENTRY_START_RE = re.compile(r"@\s*(\w+)\s*([{(])")
+_ENTRY_DELIMS = {"{": re.compile(r"[{}]"), "(": re.compile(r"[()]")}
+_FIELD_NAME_RE = re.compile(r"\s*([\w:+.\-]+)\s*=\s*")
+_BARE_VALUE_RE = re.compile(r"[^,#}\s]+")
+_BRACE_RE = re.compile(r"[{}]")
+
+def _parse_bib_value(body, i, macros):
+    """Value starting at body[i] (with # concatenation) -> (text, index after it)."""
+    out = []
+    while True:
+        while i < len(body) and body[i].isspace():
+            i += 1
+        if i >= len(body):
+            break
+        ch = body[i]
+        if ch == "{":
+            depth, j = 0, len(body)
+            for b in _BRACE_RE.finditer(body, i):
+                depth += 1 if b.group(0) == "{" else -1
+                if depth == 0:
+                    j = b.start()
+                    break
+            out.append(body[i + 1 : j])
+            i = j + 1
+        elif ch == '"':
+            depth, j = 0, i + 1
+            while j < len(body) and not (body[j] == '"' and depth == 0):
+                depth += body[j] == "{"
+                depth -= body[j] == "}"
+                j += 1
+            out.append(body[i + 1 : j])
+            i = j + 1
+        else:
+            m = _BARE_VALUE_RE.match(body, i)
+            if not m:
+                break
+            word = m.group(0)
+            out.append(macros.get(word.lower(), word))
+            i = m.end()
+        while i < len(body) and body[i].isspace():
+            i += 1
+        if i < len(body) and body[i] == "#":
+            i += 1
+            continue
+        break
+    return "".join(out), i
+
+def _parse_bib_fields(body, macros):
+    fields, i = {}, 0
+    while i < len(body):
+        m = _FIELD_NAME_RE.match(body, i)
+        if not m:
+            nxt = body.find(",", i)
+            if nxt < 0:
+                break
+            i = nxt + 1
+            continue
+        value, i = _parse_bib_value(body, m.end(), macros)
+        fields[m.group(1).lower()] = value
+        nxt = body.find(",", i)
+        if nxt < 0:
+            break
+        i = nxt + 1
+    return fields
+
+def iter_bibtex_entries(stream):
+    """
+    (entry type, fields) for each @entry in a BibTeX text stream; @string
+    macros applied. An entry whose braces never close raises ValueError with
+    the line it starts on, instead of swallowing the rest of the file.
+    """
+    macros = dict(_BIB_MONTHS)
+    buf, pos, eof = "", 0, False
+    line = 1  # line number of buf[0]
+    while True:
+        m = _ENTRY_START_RE.search(buf, pos)
+        end = None
+        if m:
+            opener, depth = m.group(2), 1
+            for d in _ENTRY_DELIMS[opener].finditer(buf, m.end()):
+                depth += 1 if d.group(0) == opener else -1
+                if depth == 0:
+                    end = d.start()
+                    break
+        if end is None:
+            if eof:
+                if m:
+                    start = line + buf.count("\n", 0, m.start())
+                    raise ValueError(f"Unbalanced braces in the BibTeX entry starting on line {start}.")
+                return
+            block = stream.read(BLOCK_SIZE)
+            eof = not block
+            # Keep an unfinished entry (or a trailing "@..." that may become one).
+            keep = m.start() if m else buf.rfind("@", pos)
+            if keep < 0:
+                keep = len(buf)
+            line += buf.count("\n", 0, keep)
+            buf = buf[keep:] + block
+            pos = 0
+            continue
+        entry_type, body = m.group(1).lower(), buf[m.end():end]
+        pos = end + 1
+        if entry_type == "string":
+            fields = _parse_bib_fields(body, macros)
+            macros.update({k: v for k, v in fields.items()})
+        elif entry_type not in ("comment", "preamble"):
+            key, _, rest = body.partition(",")
+            yield entry_type, _parse_bib_fields(rest, macros)
+
+def iter_bibtex(stream):
+    for entry_type, fields in iter_bibtex_entries(stream):
+        yield bibtex_to_record(entry_type, fields)
+
+# -----------------------------
+# RIS
+# -----------------------------
+_RIS_LINE_RE = re.compile(r"^([A-Z][A-Z0-9])  -(?: (.*))?$")
+_RIS_TYPES = {
+    "JOUR": "Journal article",
+    "JFULL": "Journal article",
+    "EJOUR": "Journal article",
+    "MGZN": "Journal article",
+    "NEWS": "Journal article",
+    "BOOK": "Book",
+    "EBOOK": "Book",
+    "EDBOOK": "Book",
+    "CHAP": "Book chapter",
+    "ECHAP": "Book chapter",
+    "ELEC": "Website",
+    "WEB": "Website",
+    "BLOG": "Website",
+    "RPRT": "Report / Government document",
+    "GOVDOC": "Report / Government document",
+    "CONF": "Conference paper",
+    "CPAPER": "Conference paper",
+    "THES": "Thesis / Dissertation",
+}
+
+def _ris_person(name):
+    last, _, rest = name.partition(",")
+    given, _, suffix = rest.partition(",")
+    return person(last, given, suffix)
+
+def ris_to_record(tags):
+    def first(*names):
+        for n in names:
+            if tags.get(n):
+                return tags[n][0].strip()
+        return ""
+
+    ris_type = first("TY").upper()
+    rtype = _RIS_TYPES.get(ris_type, "")
+    authors = [_ris_person(a) for a in tags.get("AU", []) + tags.get("A1", [])]
+    editors = [_ris_person(a) for a in tags.get("A2", []) + tags.get("ED", [])]
+    if len(authors) == 1 and not authors[0]["initials"] and " " in authors[0]["last"]:
+        authors = {"is_org": True, "org_name": authors[0]["last"]}
+    start, end = first("SP"), first("EP")
+    pages = f"{start}–{end}" if start and end else start
+    container = first("T2", "JO", "JF", "JA", "BT")
+    thesis_type = ""
+    if rtype == "Thesis / Dissertation":
+        thesis_type = "Thesis" if "master" in first("M3").lower() else "Dissertation"
+    return make_record(
+        rtype,
+        authors,
+        year_value(first("PY", "Y1", "DA")),
+        first("TI", "T1", "CT"),
+        journal=container if rtype == "Journal article" else "",
+        volume=first("VL"),
+        issue=first("IS") if rtype == "Journal article" else "",
+        pages=pages,
+        publisher=first("PB"),
+        edition=first("ET"),
+        book_title=container if rtype == "Book chapter" else "",
+        editors=editors if rtype == "Book chapter" else [],
+        site_name=container if rtype == "Website" else "",
+        report_number=first("M1", "IS") if rtype == "Report / Government document" else "",
+        conference_name=container if rtype == "Conference paper" else "",
+        conference_location=first("CY") if rtype == "Conference paper" else "",
+        university=first("PB") if rtype == "Thesis / Dissertation" else "",
+        thesis_type=thesis_type,
+        doi=first("DO"),
+        url=first("UR", "L2"),
+    )
+
+def iter_ris(stream):
+    tags, last_tag = None, None
+    for line in stream:
+        line = line.rstrip("\r\n").lstrip("\ufeff")
+        m = _RIS_LINE_RE.match(line)
+        if not m:
+            if tags is not None and last_tag and line.strip():
+                tags[last_tag][-1] += " " + line.strip()
+            continue
+        tag, value = m.group(1), (m.group(2) or "").strip()
+        if tag == "TY":
+            tags, last_tag = {"TY": [value]}, "TY"
+        elif tag == "ER":
+            if tags is not None:
+                yield ris_to_record(tags)
+            tags, last_tag = None, None
+        elif tags is not None:
+            tags.setdefault(tag, []).append(value)
+            last_tag = tag
+
+# -----------------------------
+# CSL-JSON (and the app's own JSON export)
+# -----------------------------
+_CSL_TYPES = {
+    "article-journal": "Journal article",
+    "article-magazine": "Journal article",
+    "article-newspaper": "Journal article",
+    "article": "Journal article",
+    "book": "Book",
+    "chapter": "Book chapter",
+    "entry-encyclopedia": "Book chapter",
+    "webpage": "Website",
+    "post-weblog": "Website",
+    "post": "Website",
+    "report": "Report / Government document",
+    "paper-conference": "Conference paper",
+    "speech": "Conference paper",
+    "thesis": "Thesis / Dissertation",
+}
+
+def _csl_people(names):
+    if len(names) == 1 and names[0].get("literal"):
+        return {"is_org": True, "org_name": names[0]["literal"].strip()}
+    people = []
+    for n in names:
+        last = " ".join(p for p in (n.get("non-dropping-particle"), n.get("family")) if p)
+        people.append(person(last or n.get("literal", ""), n.get("given", ""), n.get("suffix", "")))
+    return people
+
+def _csl_year(issued):
+    if not isinstance(issued, dict):
+        return year_value(issued)
+    parts = issued.get("date-parts") or [[]]
+    if parts and parts[0]:
+        return year_value(parts[0][0])
+    return year_value(issued.get("raw") or issued.get("literal"))
+
+def csl_to_record(item):
+    rtype = _CSL_TYPES.get(item.get("type"), "")
+    container = item.get("container-title") or ""
+    if isinstance(container, list):
+        container = container[0] if container else ""
+    accessed = item.get("accessed")
+    retrieval = ""
+    if rtype == "Website" and isinstance(accessed, dict) and (accessed.get("date-parts") or [[]])[0]:
+        retrieval = "-".join(f"{int(p):02d}" for p in accessed["date-parts"][0])
+    record = make_record(
+        rtype,
+        _csl_people(item.get("author") or []),
+        _csl_year(item.get("issued")),
+        item.get("title"),
+        journal=container if rtype == "Journal article" else "",
+        volume=str(item.get("volume") or ""),
+        issue=str(item.get("issue") or "") if rtype == "Journal article" else "",
+        pages=str(item.get("page") or ""),
+        publisher=item.get("publisher"),
+        edition=str(item.get("edition") or ""),
+        book_title=container if rtype == "Book chapter" else "",
+        editors=_csl_people(item.get("editor") or []) if rtype == "Book chapter" else [],
+        site_name=container if rtype == "Website" else "",
+        report_number=str(item.get("number") or "") if rtype == "Report / Government document" else "",
+        conference_name=(item.get("event-title") or item.get("event") or container) if rtype == "Conference paper" else "",
+        conference_location=item.get("event-place") if rtype == "Conference paper" else "",
+        university=item.get("publisher") if rtype == "Thesis / Dissertation" else "",
+        thesis_type="Thesis" if "master" in (item.get("genre") or "").lower() else "",
+        retrieval_date=retrieval,
+        doi=item.get("DOI"),
+        url=item.get("URL"),
+    )
+    if isinstance(record["authors"], list) and not record["authors"] and rtype != "Book chapter" and item.get("editor"):
+        record["authors"] = _csl_people(item["editor"])
+    return record
+
+def iter_json_array(stream):
+    """Items of a top-level JSON array, decoded one at a time."""
+    decoder = json.JSONDecoder()
+    buf, pos, eof, started = "", 0, False, False
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or buf[pos] == ","):
+            pos += 1
+        if pos < len(buf):
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError("Expected a JSON array of references.")
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                item = None
+            else:
+                # A value ending exactly at the buffer edge may be cut short (a number).
+                if end < len(buf) or eof:
+                    yield item
+                    pos = end
+                    continue
+        elif eof:
+            if not started:
+                raise ValueError("Expected a JSON array of references.")
+            raise ValueError("Unterminated JSON array.")
+        block = stream.read(BLOCK_SIZE)
+        eof = not block
+        buf, pos = buf[pos:] + block, 0
+
+def iter_csl_json(stream):
+    for item in iter_json_array(stream):
+        if not isinstance(item, dict):
+            continue
+        # The app's own export is already in record form.
+        yield item if item.get("type") in REF_TYPES else csl_to_record(item)
+
+# -----------------------------
+# Dispatch
+# -----------------------------
+IMPORTERS = {
+    "bib": iter_bibtex,
+    "ris": iter_ris,
+    "json": iter_csl_json,
+}
+
+def importer_for(filename: str):
+    """The record iterator for a file name's extension (.bib, .ris, .json), or None."""
+    ext = (filename or "").rsplit(".", 1)[-1].lower()
+    return IMPORTERS.get(ext)
+
+def iter_chunks(records, size=500):
+    chunk = []
+    for r in records:
+        chunk.append(r)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,118 @@
+"""
+One-traversal structure index over a python-docx Document.
+
+Finding the References heading, reading paragraph text and resolving style
+names each used to walk ``doc.paragraphs`` again (and python-docx re-reads
+the XML on every ``.text`` / ``.style`` access). DocumentIndex walks the body
+once and the formatting and checking passes read from it instead.
+
+The paragraphs are every story's, in reader.iter_paragraphs order (the walk
+is the same one), so a DocumentIndex and a streamed parse of the same file
+agree paragraph for paragraph. Only the document.xml ones (the first
+`body_end`: body, table cells, text boxes) get python-docx proxies for the
+formatting passes; headers, footers and notes are indexed as text.
+
+Passes that change the document through the index (restyling paragraphs,
+rebuilding the References section) keep it up to date; edits made some
+other way need a fresh index.
+"""
+import io
+
+from docx.enum.style import WD_STYLE_TYPE
+from docx.text.paragraph import Paragraph
+from lxml import etree
+
+from apa_tool.checker import find_references_start, iter_citations
+from apa_tool.reader import (
+    W_P,
+    StreamParagraph,
+    iter_part_paragraphs,
+    iter_story_elements,
+    paragraph_text,
+    story_parts,
+)
+
+class DocumentIndex:
+    """
+    doc:            the indexed Document
+    paragraphs:     StreamParagraph(text, style_id, story) per paragraph of
+                    every story (cached text)
+    body_end:       number of document.xml paragraphs, which come first
+    elements:       python-docx Paragraph per document.xml paragraph
+    style_names:    resolved style name per document.xml paragraph
+                    ("Normal" if unset)
+    references_idx: position of the "References" heading, or None
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        styles = doc.styles
+        self.default_style_id = styles.default(WD_STYLE_TYPE.PARAGRAPH).style_id
+        self._style_names = {s.style_id: s.name for s in styles}
+
+        self.elements = []
+        self.paragraphs = []
+        self.style_names = []
+        body = doc._body
+        events = etree.iterwalk(doc.element.body, events=("end",), tag=W_P)
+        for p_el, story in iter_story_elements(events):
+            style_id = p_el.style
+            self.elements.append(Paragraph(p_el, body))
+            self.paragraphs.append(StreamParagraph(paragraph_text(p_el), style_id, story))
+            self.style_names.append(self.style_name(style_id))
+        self.body_end = len(self.paragraphs)
+
+        # Headers, footers and notes: read-only text, from the parts' XML.
+        parts = {rel.target_part.partname: rel for rel in doc.part.rels.values() if not rel.is_external}
+        for story, name in story_parts((rel.reltype, partname) for partname, rel in parts.items()):
+            blob = parts["/" + name].target_part.blob
+            self.paragraphs.extend(iter_part_paragraphs(io.BytesIO(blob), story))
+
+        self.references_idx = find_references_start(self.paragraphs)
+        self._citations = None
+
+    def __len__(self):
+        return len(self.paragraphs)
+
+    def style_name(self, style_id) -> str:
+        style_id = style_id or self.default_style_id
+        name = self._style_names.get(style_id)
+        if name is None:
+            # Either a style added since indexing (e.g. "APA Body") or a
+            # dangling ID, which python-docx resolves to the default style.
+            self._style_names.update({s.style_id: s.name for s in self.doc.styles})
+            name = self._style_names.setdefault(style_id, self._style_names.get(self.default_style_id, ""))
+        return name or ""
+
+    @property
+    def citations(self):
+        """Citations in the indexed text (same shape as ParsedUpload.citations)."""
+        if self._citations is None:
+            self._citations = tuple(iter_citations(self.paragraphs))
+        return self._citations
+
+    # -- keeping the index in step with edits made by the formatting passes --
+
+    def set_style(self, i, style_id):
+        self.paragraphs[i] = self.paragraphs[i]._replace(style_id=style_id)
+        self.style_names[i] = self.style_name(style_id)
+
+    def set_text(self, i, text):
+        self.paragraphs[i] = self.paragraphs[i]._replace(text=text)
+        self._citations = None
+
+    def replace_tail(self, start, p_elements, texts, style_id=None):
+        """
+        document.xml paragraphs from `start` on (to body_end) were replaced by
+        body paragraphs `p_elements` (with `texts`); the other stories stay.
+        """
+        body = self.doc._body
+        end = self.body_end
+        name = self.style_name(style_id)
+        self.elements[start:end] = [Paragraph(p_el, body) for p_el in p_elements]
+        self.paragraphs[start:end] = [StreamParagraph(text, style_id) for text in texts]
+        self.style_names[start:end] = [name] * len(texts)
+        self.body_end = start + len(texts)
+        if self.references_idx is None or self.references_idx >= start:
+            self.references_idx = find_references_start(self.paragraphs)
+        self._citations = None
@@ -0,0 +1,155 @@
+"""
+Background jobs for long pipeline runs.
+
+Formatting a long thesis is seconds to minutes of python-docx work. Run in
+the Streamlit script thread it blocks the session: no widget responds until
+it is done, and a slow enough run loses the browser's websocket. Instead the
+script submits the run to a JobRunner (a small thread pool shared by all
+sessions), keeps the job id in session state and polls the job.
+
+Progress and cancellation ride on the StageTimer the pipeline already takes:
+a job's JobTimer records each timed(timer, ...) stage as a progress step and,
+when a stage starts after cancel(), raises JobCancelled. A cancelled job
+therefore stops at the next stage boundary without the pipeline knowing
+about jobs.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from apa_tool.timing import StageTimer
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class JobCancelled(Exception):
+    """Raised at the next stage boundary of a job whose cancel() was called."""
+
+class JobTimer(StageTimer):
+    """StageTimer that reports its stages to a Job and stops a cancelled one."""
+
+    def __init__(self, job, **kwargs):
+        super().__init__(**kwargs)
+        self.job = job
+
+    @contextmanager
+    def stage(self, name):
+        job = self.job
+        if job.cancel_requested and not job.done:
+            raise JobCancelled()
+        job.stage = name
+        with super().stage(name):
+            yield
+        job.stages_done.append(name)
+
+class Job:
+    """
+    id:              short id (also the run id of its timer's log lines)
+    state:           QUEUED, RUNNING, DONE, FAILED or CANCELLED
+    stage:           stage running now (or last started)
+    stages_done:     finished stage names, in order
+    expected_stages: stage names the run is expected to go through (for progress)
+    result / error:  the function's return value / the failure message
+    timer:           the JobTimer passed to the function as `timer`
+    """
+
+    def __init__(self, expected_stages=(), trace_memory=False, **context):
+        self.timer = JobTimer(self, trace_memory=trace_memory, **context)
+        self.id = self.timer.run_id
+        self.state = QUEUED
+        self.stage = None
+        self.stages_done = []
+        self.expected_stages = tuple(expected_stages)
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """Ask the job to stop at its next stage boundary (a queued job never starts)."""
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    @property
+    def progress(self) -> float:
+        """Share of the expected stages finished (1.0 once done)."""
+        if self.state == DONE:
+            return 1.0
+        if not self.expected_stages:
+            return 0.0
+        finished = set(self.stages_done)
+        return sum(s in finished for s in self.expected_stages) / len(self.expected_stages)
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.time()) - self.submitted
+
+class JobRunner:
+    """
+    Thread pool plus a table of job id -> Job. Finished jobs are kept for
+    result retrieval until `keep` newer ones have finished after them (or
+    they are discarded); unfinished jobs are never dropped.
+    """
+
+    def __init__(self, max_workers=2, keep=32):
+        self.keep = keep
+        self._pool = ThreadPoolExecutor(max_workers, thread_name_prefix="apa-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, expected_stages=(), trace_memory=False, context=None, **kwargs):
+        """Run fn(*args, timer=<the job's JobTimer>, **kwargs) in the pool; returns the Job."""
+        job = Job(expected_stages, trace_memory=trace_memory, **(context or {}))
+        with self._lock:
+            self._jobs[job.id] = job
+            self._evict()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job_id):
+        """Cancel the job if it is still running and forget it (and its result)."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancel()
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(0, len(finished) - self.keep)]:
+            del self._jobs[job_id]
+
+    def _run(self, job, fn, args, kwargs):
+        if job.cancel_requested:
+            job.state = CANCELLED
+        else:
+            job.state = RUNNING
+            try:
+                job.result = fn(*args, timer=job.timer, **kwargs)
+                job.state = DONE
+            except JobCancelled:
+                job.state = CANCELLED
+            except Exception as e:
+                logger.exception("job %s failed", job.id)
+                job.error = f"{type(e).__name__}: {e}"
+                job.state = FAILED
+        job.finished = time.time()
@@ -0,0 +1,358 @@
+"""
+Persistent reference library on a local SQLite file.
+
+Each reference record (the dict the References Manager edits) is stored as
+JSON next to the columns the app filters and sorts on: type, first-author
+key and year, plus its formatted APA string. An FTS5 index over the
+formatted string serves the search box, so a 20k-reference library is
+searched and filtered by SQLite indexes instead of a json.dumps() scan of
+every record on every rerun.
+
+The formatted string is a memo of apa_reference_string: it is computed when
+a record is written, so listing, previewing and building References never
+format anything. The meta table remembers the FORMATTER_VERSION the stored
+strings were made with; opening a library written by another version
+recomputes them (and rewrites only the rows whose output changed).
+
+Every record has a stable id. It is AUTOINCREMENT, so a deleted record's id
+is never handed out again and a stale widget key or edit target can't land
+on another record. Records keep the order they were added in (`position`);
+"apa" order is first-author key, year, then position, the same order the
+app's (first_author_key, normalize_year) sort produced.
+
+Records belong to a project. One library file serves every Streamlit
+session, and each session only sees, changes and deletes its own project's
+records: ReferenceLibrary.scoped(project) is a view of the same file for
+another project, and every query and delete filters on it.
+
+The connection is shared between sessions (and their scoped views) and
+threads, so every operation takes the library's lock.
+"""
+import copy
+import json
+import os
+import re
+import sqlite3
+import threading
+
+from apa_tool.apa_format import FORMATTER_VERSION, apa_reference_string, first_author_key, normalize_year
+
+# Overridable so several checkouts / users on one machine can keep separate libraries.
+DEFAULT_PATH = os.environ.get("APA_LIBRARY_DB", "apa_library.sqlite3")
+
+# Project of a library opened without one, and of records stored before
+# projects existed (the app reopens those at ?project=default).
+DEFAULT_PROJECT = "default"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project TEXT NOT NULL DEFAULT 'default',
+    position REAL NOT NULL,
+    type TEXT NOT NULL,
+    author_key TEXT NOT NULL,
+    year TEXT NOT NULL,
+    formatted TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# Created after the project column exists (older files get it by migration).
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS refs_project_position ON refs (project, position);
+CREATE INDEX IF NOT EXISTS refs_project_type ON refs (project, type, position);
+CREATE INDEX IF NOT EXISTS refs_project_apa_order ON refs (project, author_key, year, position);
+"""
+
+# External-content FTS table kept in sync by triggers.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS refs_fts USING fts5(
+    formatted, content='refs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS refs_fts_insert AFTER INSERT ON refs BEGIN
+    INSERT INTO refs_fts (rowid, formatted) VALUES (new.id, new.formatted);
+END;
+CREATE TRIGGER IF NOT EXISTS refs_fts_delete AFTER DELETE ON refs BEGIN
+    INSERT INTO refs_fts (refs_fts, rowid, formatted) VALUES ('delete', old.id, old.formatted);
+END;
+CREATE TRIGGER IF NOT EXISTS refs_fts_update AFTER UPDATE OF formatted ON refs BEGIN
+    INSERT INTO refs_fts (refs_fts, rowid, formatted) VALUES ('delete', old.id, old.formatted);
+    INSERT INTO refs_fts (rowid, formatted) VALUES (new.id, new.formatted);
+END;
+"""
+
+_ORDER = {
+    "position": "position",
+    "apa": "author_key, year, position",
+}
+
+def search_terms(text: str):
+    """Words of a search box entry ("Smith 2020" -> ["Smith", "2020"])."""
+    return re.findall(r"\w+", text or "")
+
+def fts_query(text: str) -> str:
+    """FTS5 MATCH expression requiring every word as a prefix ("smi" finds Smith)."""
+    return " ".join(f'"{w}"*' for w in search_terms(text))
+
+def record_columns(ref):
+    """(type, author_key, year, formatted, data) column values for a record."""
+    return (
+        ref.get("type") or "",
+        first_author_key(ref.get("authors")),
+        normalize_year(ref.get("year")),
+        apa_reference_string(ref),
+        json.dumps(ref),
+    )
+
+class ReferenceLibrary:
+    def __init__(self, path=DEFAULT_PATH, project=DEFAULT_PROJECT):
+        self.path = path
+        self.project = project
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._add_project_column()
+            self._conn.executescript(_INDEXES)
+            try:
+                self._conn.executescript(_FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: fall back to LIKE on the formatted text.
+                self.has_fts = False
+            self._refresh_derived_columns()
+
+    def _add_project_column(self):
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(refs)")}
+        if "project" in columns:
+            return
+        # A library from before projects: its records join DEFAULT_PROJECT.
+        self._conn.execute("ALTER TABLE refs ADD COLUMN project TEXT NOT NULL DEFAULT 'default'")
+        for name in ("refs_position", "refs_type", "refs_apa_order"):
+            self._conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+    def scoped(self, project):
+        """This library (same file and connection) restricted to `project`'s records."""
+        view = copy.copy(self)
+        view.project = project
+        return view
+
+    def _refresh_derived_columns(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'formatter_version'").fetchone()
+        if row is not None and row[0] == str(FORMATTER_VERSION):
+            return
+        rows = self._conn.execute("SELECT id, data FROM refs").fetchall()
+        self._conn.executemany(
+            "UPDATE refs SET type = ?, author_key = ?, year = ?, formatted = ? "
+            "WHERE id = ? AND (type, author_key, year, formatted) <> (?, ?, ?, ?)",
+            (
+                cols + (ref_id,) + cols
+                for ref_id, data in rows
+                for cols in [record_columns(json.loads(data))[:4]]
+            ),
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('formatter_version', ?)", (str(FORMATTER_VERSION),)
+        )
+
+    def close(self):
+        """Close the connection (shared with every scoped view of this library)."""
+        with self._lock:
+            self._conn.close()
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def _where(self, query, ref_type):
+        clauses, params = ["project = ?"], [self.project]
+        if ref_type:
+            clauses.append("type = ?")
+            params.append(ref_type)
+        terms = search_terms(query)
+        if terms and self.has_fts:
+            clauses.append("id IN (SELECT rowid FROM refs_fts WHERE refs_fts MATCH ?)")
+            params.append(fts_query(query))
+        else:
+            for term in terms:
+                clauses.append("formatted LIKE ? ESCAPE '\\'")
+                params.append("%" + re.sub(r"([%_\\])", r"\\\1", term) + "%")
+        return " WHERE " + " AND ".join(clauses), params
+
+    def __len__(self):
+        return self.count()
+
+    def count(self, query="", ref_type=None):
+        where, params = self._where(query, ref_type)
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM refs" + where, params).fetchone()[0]
+
+    def search(self, query="", ref_type=None, limit=None, offset=0, order="position"):
+        """[(id, record)] matching every search word (and the type, if given)."""
+        where, params = self._where(query, ref_type)
+        sql = f"SELECT id, data FROM refs{where} ORDER BY {_ORDER[order]} LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._conn.execute(sql, params + [-1 if limit is None else limit, offset]).fetchall()
+        return [(ref_id, json.loads(data)) for ref_id, data in rows]
+
+    def all(self, order="position"):
+        return [ref for _, ref in self.search(order=order)]
+
+    def entries(self, order="position"):
+        """[(record, formatted APA string)] for the whole library."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data, formatted FROM refs WHERE project = ? ORDER BY {_ORDER[order]}", (self.project,)
+            ).fetchall()
+        return [(json.loads(data), formatted) for data, formatted in rows]
+
+    def formatted(self, order="apa"):
+        """Stored APA strings of every record, without decoding the records."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT formatted FROM refs WHERE project = ? ORDER BY {_ORDER[order]}", (self.project,)
+            ).fetchall()
+        return [f for (f,) in rows]
+
+    def identity_rows(self):
+        """[(id, author_key, year, title, doi)] in list order, for duplicate detection."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, author_key, year, COALESCE(json_extract(data, '$.title'), ''), "
+                "COALESCE(json_extract(data, '$.doi'), '') FROM refs WHERE project = ? ORDER BY position",
+                (self.project,),
+            ).fetchall()
+
+    def get(self, ref_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM refs WHERE id = ? AND project = ?", (ref_id, self.project)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # -----------------------------
+    # Changes
+    # -----------------------------
+    def _insert(self, ref, position):
+        cur = self._conn.execute(
+            "INSERT INTO refs (project, position, type, author_key, year, formatted, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.project, position) + record_columns(ref),
+        )
+        return cur.lastrowid
+
+    def _next_position(self):
+        return self._conn.execute(
+            "SELECT COALESCE(MAX(position), 0) + 1 FROM refs WHERE project = ?", (self.project,)
+        ).fetchone()[0]
+
+    def add(self, ref):
+        """Append a record; returns its id."""
+        with self._lock, self._conn:
+            return self._insert(ref, self._next_position())
+
+    def _position_after(self, ref_id):
+        row = self._conn.execute(
+            "SELECT position FROM refs WHERE id = ? AND project = ?", (ref_id, self.project)
+        ).fetchone()
+        if row is None:
+            return self._next_position()
+        nxt = self._conn.execute(
+            "SELECT MIN(position) FROM refs WHERE project = ? AND position > ?", (self.project, row[0])
+        ).fetchone()[0]
+        if nxt is None:
+            return row[0] + 1
+        if nxt - row[0] < 1e-6:
+            # Repeated inserts at one spot have halved the gap away; respace the list.
+            self._conn.execute(
+                "UPDATE refs SET position = r.n FROM "
+                "(SELECT id, ROW_NUMBER() OVER (ORDER BY position) AS n FROM refs WHERE project = ?) AS r "
+                "WHERE refs.id = r.id",
+                (self.project,),
+            )
+            return self._position_after(ref_id)
+        return (row[0] + nxt) / 2
+
+    def insert_after(self, ref_id, ref):
+        """Insert a record directly after `ref_id` in list order; returns its id."""
+        with self._lock, self._conn:
+            return self._insert(ref, self._position_after(ref_id))
+
+    def duplicate(self, ref_id):
+        """Copy a record (row to row, no decode/re-format) right after itself; returns the new id."""
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO refs (project, position, type, author_key, year, formatted, data) "
+                "SELECT project, ?, type, author_key, year, formatted, data FROM refs WHERE id = ? AND project = ?",
+                (self._position_after(ref_id), ref_id, self.project),
+            )
+            return cur.lastrowid if cur.rowcount else None
+
+    def update(self, ref_id, ref):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE refs SET type = ?, author_key = ?, year = ?, formatted = ?, data = ? "
+                "WHERE id = ? AND project = ?",
+                record_columns(ref) + (ref_id, self.project),
+            )
+
+    def delete(self, ref_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM refs WHERE id = ? AND project = ?", (ref_id, self.project))
+
+    def merge(self, keep_id, ref, drop_ids):
+        """Replace `keep_id` with the merged record and delete the duplicates it absorbed."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE refs SET type = ?, author_key = ?, year = ?, formatted = ?, data = ? "
+                "WHERE id = ? AND project = ?",
+                record_columns(ref) + (keep_id, self.project),
+            )
+            self._conn.executemany(
+                "DELETE FROM refs WHERE id = ? AND project = ?", ((i, self.project) for i in drop_ids)
+            )
+
+    def clear(self):
+        """Delete every record of this project."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM refs WHERE project = ?", (self.project,))
+
+    def max_id(self):
+        """Highest id handed out so far, in any project (0 for a new library)."""
+        with self._lock:
+            row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'refs'").fetchone()
+        return row[0] if row else 0
+
+    def add_many(self, refs):
+        """Append records in one transaction; returns how many were added."""
+        refs = list(refs)
+        with self._lock, self._conn:
+            start = self._next_position()
+            self._conn.executemany(
+                "INSERT INTO refs (project, position, type, author_key, year, formatted, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((self.project, start + i) + record_columns(ref) for i, ref in enumerate(refs)),
+            )
+        return len(refs)
+
+    def delete_ids(self, above=None, upto=None):
+        """
+        Delete this project's records by id range. With ids from max_id(), a
+        chunked import can be committed (drop what was there before) or
+        rolled back (drop what it added); imports into other projects in the
+        meantime are untouched.
+        """
+        clauses, params = ["project = ?"], [self.project]
+        if above is not None:
+            clauses.append("id > ?")
+            params.append(above)
+        if upto is not None:
+            clauses.append("id <= ?")
+            params.append(upto)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM refs WHERE " + " AND ".join(clauses), params)
@@ -0,0 +1,126 @@
+"""
+Approximate citation ↔ reference matching ("did you mean").
+
+The exact check compares (surname token, year) keys, so a typo ("Smtih"), a
+transliteration ("Mueller" for "Müller") or a year suffix ("2020a" vs
+"2020") shows up as a missing reference. Here each citation without an
+exact match is paired up approximately with the reference keys: all of them,
+not just the uncited ones, since the right reference is often cited
+correctly elsewhere in the paper ("Smtih (2020)" next to "Smith (2020)").
+
+Comparing every unmatched citation with every reference is quadratic, so
+references are first put into blocks:
+
+- (base year, phonetic code of the folded surname): catches typos and
+  diacritics within the same year, including "2020a" vs "2020";
+- folded surname alone: catches a wrong year for the right author.
+
+A citation is only scored against the references sharing one of its blocks,
+with a bounded edit distance on the folded surnames.
+"""
+import re
+
+from apa_tool.normalize import fold
+
+# Suggestions scoring below this are dropped.
+MIN_SCORE = 0.75
+
+_NOT_ASCII_LETTER_RE = re.compile(r"[^a-z]")
+
+def fold_surname(s: str) -> str:
+    """Lowercase ASCII letters only: "Müller-Lyer" -> "mullerlyer"."""
+    return _NOT_ASCII_LETTER_RE.sub("", fold(s))
+
+_SOUNDEX_CODES = {}
+for _letters, _digit in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6")):
+    for _ch in _letters:
+        _SOUNDEX_CODES[_ch] = _digit
+
+def soundex(folded: str) -> str:
+    """American Soundex of an already folded surname ("" stays "")."""
+    if not folded:
+        return ""
+    code = folded[0].upper()
+    last = _SOUNDEX_CODES.get(folded[0], "")
+    for ch in folded[1:]:
+        digit = _SOUNDEX_CODES.get(ch, "")
+        if digit and digit != last:
+            code += digit
+            if len(code) == 4:
+                break
+        if ch not in "hw":
+            last = digit
+    return code.ljust(4, "0")
+
+def base_year(year: str) -> str:
+    """"2020a" -> "2020"; "n.d." stays "n.d."."""
+    return year[:4] if year[:4].isdigit() else year
+
+def bounded_edit_distance(a: str, b: str, limit: int):
+    """
+    Edit distance of a and b counting an adjacent swap ("Smtih") as one edit
+    (optimal string alignment), or None once it must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return None
+    before = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i]
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, before[j - 2] + 1)
+            cur.append(d)
+        if min(cur) > limit:
+            return None
+        before, prev = prev, cur
+    return prev[-1] if prev[-1] <= limit else None
+
+def _year_factor(cited_year: str, ref_year: str) -> float:
+    if cited_year == ref_year:
+        return 1.0
+    if base_year(cited_year) == base_year(ref_year):
+        return 0.95  # only the a/b suffix differs
+    return 0.8
+
+def suggest_matches(cited_keys, ref_keys, min_score=MIN_SCORE, per_citation=3):
+    """
+    Ranked "did you mean" pairs for (surname token, year) keys: unmatched
+    `cited_keys` against `ref_keys` (a key in both is never paired with
+    itself).
+
+    Returns a list of {"cited", "reference", "score"} dicts, best first, with
+    at most `per_citation` candidates per cited key.
+    """
+    blocks = {}
+    folded_refs = {}
+    for key in ref_keys:
+        folded = fold_surname(key[0])
+        folded_refs[key] = folded
+        blocks.setdefault(("y", base_year(key[1]), soundex(folded)), []).append(key)
+        blocks.setdefault(("a", folded), []).append(key)
+
+    suggestions = []
+    for cited in cited_keys:
+        folded = fold_surname(cited[0])
+        candidates = set(blocks.get(("y", base_year(cited[1]), soundex(folded)), ()))
+        candidates.update(blocks.get(("a", folded), ()))
+
+        scored = []
+        candidates.discard(cited)
+        for ref in candidates:
+            ref_folded = folded_refs[ref]
+            longest = max(len(folded), len(ref_folded), 1)
+            dist = bounded_edit_distance(folded, ref_folded, limit=max(1, longest // 3))
+            if dist is None:
+                continue
+            score = round((1 - dist / longest) * _year_factor(cited[1], ref[1]), 3)
+            if score >= min_score:
+                scored.append({"cited": cited, "reference": ref, "score": score})
+        scored.sort(key=lambda s: (-s["score"], s["reference"]))
+        suggestions.extend(scored[:per_citation])
+
+    suggestions.sort(key=lambda s: (-s["score"], s["cited"], s["reference"]))
+    return suggestions
@@ -0,0 +1,68 @@
+"""
+Unicode-aware normalization of author names into matching keys.
+
+The scan, the References parser and the reference library all reduce an
+author to one key token, and they only agree if they do it the same way:
+
+- fold: NFKD, combining marks dropped ("Müller" -> "muller", also when the
+  text was typed decomposed), apostrophe look-alikes removed ("O’Brien",
+  "O'Brien" -> "obrien"), hyphen and dash variants made "-", casefolded;
+- author_key: the folded surname part (text before the first comma) minus
+  leading particles ("van Dijk", "Van Dijk, J." -> "dijk"), first word.
+
+A paper cites the same few surnames hundreds of times, so author_key keeps a
+memo of raw string -> key and interns the keys; each distinct spelling is
+normalized once and every match after that is a dict lookup.
+"""
+import re
+import sys
+import unicodedata
+
+_APOSTROPHES = "'’‘ʼʹ`´′"
+_HYPHENS = "‐‑‒–—―−﹣－"
+
+# Applied after NFKD; characters mapped to None are deleted.
+_CANON = str.maketrans({**{c: None for c in _APOSTROPHES}, **{c: "-" for c in _HYPHENS}})
+
+# Surname prefixes dropped from keys when another word follows them.
+PARTICLES = frozenset("da das de del della den der des di do dos du la le st ten ter van vande vander von".split())
+
+_WORD_RE = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+# Distinct raw strings remembered by author_key; the memo starts over beyond this.
+MEMO_SIZE = 50_000
+
+def fold(s: str) -> str:
+    """Diacritic-, apostrophe- and case-folded text with canonical hyphens."""
+    s = unicodedata.normalize("NFKD", s or "").translate(_CANON)
+    if not s.isascii():
+        s = "".join(c for c in s if not unicodedata.combining(c))
+    return s.casefold()
+
+def name_words(s: str):
+    """Folded words of a name ("Smith-Jones, J." -> ["smith-jones", "j"])."""
+    return _WORD_RE.findall(fold(s))
+
+def _author_key(name: str) -> str:
+    words = name_words(name.split(",", 1)[0])
+    while len(words) > 1 and words[0] in PARTICLES:
+        del words[0]
+    return words[0] if words else "unknown"
+
+class _AuthorKeys(dict):
+    """raw name -> interned key, computed on first use."""
+    def __missing__(self, name):
+        if len(self) >= MEMO_SIZE:
+            self.clear()
+        key = self[name] = sys.intern(_author_key(name))
+        return key
+
+_author_keys = _AuthorKeys()
+
+def author_key(name: str) -> str:
+    """
+    Matching key of an author as written anywhere: a cited "van Dijk" or
+    "Müller et al.", a reference entry's "Van Dijk, J. A." or a library
+    record's last name. "unknown" when there is no name.
+    """
+    return _author_keys[name or ""]
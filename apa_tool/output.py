@@ -0,0 +1,64 @@
+"""
+Output path for formatted documents.
+
+`doc.save(BytesIO)` + `getvalue()` keeps the whole .docx in memory (often
+twice) for the rest of the rerun, and `st.download_button(data=bytes)` then
+parks another copy in Streamlit's media store until the session's next
+rerun. Instead the document is saved once into a SpooledTemporaryFile that
+moves to disk past SPOOL_MAX_MEMORY, and the download button is given a
+zero-argument reader so the bytes are only materialized when the user
+actually clicks Download.
+"""
+import tempfile
+import zipfile
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+ZIP_MIME = "application/zip"
+
+# Outputs larger than this are written to a temp file instead of RAM.
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+def save_docx_spooled(doc, max_memory=SPOOL_MAX_MEMORY):
+    """Save `doc` into a rewound SpooledTemporaryFile (deleted when closed or collected)."""
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+    doc.save(spool)
+    spool.seek(0)
+    return spool
+
+def zip_files_spooled(members, max_memory=SPOOL_MAX_MEMORY):
+    """
+    ZIP [(path, name in archive)] into a rewound SpooledTemporaryFile. A .docx
+    is already deflated, so members are stored rather than compressed again.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+    with zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_STORED) as zf:
+        for path, arcname in members:
+            zf.write(path, arcname)
+    spool.seek(0)
+    return spool
+
+def spooled_size(spool):
+    """Size in bytes of a spooled output; the read position is kept."""
+    pos = spool.tell()
+    spool.seek(0, 2)
+    size = spool.tell()
+    spool.seek(pos)
+    return size
+
+def human_size(nbytes):
+    """Byte count for a download button label ("48 KB", "3.1 MB")."""
+    if nbytes < 1024 * 1024:
+        return f"{max(1, round(nbytes / 1024))} KB"
+    return f"{nbytes / (1024 * 1024):.1f} MB"
+
+def spooled_reader(spool):
+    """
+    Deferred `data=` for st.download_button: reads the spooled file on click.
+
+    The closure keeps the spool alive for as long as Streamlit keeps the
+    deferred download registered (until the next rerun of the session).
+    """
+    def read():
+        spool.seek(0)
+        return spool.read()
+    return read
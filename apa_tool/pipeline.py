@@ -0,0 +1,232 @@
+"""
+End-to-end check and format steps on raw .docx bytes.
+
+The Streamlit apps and the command line both go through these so a paper
+gets the same report no matter where it was checked. The apps run the
+format and build steps as background jobs (see jobs.JobRunner); each step's
+*_stages function lists the stages it times, for their progress bars.
+"""
+import io
+
+from apa_tool.apa_format import font_from_choice
+from apa_tool.cache import content_hash, make_parsed_upload
+from apa_tool.checker import find_references_start, iter_citations, reference_paragraphs, split_reference_entries
+from apa_tool.reader import iter_paragraphs
+from apa_tool.report import build_check_report, build_report, library_ref_details
+from apa_tool.timing import timed
+
+def _scan_citations(paragraphs, timer, memo):
+    """Citations of `paragraphs`; with a rescan.ScanMemo only new or changed paragraphs are scanned."""
+    if memo is None:
+        with timed(timer, "citation scan"):
+            return tuple(iter_citations(paragraphs))
+    with timed(timer, "citation scan (incremental)"):
+        citations = memo.citations(paragraphs)
+    if timer is not None:
+        timer.note("paragraphs rescanned", scanned=memo.scanned, reused=memo.reused)
+    return citations
+
+def cached_parse(data, parse, cache=None, timer=None):
+    """parse(data) through a cache.ParseCache (if given), timing the lookup and noting hits."""
+    if cache is None:
+        return parse(data)
+    with timed(timer, "parse cache lookup"):
+        digest = content_hash(data)
+        parsed = cache.get(digest)
+    if parsed is not None:
+        if timer is not None:
+            timer.note("parse cache hit")
+        return parsed
+    parsed = parse(data)
+    cache.put(digest, parsed)
+    return parsed
+
+def parse_upload(data, timer=None, memo=None):
+    """
+    Paragraph table (every story, see reader.iter_paragraphs), References
+    heading index and every citation (with its location).
+    """
+    with timed(timer, "DOCX parse"):
+        paragraphs = list(iter_paragraphs(data))
+        references_idx = find_references_start(paragraphs)
+    citations = _scan_citations(paragraphs, timer, memo)
+    return make_parsed_upload(paragraphs, references_idx=references_idx, citations=citations)
+
+def check_parsed(parsed, timer=None, memo=None):
+    """
+    Check report for a ParsedUpload (or a DocumentIndex, which has the same
+    paragraphs / references_idx / citations), or None if there is no
+    References heading. With a rescan.ScanMemo, entries seen in the last
+    scan keep their parsed keys.
+    """
+    if parsed.references_idx is None:
+        return None
+    with timed(timer, "reference split"):
+        ref_entries = split_reference_entries(reference_paragraphs(parsed.paragraphs, parsed.references_idx))
+    with timed(timer, "key extraction + compare"):
+        return build_check_report(parsed.citations, ref_entries, memo)
+
+def parsed_from_index(index, timer=None, memo=None):
+    """ParsedUpload for the (not yet modified) document behind a DocumentIndex."""
+    if memo is None:
+        with timed(timer, "citation scan"):
+            citations = index.citations
+    else:
+        citations = _scan_citations(index.paragraphs, timer, memo)
+    return make_parsed_upload(index.paragraphs, index.references_idx, citations)
+
+def format_stages(add_pnums=True, format_refs=True, check=False, upload=False):
+    """Names of the timed stages format_document goes through (for job progress)."""
+    stages = ["upload read"] if upload else []
+    stages += ["DOCX parse", "document index"]
+    if check:
+        stages += ["reference split", "key extraction + compare"]
+    stages += ["format: margins + font", "format: body paragraphs"]
+    if add_pnums:
+        stages.append("format: page numbers")
+    if format_refs:
+        stages.append("format: references")
+    stages.append("save")
+    return stages
+
+def format_document(data, out=None, font_choice="Times New Roman 12", add_pnums=True, format_refs=True,
+                    use_styles=False, check=False, cache=None, timer=None, memo=None):
+    """
+    Apply APA formatting to .docx bytes (or an upload: anything with
+    getvalue(), read as the run's "upload read" stage) and save the result
+    to `out` (a path or a writable binary stream), or to a spooled file when
+    `out` is None.
+
+    Returns {"output", "refs_rebuilt", "parsed", "report"}: `output` is `out`
+    or the rewound spooled file; with `check`, `parsed` is the input
+    document's ParsedUpload (through `cache` if given) and `report` its check
+    (None without a References heading). The document is indexed once for
+    everything.
+    """
+    from docx import Document
+
+    from apa_tool.formatting import apply_apa_formatting
+    from apa_tool.index import DocumentIndex
+    from apa_tool.output import save_docx_spooled
+
+    if not isinstance(data, bytes):
+        with timed(timer, "upload read"):
+            data = data.getvalue()
+    with timed(timer, "DOCX parse"):
+        doc = Document(io.BytesIO(data))
+    with timed(timer, "document index"):
+        index = DocumentIndex(doc)
+    parsed = report = None
+    if check:
+        parsed = cached_parse(data, lambda _: parsed_from_index(index, timer, memo), cache, timer)
+        report = check_parsed(parsed, timer, memo)
+    refs_rebuilt = apply_apa_formatting(
+        doc, font_choice=font_choice, add_pnums=add_pnums, format_refs=format_refs, use_styles=use_styles,
+        index=index, timer=timer,
+    )
+    with timed(timer, "save"):
+        if out is None:
+            out = save_docx_spooled(doc)
+        else:
+            doc.save(out)
+    return {"output": out, "refs_rebuilt": refs_rebuilt, "parsed": parsed, "report": report}
+
+def build_stages(margins=True, pagenum=True, refs=True, checks=True):
+    """Names of the timed stages build_formatted_docx goes through (for job progress)."""
+    stages = ["DOCX parse", "document index"]
+    if margins:
+        stages += ["format: margins + font", "format: body paragraphs"]
+    if pagenum:
+        stages.append("format: page numbers")
+    if refs:
+        stages += ["library read", "format: references"]
+        if checks:
+            stages.append("key extraction + compare")
+    stages.append("save")
+    return stages
+
+def build_formatted_docx(data, library, font, margins=True, pagenum=True, refs=True, alpha=True, checks=True,
+                         styles=False, cache=None, memo=None, timer=None):
+    """
+    The "Build formatted DOCX" run: format the paper, rebuild its References
+    from a library.ReferenceLibrary and (with `checks`) compare the two.
+    Returns {"output", "report", "parsed"}; `output` is a rewound spooled
+    file.
+    """
+    from docx import Document
+
+    from apa_tool.formatting import (
+        add_page_number_top_right,
+        apply_body_paragraph_formatting,
+        apply_body_paragraph_styles,
+        rebuild_references_section,
+        set_default_font,
+        set_document_margins,
+    )
+    from apa_tool.index import DocumentIndex
+    from apa_tool.output import save_docx_spooled
+
+    # Load, and index the body once for every pass below
+    with timed(timer, "DOCX parse"):
+        doc = Document(io.BytesIO(data))
+    with timed(timer, "document index"):
+        index = DocumentIndex(doc)
+    parsed = None
+    if checks and refs:
+        # Citations in the uploaded paper; cached from Scan if it ran.
+        parsed = cached_parse(data, lambda _: parsed_from_index(index, timer, memo), cache, timer)
+
+    # Apply formatting
+    if margins:
+        with timed(timer, "format: margins + font"):
+            set_document_margins(doc, 1.0)
+            set_default_font(doc, *font_from_choice(font))
+        with timed(timer, "format: body paragraphs"):
+            if styles:
+                apply_body_paragraph_styles(doc, first_line_indent_in=0.5, index=index)
+            else:
+                apply_body_paragraph_formatting(doc, first_line_indent_in=0.5, index=index)
+
+    # Page numbers
+    if pagenum:
+        with timed(timer, "format: page numbers"):
+            add_page_number_top_right(doc)
+
+    # References rebuild
+    report = None
+    if refs:
+        # Stored APA strings (alphabetized by the library's author/year index);
+        # records are only decoded when the report needs their keys.
+        order = "apa" if alpha else "position"
+        with timed(timer, "library read"):
+            if checks:
+                entries = library.entries(order=order)
+                records = [r for r, _ in entries]
+                formatted = [f for _, f in entries]
+            else:
+                formatted = library.formatted(order=order)
+
+        with timed(timer, "format: references"):
+            rebuild_references_section(doc, formatted, use_styles=styles, index=index)
+
+        if checks:
+            # Same engine and key normalization as the References check.
+            with timed(timer, "key extraction + compare"):
+                report = build_report(parsed.citations, library_ref_details(records, formatted))
+
+    # Output (spooled; spills to disk for large documents)
+    with timed(timer, "save"):
+        out = save_docx_spooled(doc)
+    return {"output": out, "report": report, "parsed": parsed}
+
+def format_docx_to(data, out, font_choice="Times New Roman 12", add_pnums=True, format_refs=True, use_styles=False,
+                   check=False):
+    """
+    format_document into `out` (a path or a writable binary stream), for the
+    CLI. Returns (refs_rebuilt, report).
+    """
+    result = format_document(
+        data, out, font_choice=font_choice, add_pnums=add_pnums, format_refs=format_refs, use_styles=use_styles,
+        check=check,
+    )
+    return result["refs_rebuilt"], result["report"]
@@ -0,0 +1,214 @@
+"""
+Read-only streaming access to the text of a .docx file.
+
+python-docx builds the whole document tree and a proxy object per paragraph.
+For checking we only need paragraph text and style IDs, so this module
+iterparses the XML parts straight out of the zip and clears each block as
+soon as it has been read, keeping memory flat on large papers.
+
+Every ``w:p`` of every story is read, tagged with the story it belongs to:
+``word/document.xml`` in document order (top-level paragraphs, table cells,
+text boxes and content controls), then the header, footer, footnote and
+endnote parts the document's relationships point to. The same walk
+(iter_story_elements) serves this reader, over iterparse events, and
+DocumentIndex, over iterwalk events of the loaded python-docx tree, so both
+see the same paragraphs in the same order.
+"""
+import io
+import posixpath
+import zipfile
+from collections import namedtuple
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+W_BODY = _w("body")
+W_HDR = _w("hdr")
+W_FTR = _w("ftr")
+W_FOOTNOTES = _w("footnotes")
+W_FOOTNOTE = _w("footnote")
+W_ENDNOTES = _w("endnotes")
+W_ENDNOTE = _w("endnote")
+W_TXBX_CONTENT = _w("txbxContent")
+W_P = _w("p")
+W_TBL = _w("tbl")
+W_SDT = _w("sdt")
+W_R = _w("r")
+W_HYPERLINK = _w("hyperlink")
+W_PPR = _w("pPr")
+W_PSTYLE = _w("pStyle")
+W_VAL = _w("val")
+W_TYPE = _w("type")
+
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS = "word/_rels/document.xml.rels"
+REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+# Stories. BODY, TABLE and TEXTBOX paragraphs live in document.xml; the
+# others each have their own part(s).
+BODY = "body"
+TABLE = "table"
+TEXTBOX = "textbox"
+HEADER = "header"
+FOOTER = "footer"
+FOOTNOTE = "footnote"
+ENDNOTE = "endnote"
+
+# Relationship type (last path segment) -> story, in reading order.
+_PART_STORIES = {"header": HEADER, "footer": FOOTER, "footnotes": FOOTNOTE, "endnotes": ENDNOTE}
+_STORY_ORDER = {story: i for i, story in enumerate(_PART_STORIES.values())}
+
+# Story of a document.xml paragraph nested in one of these (the innermost wins).
+_NESTED_STORIES = {W_TXBX_CONTENT: TEXTBOX, W_TBL: TABLE}
+
+# Blocks directly under these are dropped once read.
+_CONTAINERS = frozenset((W_BODY, W_HDR, W_FTR, W_FOOTNOTES, W_ENDNOTES))
+_BLOCK_TAGS = (W_P, W_TBL, W_SDT, W_FOOTNOTE, W_ENDNOTE)
+
+# Same text equivalents python-docx uses for run inner content.
+_RUN_TEXT = {
+    _w("tab"): "\t",
+    _w("ptab"): "\t",
+    _w("cr"): "\n",
+    _w("noBreakHyphen"): "-",
+}
+
+# Lightweight stand-in for docx.text.paragraph.Paragraph: has `.text`, so the
+# paragraph-based helpers (find_references_start, split_reference_entries)
+# accept it unchanged. `story` is one of the story names above.
+StreamParagraph = namedtuple("StreamParagraph", ["text", "style_id", "story"], defaults=(BODY,))
+
+def _run_text(r) -> str:
+    parts = []
+    for e in r:
+        tag = e.tag
+        if tag == _w("t"):
+            parts.append(e.text or "")
+        elif tag == _w("br"):
+            if e.get(W_TYPE, "textWrapping") == "textWrapping":
+                parts.append("\n")
+        else:
+            parts.append(_RUN_TEXT.get(tag, ""))
+    return "".join(parts)
+
+def paragraph_text(p) -> str:
+    """Text of a ``w:p`` element, matching python-docx's ``Paragraph.text``."""
+    parts = []
+    for child in p:
+        if child.tag == W_R:
+            parts.append(_run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(_run_text(r) for r in child if r.tag == W_R)
+    return "".join(parts)
+
+def paragraph_style_id(p):
+    ppr = p.find(W_PPR)
+    if ppr is None:
+        return None
+    ps = ppr.find(W_PSTYLE)
+    return ps.get(W_VAL) if ps is not None else None
+
+def paragraph_story(p, part_story=BODY):
+    """
+    Story of a ``w:p`` in a part whose own story is `part_story`, or None for
+    paragraphs that are not content: the legacy mc:Fallback copy of a text
+    box (its mc:Choice twin is read) and footnote/endnote separators.
+    """
+    story = None
+    for el in p.iterancestors():
+        tag = el.tag
+        if tag == MC_FALLBACK:
+            return None
+        if (tag == W_FOOTNOTE or tag == W_ENDNOTE) and el.get(W_TYPE) is not None:
+            return None
+        if story is None and part_story == BODY:
+            story = _NESTED_STORIES.get(tag)
+    return story or part_story
+
+def iter_story_elements(events, part_story=BODY, clear=False):
+    """
+    (``w:p`` element, story) per content paragraph, from the "end" events of
+    one part (etree.iterparse or etree.iterwalk). Nested paragraphs come
+    before the paragraph or table that holds them, in both.
+
+    With `clear`, each finished top-level block and everything before it is
+    dropped; only for streamed parts, never for a live document.
+    """
+    for _, el in events:
+        if el.tag == W_P:
+            story = paragraph_story(el, part_story)
+            if story is not None:
+                yield el, story
+        if clear:
+            parent = el.getparent()
+            if parent is not None and parent.tag in _CONTAINERS:
+                el.clear()
+                while el.getprevious() is not None:
+                    del parent[0]
+
+def iter_part_paragraphs(fh, part_story=BODY):
+    """StreamParagraph per content paragraph of one XML part (a binary file object)."""
+    events = etree.iterparse(fh, events=("end",), tag=_BLOCK_TAGS)
+    for p, story in iter_story_elements(events, part_story, clear=True):
+        yield StreamParagraph(paragraph_text(p), paragraph_style_id(p), story)
+
+def story_parts(relationships):
+    """
+    [(story, part name)] for the header/footer/footnote/endnote parts among
+    `relationships`, (type URI, part name) pairs from document.xml's rels,
+    in reading order.
+    """
+    parts = set()
+    for reltype, name in relationships:
+        story = _PART_STORIES.get(reltype.rsplit("/", 1)[-1])
+        if story is not None:
+            parts.add((story, name.lstrip("/")))
+    return sorted(parts, key=lambda sp: (_STORY_ORDER[sp[0]], sp[1]))
+
+def _document_relationships(zf):
+    try:
+        root = etree.fromstring(zf.read(DOCUMENT_RELS))
+    except KeyError:
+        return []
+    rels = []
+    for rel in root.iter(f"{{{REL_NS}}}Relationship"):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            name = target[1:]
+        else:
+            name = posixpath.normpath(posixpath.join(posixpath.dirname(DOCUMENT_PART), target))
+        rels.append((rel.get("Type", ""), name))
+    return rels
+
+def iter_paragraphs(source):
+    """
+    Yield a StreamParagraph(text, style_id, story) for every paragraph of
+    every story: document.xml first (body, table cells, text boxes, in
+    document order), then headers, footers, footnotes and endnotes.
+
+    `source` is the raw .docx bytes, a path, or a binary file object. Each
+    part is streamed and discarded block by block.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    zf = zipfile.ZipFile(source)
+    try:
+        with zf.open(DOCUMENT_PART) as fh:
+            yield from iter_part_paragraphs(fh, BODY)
+        for story, name in story_parts(_document_relationships(zf)):
+            try:
+                fh = zf.open(name)
+            except KeyError:
+                continue  # dangling relationship
+            with fh:
+                yield from iter_part_paragraphs(fh, story)
+    finally:
+        zf.close()
@@ -0,0 +1,182 @@
+"""
+Citation / reference report shared by app.py, "APA App" and the CLI.
+
+Both sides are reduced to the same normalized (surname token, year) keys
+once: the in-text side from checker.Citation records (which also carry the
+paragraph each citation sits in), the reference side either from a parsed
+References section or from reference-library records. The comparison is
+then a pair of set differences, so the report is linear in citations plus
+references.
+"""
+import csv
+import io
+from array import array
+from itertools import islice
+
+from apa_tool.apa_format import apa_reference_string, reference_key_guess
+from apa_tool.checker import PARENTHETICAL, extract_reference_keys
+from apa_tool.matching import suggest_matches
+
+def index_citations(citations):
+    """
+    Occurrence index: key -> flat array("I") of (paragraph_index, start,
+    end) triples in document order, 12 bytes per citation. The offsets
+    are enough to cut a snippet later (citation_context) without
+    rescanning the paragraph.
+    """
+    occurrences = {}
+    for c in citations:
+        occ = occurrences.get(c.key)
+        if occ is None:
+            occ = occurrences[c.key] = array("I")
+        occ.extend((c.paragraph_index, c.span[0], c.span[1]))
+    return occurrences
+
+def iter_occurrences(occ):
+    """(paragraph_index, start, end) triples of one key's occurrence array."""
+    it = iter(occ)
+    return zip(it, it, it)
+
+def occurrence_paragraphs(occ):
+    """Sorted, distinct paragraph indexes of one key's occurrence array."""
+    paras = []
+    for p in occ[0::3]:
+        if not paras or paras[-1] != p:
+            paras.append(p)
+    return paras
+
+def keys_by_kind(citations):
+    """(parenthetical keys, narrative keys) as two sets."""
+    paren, narr = set(), set()
+    for c in citations:
+        (paren if c.kind == PARENTHETICAL else narr).add(c.key)
+    return paren, narr
+
+def library_ref_details(refs, entries=None):
+    """
+    [{"entry", "key"}] for reference-library records, keyed like the scan.
+    `entries` are the already formatted reference strings, if at hand.
+    """
+    if entries is None:
+        entries = [apa_reference_string(r) for r in refs]
+    details = []
+    for r, entry in zip(refs, entries):
+        details.append({"entry": entry, "key": reference_key_guess(r)})
+    return details
+
+def build_report(citations, ref_details):
+    """
+    Compare citations (checker.Citation records) with reference details
+    ({"entry", "key"} dicts, one per reference entry).
+
+    Keys in the result:
+      cited_count / ref_count:          distinct cited keys / reference entries
+      cited_not_in_refs / refs_not_cited: sorted key lists
+      suggestions:                      ranked approximate matches for
+                                        cited_not_in_refs among all
+                                        reference keys
+      occurrences:                      per cited key, its (paragraph_index,
+                                        start, end) array (index_citations)
+      ref_details / cited_keys:         the inputs, for debug output
+    """
+    occurrences = index_citations(citations)
+    cited_keys = set(occurrences)
+    ref_keys = {d["key"] for d in ref_details}
+    cited_not_in_refs = cited_keys - ref_keys
+    refs_not_cited = ref_keys - cited_keys
+    return {
+        "cited_count": len(cited_keys),
+        "ref_count": len(ref_details),
+        "cited_not_in_refs": sorted(cited_not_in_refs),
+        "refs_not_cited": sorted(refs_not_cited),
+        "suggestions": suggest_matches(cited_not_in_refs, ref_keys),
+        "occurrences": occurrences,
+        "ref_details": ref_details,
+        "cited_keys": sorted(cited_keys),
+    }
+
+def build_check_report(citations, ref_entries, memo=None):
+    """
+    Report against the entries of a document's own References section
+    (keys reused from a rescan.ScanMemo where the entry is unchanged).
+    """
+    extract = memo.reference_keys if memo is not None else extract_reference_keys
+    _, ref_details = extract(ref_entries)
+    return build_report(citations, ref_details)
+
+def citation_rows(report, keys, max_paragraphs=10):
+    """Table rows (key, occurrence count, 1-based paragraph numbers) for display."""
+    rows = []
+    for key in keys:
+        occ = report["occurrences"].get(key, ())
+        paras = occurrence_paragraphs(occ) if occ else []
+        shown = ", ".join(str(i + 1) for i in paras[:max_paragraphs])
+        if len(paras) > max_paragraphs:
+            shown += f", … (+{len(paras) - max_paragraphs})"
+        rows.append({"Key": f"{key[0]} ({key[1]})", "Citations": len(occ) // 3, "Paragraphs": shown})
+    return rows
+
+def citation_context(text, start, end, width=60):
+    """(before, citation, after) around text[start:end], about `width` characters each side."""
+    before = text[max(0, start - width) : start]
+    if start > width and " " in before:
+        before = "…" + before.split(" ", 1)[1]
+    after = text[end : end + width]
+    if end + width < len(text) and " " in after:
+        after = after.rsplit(" ", 1)[0] + "…"
+    return before, text[start:end], after
+
+def occurrence_rows(occurrences, paragraphs, key, limit=50, width=60):
+    """
+    Table rows for where `key` is cited: 1-based paragraph number, story
+    (body, table, footnote, ...) and the text around each occurrence. Snippets are cut from the indexed offsets
+    on demand, for at most `limit` occurrences.
+    """
+    rows = []
+    for p, start, end in islice(iter_occurrences(occurrences.get(key, ())), limit):
+        before, cited, after = citation_context(paragraphs[p].text, start, end, width)
+        rows.append({"Paragraph": p + 1, "Story": paragraphs[p].story, "Before": before, "Citation": cited,
+                     "After": after})
+    return rows
+
+# -----------------------------
+# Batch report
+# -----------------------------
+ISSUE_FIELDS = ["File", "Issue", "Author", "Year", "Detail"]
+
+def issue_rows(results):
+    """
+    One row per problem across per-file results (the dicts of
+    cli.check_file / cli.format_file / cli.iter_pool): missing and unused
+    references, files without a References heading, and files that failed.
+    """
+    rows = []
+    for result in results:
+        name = result.get("name", result["file"])
+        if "error" in result:
+            rows.append({"File": name, "Issue": "could not be processed", "Author": "", "Year": "",
+                         "Detail": result["error"]})
+            continue
+        if result.get("references_found") is False:
+            rows.append({"File": name, "Issue": "no References heading", "Author": "", "Year": "",
+                         "Detail": ""})
+            continue
+        best = {}
+        for sug in result.get("suggestions", ()):
+            best.setdefault(tuple(sug["cited"]), sug["reference"])
+        for key in result.get("cited_not_in_refs", ()):
+            ref = best.get(tuple(key))
+            rows.append({"File": name, "Issue": "cited, not in References", "Author": key[0], "Year": key[1],
+                         "Detail": f"did you mean {ref[0]} ({ref[1]})?" if ref else ""})
+        for key in result.get("refs_not_cited", ()):
+            rows.append({"File": name, "Issue": "in References, not cited", "Author": key[0], "Year": key[1],
+                         "Detail": ""})
+    return rows
+
+def issues_csv(results) -> bytes:
+    """issue_rows as UTF-8 CSV (with a BOM so Excel keeps the accents)."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=ISSUE_FIELDS)
+    writer.writeheader()
+    writer.writerows(issue_rows(results))
+    return buf.getvalue().encode("utf-8-sig")
@@ -0,0 +1,87 @@
+"""
+Incremental rescans of revised uploads.
+
+A re-uploaded draft usually differs from the previous one in a paragraph or
+two, but its bytes (and so its ParseCache key) are new. A ScanMemo lives in
+the user's session and remembers, by content hash, the citations found in
+each paragraph and the key parsed from each reference entry of the last
+scan. The next scan runs the citation regex only over paragraphs whose hash
+it has not seen and reuses everything else, with paragraph indexes taken
+from the new document.
+
+Only the last scan's hashes are kept, so the memo is never bigger than one
+document's worth of results.
+
+A memo is not safe to share between threads: a scan running in a background
+job gets its own copy(), and the session adopts that copy once the job is
+done.
+"""
+import copy
+import hashlib
+
+from apa_tool.checker import Citation, extract_reference_keys, scan_text_citations
+
+def text_digest(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=8).digest()
+
+class ScanMemo:
+    def __init__(self):
+        self._citations = {}  # paragraph digest -> ((kind, key, span), ...)
+        self._ref_keys = {}  # reference entry digest -> (author token, year)
+        # Paragraphs / entries parsed vs. reused by the last call.
+        self.scanned = self.reused = 0
+        self.refs_parsed = self.refs_reused = 0
+
+    def copy(self):
+        """
+        An independent memo that starts from this one's last scan. Cheap: a
+        scan replaces the tables rather than changing them, so both memos
+        can share the current ones.
+        """
+        return copy.copy(self)
+
+    def citations(self, paragraphs):
+        """Citations of `paragraphs` (as checker.iter_citations), scanning only unseen texts."""
+        seen, kept = self._citations, {}
+        out = []
+        scanned = reused = 0
+        for i, p in enumerate(paragraphs):
+            text = p.text
+            if not text:
+                continue
+            digest = text_digest(text)
+            found = kept.get(digest)
+            if found is None:
+                found = seen.get(digest)
+                if found is None:
+                    found = tuple((c.kind, c.key, c.span) for c in scan_text_citations(text))
+                    scanned += 1
+                else:
+                    reused += 1
+                kept[digest] = found
+            else:
+                reused += 1
+            for kind, key, span in found:
+                out.append(Citation(kind, key, i, span))
+        self._citations = kept
+        self.scanned, self.reused = scanned, reused
+        return tuple(out)
+
+    def reference_keys(self, entries):
+        """checker.extract_reference_keys, reusing the keys of entries seen last time."""
+        seen, kept = self._ref_keys, {}
+        keys, detailed = set(), []
+        parsed = 0
+        for entry in entries:
+            digest = text_digest(entry)
+            key = kept.get(digest) or seen.get(digest)
+            if key is None:
+                _, (detail,) = extract_reference_keys([entry])
+                key = detail["key"]
+                parsed += 1
+            kept[digest] = key
+            keys.add(key)
+            detailed.append({"entry": entry, "key": key})
+        self._ref_keys = kept
+        self.refs_parsed, self.refs_reused = parsed, len(entries) - parsed
+        return keys, detailed
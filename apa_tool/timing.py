@@ -0,0 +1,81 @@
+"""
+Per-stage wall time, CPU time and peak memory for one pipeline run.
+
+Engine functions take an optional ``timer`` and wrap their stages in
+``timed(timer, "stage name")``; with no timer that is a no-op. Every finished
+stage is kept in ``timer.records`` (for the debug table) and logged as one
+JSON line on the ``apa_tool.stages`` logger.
+
+Memory tracing uses tracemalloc, which slows Python allocation noticeably,
+so it is only turned on when asked for (the "Show debug details" run). It is
+also process-wide: starting, stopping or resetting it for one stage would
+corrupt any other stage being traced at the same time (another session, a
+second background job, a nested stage). So one stage at a time owns it; a
+stage that starts while another owns it, or while something outside
+StageTimer is tracing, records no peak (peak_kib None) rather than a wrong
+one. The owner's peak still includes what other threads allocate meanwhile.
+Allocations made inside libxml2 (lxml) are not seen by tracemalloc.
+"""
+import json
+import logging
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("apa_tool.stages")
+
+# Held by the one stage whose memory is being traced.
+_tracing = threading.Lock()
+
+class StageTimer:
+    def __init__(self, trace_memory=False, log=logger, **context):
+        self.run_id = uuid.uuid4().hex[:8]
+        self.trace_memory = trace_memory
+        self.log = log
+        self.context = context
+        self.records = []
+
+    @contextmanager
+    def stage(self, name):
+        # Tracing is switched on for the stage only, so a run that is cut
+        # short (st.stop(), an exception) never leaves tracemalloc running.
+        traced = self.trace_memory and _tracing.acquire(blocking=False)
+        if traced and tracemalloc.is_tracing():
+            # Someone outside StageTimer is tracing; leave their peak alone.
+            _tracing.release()
+            traced = False
+        if traced:
+            tracemalloc.start()
+        w0 = time.perf_counter()
+        c0 = time.thread_time()
+        try:
+            yield
+        finally:
+            record = {
+                "stage": name,
+                "wall_ms": round((time.perf_counter() - w0) * 1000, 2),
+                "cpu_ms": round((time.thread_time() - c0) * 1000, 2),
+                "peak_kib": None,
+            }
+            if traced:
+                record["peak_kib"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                tracemalloc.stop()
+                _tracing.release()
+            self.records.append(record)
+            self.log.info("stage %s", json.dumps({"run": self.run_id, **self.context, **record}))
+
+    def note(self, name, **fields):
+        """Record a zero-cost event (e.g. a cache hit) alongside the timed stages."""
+        record = {"stage": name, "wall_ms": 0.0, "cpu_ms": 0.0, "peak_kib": None, **fields}
+        self.records.append(record)
+        self.log.info("stage %s", json.dumps({"run": self.run_id, **self.context, **record}))
+
+    @property
+    def total_wall_ms(self):
+        return round(sum(r["wall_ms"] for r in self.records), 2)
+
+def timed(timer, name):
+    """`timer.stage(name)`, or a no-op context when there is no timer."""
+    return timer.stage(name) if timer is not None else nullcontext()
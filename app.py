@@ -1,281 +1,267 @@
-import io
-import re
-from datetime import date
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import streamlit as st
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
+from apa_tool.apa_format import FONT_CHOICES
+from apa_tool.cache import ParseCache
+from apa_tool.cli import check_file, format_file, iter_finished, submit_files, unique_names
+from apa_tool.jobs import CANCELLED, FAILED, JobRunner
+from apa_tool.output import DOCX_MIME, ZIP_MIME, human_size, spooled_reader, spooled_size, zip_files_spooled
+from apa_tool.pipeline import cached_parse, check_parsed, format_document, format_stages, parse_upload
+from apa_tool.report import citation_rows, issues_csv, occurrence_rows
+from apa_tool.rescan import ScanMemo
+from apa_tool.timing import StageTimer
 
 st.set_page_config(page_title="APA Checker + Formatter", layout="wide")
 st.title("APA Reference Checker + Formatter (DOCX)")
 
 # -----------------------------
-# Citation detection (best-effort)
+# Parse cache (shared across reruns and sessions)
 # -----------------------------
-PAREN_CIT_RE = re.compile(r"\((?P<authors>[^()]+?),\s*(?P<year>\d{4}|n\.d\.)\)")
-NARR_CIT_RE = re.compile(r"\b(?P<author>[A-Z][A-Za-z’'\-]+)\s*\((?P<year>\d{4}|n\.d\.)\)")
-
-def normalize_year(y: str) -> str:
-    y = (y or "").strip().lower()
-    if y == "n.d.":
-        return "n.d."
-    return y if re.fullmatch(r"\d{4}", y) else "n.d."
-
-def normalize_author_token(s: str) -> str:
-    s = (s or "").strip()
-    s = re.sub(r"[^A-Za-z’'\- ]", "", s).strip()
-    if not s:
-        return "unknown"
-    return s.split()[0].lower()
-
-def extract_intext_citations(all_text: str):
-    keys = set()
-
-    # Parenthetical
-    for m in PAREN_CIT_RE.finditer(all_text):
-        authors = m.group("authors")
-        year = normalize_year(m.group("year"))
-        first = authors.split("&")[0]
-        first = first.split(" and ")[0]
-        first = first.split("et al.")[0]
-        keys.add((normalize_author_token(first), year))
-
-    # Narrative
-    for m in NARR_CIT_RE.finditer(all_text):
-        author = m.group("author")
-        year = normalize_year(m.group("year"))
-        keys.add((normalize_author_token(author), year))
-
-    return keys
+@st.cache_resource
+def get_parse_cache():
+    return ParseCache(max_entries=32, max_bytes=256 * 1024 * 1024)
+
+# Per-session memo of the last scan: a revised re-upload only rescans the
+# paragraphs and reference entries that changed.
+if "scan_memo" not in st.session_state:
+    st.session_state.scan_memo = ScanMemo()
+scan_memo = st.session_state.scan_memo
 
 # -----------------------------
-# References section parsing (best-effort)
+# Stage timings (debug)
 # -----------------------------
-def find_references_start(paragraphs):
-    for i, p in enumerate(paragraphs):
-        if p.text.strip().lower() == "references":
-            return i
-    return None
-
-def split_reference_entries(ref_paragraphs):
-    entries = []
-    current = ""
-
-    def looks_like_new_entry(t: str) -> bool:
-        t = t.strip()
-        if not t:
-            return False
-        if re.match(r"^[A-Z][A-Za-z’'\-]+,\s", t):
-            return True
-        if re.match(r"^[A-Z]", t) and re.search(r"\(\s*(\d{4}|n\.d\.)\s*\)", t[:80]):
-            return True
-        return False
-
-    for p in ref_paragraphs:
-        t = p.text.strip()
-        if not t:
-            continue
-        if looks_like_new_entry(t):
-            if current:
-                entries.append(current.strip())
-            current = t
-        else:
-            current = (current + " " + t).strip()
+# One JSON line per pipeline stage on the "apa_tool.stages" logger.
+_stage_log = logging.getLogger("apa_tool.stages")
+if not _stage_log.handlers:
+    _stage_log.addHandler(logging.StreamHandler())
+    _stage_log.setLevel(logging.INFO)
+
+def render_suggestions(suggestions):
+    """Ranked approximate matches in the References for the citations that have none."""
+    if not suggestions:
+        return
+    st.info("Did you mean? Likely references for the citations without an exact match:")
+    st.table([
+        {
+            "Cited in text": f"{s['cited'][0]} ({s['cited'][1]})",
+            "In References": f"{s['reference'][0]} ({s['reference'][1]})",
+            "Score": s["score"],
+        }
+        for s in suggestions[:50]
+    ])
+
+def render_stage_timings(timer):
+    st.write(f"**Stage timings** (run `{timer.run_id}`, {timer.total_wall_ms} ms total)")
+    st.table(timer.records)
+
+# A fragment: picking another key reruns only this block, not the whole
+# check (whose results exist only inside the Run button's rerun).
+@st.fragment
+def render_occurrences(report, paragraphs, keys, widget_key, limit=50):
+    """Where each of `keys` is cited, with the text around it (cut from the indexed offsets)."""
+    labels = {f"{k[0]} ({k[1]})": k for k in keys}
+    label = st.selectbox("Show where it is cited", list(labels), key=widget_key)
+    if label is None:
+        return
+    key = labels[label]
+    st.table(occurrence_rows(report["occurrences"], paragraphs, key, limit=limit))
+    total = len(report["occurrences"].get(key, ())) // 3
+    if total > limit:
+        st.caption(f"First {limit} of {total} citations shown.")
 
-    if current:
-        entries.append(current.strip())
+# -----------------------------
+# Format job (progress while it runs, the result once it is done)
+# -----------------------------
+# Formatting runs on a small thread pool shared by all sessions; a session
+# only keeps its job id, so reruns (and a reconnecting browser) find the job.
+@st.cache_resource
+def get_job_runner():
+    return JobRunner(max_workers=2)
+
+# Polls the job without rerunning the page; once the job is done, one full
+# rerun swaps the panel for the result.
+@st.fragment(run_every=0.5)
+def render_job_progress(job_id):
+    job = get_job_runner().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    with st.status(f"Formatting… ({job.elapsed:.0f} s)", expanded=True):
+        for name in job.stages_done:
+            st.write(f"✓ {name}")
+        if job.stage and job.stage not in job.stages_done:
+            st.write(f"… {job.stage}")
+    st.progress(job.progress, text=job.stage or "Waiting for a free worker")
+    if st.button("Cancel", disabled=job.cancel_requested):
+        job.cancel()
+    st.caption("Cancel takes effect when the current step finishes.")
+
+def render_format_result(job, requested):
+    if job.state == CANCELLED:
+        st.info("Formatting cancelled.")
+        return
+    if job.state == FAILED:
+        st.error(f"Formatting failed: {job.error}")
+        return
+    if "memo" in requested:
+        st.session_state.scan_memo = requested.pop("memo")
+    result = job.result
+    report, parsed = result["report"], result["parsed"]
+
+    if requested["also_check"] and report is None:
+        st.warning("No 'References' heading found. I can’t reliably check the reference list.")
+        st.info("Tip: Add a heading that is exactly 'References' at the end of the document.")
 
-    return entries
+    st.success(f"Formatted DOCX generated ({job.elapsed:.1f} s).")
+    st.download_button(
+        f"Download APA-formatted document (.docx, {human_size(spooled_size(result['output']))})",
+        data=spooled_reader(result["output"]),
+        file_name="paper_APA_formatted.docx",
+        mime=DOCX_MIME,
+    )
 
-def extract_reference_keys(reference_entries):
-    keys = set()
-    detailed = []
+    # Show check report (optional)
+    if report is not None:
+        st.divider()
+        st.subheader("Citation / Reference Check (best-effort)")
 
-    for entry in reference_entries:
-        ym = re.search(r"\(\s*(\d{4}|n\.d\.)\s*\)", entry)
-        year = normalize_year(ym.group(1) if ym else "n.d.")
+        m1, m2, m3 = st.columns(3)
+        m1.metric("In-text citations found", report["cited_count"])
+        m2.metric("Reference entries found", report["ref_count"])
+        m3.metric("Potential issues", len(report["cited_not_in_refs"]) + len(report["refs_not_cited"]))
 
-        am = re.match(r"^([A-Z][A-Za-z’'\-]+),\s", entry)
-        if am:
-            author_tok = normalize_author_token(am.group(1))
+        if not report["cited_not_in_refs"] and not report["refs_not_cited"]:
+            st.success("Looks consistent: every in-text citation appears to have a matching reference, and vice versa.")
         else:
-            pre = entry.split("(")[0]
-            author_tok = normalize_author_token(pre)
+            if report["cited_not_in_refs"]:
+                st.error("Cited in text but NOT found in References:")
+                st.table(citation_rows(report, report["cited_not_in_refs"]))
+                render_occurrences(report, parsed.paragraphs, report["cited_not_in_refs"], "occ_format")
+            if report["refs_not_cited"]:
+                st.warning("In References but NOT cited in text:")
+                st.write(report["refs_not_cited"])
+            render_suggestions(report["suggestions"])
 
-        k = (author_tok, year)
-        keys.add(k)
-        detailed.append({"entry": entry, "key": k})
+    if requested["format_refs"] and not result["refs_rebuilt"]:
+        st.info("Note: I didn’t find a 'References' heading to format. (Formatting still applied to the rest of the document.)")
 
-    return keys, detailed
+    if show_debug:
+        st.divider()
+        st.subheader("Debug details")
+        render_stage_timings(job.timer)
 
 # -----------------------------
-# DOCX formatting helpers
+# Batch (several uploads)
 # -----------------------------
-def delete_paragraph(paragraph):
-    p = paragraph._element
-    p.getparent().remove(p)
-    paragraph._p = paragraph._element = None
-
-
-def sort_reference_entries_apa(reference_entries):
-    """
-    Sort APA references alphabetically by:
-    - first author last name
-    - organization name if no author
-    - year as secondary key
+# Worker processes shared by every session's batches; each holds one
+# document at a time, so concurrent batches queue instead of each starting
+# a pool of their own.
+BATCH_WORKERS = min(4, os.cpu_count() or 1)
+
+@st.cache_resource
+def get_batch_pool():
+    # Fresh interpreters rather than forks of the (multi-threaded) server.
+    return ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+def submit_batch(fn, paths, *args):
+    try:
+        return submit_files(get_batch_pool(), fn, paths, *args)
+    except BrokenProcessPool:
+        # A worker died during an earlier batch; start a new pool.
+        get_batch_pool.clear()
+        return submit_files(get_batch_pool(), fn, paths, *args)
+
+def batch_status_line(result):
+    if "error" in result:
+        return f"❌ {result['name']}: {result['error']}"
+    parts = ["formatted"] if "output" in result else []
+    if result.get("references_found") is False:
+        parts.append("no References heading")
+    elif "cited_not_in_refs" in result:
+        parts.append(
+            f"{len(result['cited_not_in_refs'])} cited but not in References, "
+            f"{len(result['refs_not_cited'])} not cited"
+        )
+    icon = "⚠️" if result.get("references_found") is False else "✅"
+    return f"{icon} {result['name']}: " + ", ".join(parts)
+
+def batch_summary_rows(results):
+    return [
+        {
+            "File": r["name"],
+            "Status": "error" if "error" in r else ("no References heading" if r.get("references_found") is False else "ok"),
+            "Missing references": len(r.get("cited_not_in_refs", ())),
+            "Uncited references": len(r.get("refs_not_cited", ())),
+        }
+        for r in results
+    ]
+
+def run_batch(files, format_mode):
     """
-    def sort_key(entry):
-        entry = entry.strip()
-
-        # Author surname at start: "Smith, J."
-        m = re.match(r"^([A-Z][A-Za-z’'\-]+),", entry)
-        if m:
-            author = m.group(1).lower()
-        else:
-            # Organization author fallback
-            author = re.sub(r"[^A-Za-z]", "", entry.split("(")[0]).lower()
-
-        # Year
-        ym = re.search(r"\(\s*(\d{4}|n\.d\.)\s*\)", entry)
-        year = ym.group(1) if ym else "n.d."
+    Check or format several uploads in the shared pool of worker processes
+    (the CLI's workers), writing a status line per file as it finishes.
 
-        return (author, year)
-
-    return sorted(reference_entries, key=sort_key)
-
-
-def rebuild_references_section_sorted(doc: Document):
+    Returns (results in upload order, spooled ZIP of the formatted files or None).
     """
-    Rebuilds the References section:
-    - Alphabetizes entries
-    - Applies APA hanging indent + double spacing
-    """
-    idx = find_references_start(doc.paragraphs)
-    if idx is None:
-        return False
-
-    # Extract reference paragraphs
-    ref_paragraphs = doc.paragraphs[idx + 1 :]
-    raw_entries = split_reference_entries(ref_paragraphs)
-
-    if not raw_entries:
-        return False
-
-    # Sort alphabetically
-    sorted_entries = sort_reference_entries_apa(raw_entries)
-
-    # Delete old reference paragraphs
-    for p in list(doc.paragraphs[idx + 1 :]):
-        delete_paragraph(p)
-
-    # Reinsert sorted references
-    for entry in sorted_entries:
-        p = doc.add_paragraph(entry)
-        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        p.paragraph_format.line_spacing = 2.0
-        p.paragraph_format.left_indent = Inches(0.5)
-        p.paragraph_format.first_line_indent = Inches(-0.5)
-
-    # Format heading
-    heading = doc.paragraphs[idx]
-    heading.text = "References"
-    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    heading.paragraph_format.line_spacing = 2.0
-    heading.paragraph_format.first_line_indent = None
-    heading.paragraph_format.left_indent = None
-
-    return True
-
-def set_document_margins(doc: Document, inches=1.0):
-    for section in doc.sections:
-        section.top_margin = Inches(inches)
-        section.bottom_margin = Inches(inches)
-        section.left_margin = Inches(inches)
-        section.right_margin = Inches(inches)
-
-def set_default_font(doc: Document, font_name: str, font_size_pt: int):
-    style = doc.styles["Normal"]
-    style.font.name = font_name
-    style.font.size = Pt(font_size_pt)
-    style._element.rPr.rFonts.set(qn("w:eastAsia"), font_name)
-
-def add_page_number_top_right(doc: Document):
-    for section in doc.sections:
-        header = section.header
-        p = header.paragraphs[0] if header.paragraphs else header.add_paragraph()
-        p.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-
-        # Clear existing runs
-        for r in list(p.runs):
-            r.text = ""
-
-        run = p.add_run()
-        fldChar1 = OxmlElement("w:fldChar")
-        fldChar1.set(qn("w:fldCharType"), "begin")
-
-        instrText = OxmlElement("w:instrText")
-        instrText.set(qn("xml:space"), "preserve")
-        instrText.text = " PAGE "
-
-        fldChar2 = OxmlElement("w:fldChar")
-        fldChar2.set(qn("w:fldCharType"), "end")
-
-        run._r.append(fldChar1)
-        run._r.append(instrText)
-        run._r.append(fldChar2)
-
-def apply_body_paragraph_formatting(doc: Document, double_space=True, first_line_indent_in=0.5):
-    for p in doc.paragraphs:
-        # Double spacing everywhere by default
-        if double_space:
-            p.paragraph_format.line_spacing = 2.0
-
-        # Indent body paragraphs but avoid headings
-        style_name = (p.style.name if p.style else "") or ""
-        if "Heading" not in style_name and p.text.strip():
-            p.paragraph_format.first_line_indent = Inches(first_line_indent_in)
-
-def apply_references_hanging_indent(doc: Document):
-    idx = find_references_start(doc.paragraphs)
-    if idx is None:
-        return False
-
-    # Center the "References" heading
-    heading = doc.paragraphs[idx]
-    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    heading.paragraph_format.line_spacing = 2.0
-    heading.paragraph_format.first_line_indent = None
-    heading.paragraph_format.left_indent = None
-
-    # Apply hanging indent to subsequent paragraphs until end
-    for p in doc.paragraphs[idx + 1 :]:
-        if not p.text.strip():
-            continue
-        p.alignment = WD_ALIGN_PARAGRAPH.LEFT
-        p.paragraph_format.line_spacing = 2.0
-        p.paragraph_format.left_indent = Inches(0.5)
-        p.paragraph_format.first_line_indent = Inches(-0.5)
-
-    return True
-
-def remove_first_line_indent_in_references_heading_block(doc: Document):
-    """Optional: ensure references entries don't also get body first-line indent applied."""
-    idx = find_references_start(doc.paragraphs)
-    if idx is None:
-        return
-    for p in doc.paragraphs[idx + 1 :]:
-        if not p.text.strip():
-            continue
-        # hanging indent already sets these; just ensure no extra indent remains
-        # (left indent + negative first line indent is correct)
-        pass
+    with tempfile.TemporaryDirectory(prefix="apa_batch_") as tmp:
+        in_dir, out_dir = os.path.join(tmp, "in"), os.path.join(tmp, "out")
+        os.makedirs(in_dir)
+        os.makedirs(out_dir)
+        names = {}
+        for f, name in zip(files, unique_names([f.name for f in files])):
+            path = os.path.join(in_dir, name)
+            with open(path, "wb") as fh:
+                fh.write(f.getvalue())
+            names[path] = name
+
+        if format_mode:
+            fn, args = format_file, (out_dir, font_choice, add_pnums, format_refs, also_check, use_styles)
+        else:
+            fn, args = check_file, ()
+        futures = submit_batch(fn, list(names), *args)
+
+        results = []
+        progress = st.progress(0.0)
+        with st.status(f"Processing {len(names)} documents…", expanded=True) as status:
+            try:
+                for result in iter_finished(futures):
+                    result["name"] = names[result["file"]]
+                    results.append(result)
+                    status.write(batch_status_line(result))
+                    progress.progress(len(results) / len(names), text=f"{len(results)} of {len(names)} done")
+            finally:
+                # A rerun stops the script here; give the queued files' places
+                # back to the other sessions.
+                for fut in futures:
+                    fut.cancel()
+            failed = sum("error" in r for r in results)
+            status.update(
+                label=f"Processed {len(results)} documents" + (f" ({failed} failed)" if failed else ""),
+                state="error" if failed else "complete",
+                expanded=False,
+            )
+
+        order = {path: i for i, path in enumerate(names)}
+        results.sort(key=lambda r: order[r["file"]])
+        archive = None
+        if format_mode:
+            archive = zip_files_spooled(
+                (r["output"], os.path.basename(r["output"])) for r in results if "output" in r
+            )
+    return results, archive
 
 # -----------------------------
 # UI
 # -----------------------------
-uploaded = st.file_uploader("Upload a Word document (.docx)", type=["docx"])
+uploads = st.file_uploader(
+    "Upload Word documents (.docx) — one paper, or a whole section's at once",
+    type=["docx"],
+    accept_multiple_files=True,
+)
+uploaded = uploads[0] if len(uploads) == 1 else None
 
 mode = st.radio(
     "What do you want to do?",
@@ -288,53 +274,78 @@ show_debug = st.checkbox("Show debug details", value=False)
 st.divider()
 st.subheader("Formatting options (used in Format mode)")
 
-font_choice = st.selectbox("Font", ["Times New Roman 12", "Calibri 11", "Arial 11"], index=0)
+font_choice = st.selectbox("Font", FONT_CHOICES, index=0)
 add_pnums = st.checkbox("Add page numbers (top-right)", value=True)
 format_refs = st.checkbox("Format References section (hanging indent + double spaced)", value=True)
 also_check = st.checkbox("Also run reference/citation checks", value=True)
+use_styles = st.checkbox(
+    "Use APA paragraph styles instead of direct formatting (smaller, easier-to-edit file)",
+    value=False,
+)
 
 run = st.button("Run", type="primary")
 
+if run and len(uploads) > 1:
+    results, archive = run_batch(uploads, format_mode=mode != "Check references only")
+    st.table(batch_summary_rows(results))
+    d1, d2 = st.columns(2)
+    if archive is not None:
+        d1.download_button(
+            f"Download formatted documents (.zip, {human_size(spooled_size(archive))})",
+            data=spooled_reader(archive),
+            file_name="APA_formatted.zip",
+            mime=ZIP_MIME,
+        )
+    if mode == "Check references only" or also_check:
+        d2.download_button(
+            "Download citation issues (.csv)",
+            data=issues_csv(results),
+            file_name="citation_issues.csv",
+            mime="text/csv",
+        )
+    st.stop()
+
 if run:
     if not uploaded:
         st.error("Please upload a .docx file first.")
         st.stop()
 
-    doc = Document(io.BytesIO(uploaded.getvalue()))
-    paragraphs = list(doc.paragraphs)
-    full_text = "\n".join(p.text for p in paragraphs)
-
-    # Always compute checks if requested (or needed)
-    report = None
-    if mode == "Check references only" or also_check:
-        cited_keys = extract_intext_citations(full_text)
-        ref_start = find_references_start(paragraphs)
-
-        if ref_start is None:
-            st.warning("No 'References' heading found. I can’t reliably check the reference list.")
-            st.info("Tip: Add a heading that is exactly 'References' at the end of the document.")
-            if mode == "Check references only":
-                st.stop()
-        else:
-            ref_entries = split_reference_entries(paragraphs[ref_start + 1 :])
-            ref_keys, ref_details = extract_reference_keys(ref_entries)
-
-            cited_not_in_refs = sorted(list(cited_keys - ref_keys))
-            refs_not_cited = sorted(list(ref_keys - cited_keys))
-
-            report = {
-                "cited_count": len(cited_keys),
-                "ref_count": len(ref_entries),
-                "cited_not_in_refs": cited_not_in_refs,
-                "refs_not_cited": refs_not_cited,
-                "ref_details": ref_details,
-                "cited_keys": sorted(list(cited_keys)),
-            }
+    # FORMAT MODE runs as a background job; the session keeps the job id and
+    # polls it below, so a long thesis never blocks this script.
+    if mode != "Check references only":
+        runner = get_job_runner()
+        previous = st.session_state.get("format_job")
+        if previous:
+            runner.discard(previous["id"])
+        # The job scans with its own copy of the memo (this one stays with the
+        # session's script thread); the session adopts it once the job is done.
+        memo = scan_memo.copy()
+        job = runner.submit(
+            format_document, uploaded,
+            font_choice=font_choice, add_pnums=add_pnums, format_refs=format_refs, use_styles=use_styles,
+            check=also_check, cache=get_parse_cache(), memo=memo,
+            expected_stages=format_stages(add_pnums, format_refs, also_check, upload=True),
+            trace_memory=show_debug,
+            context={"mode": mode, "file": uploaded.name},
+        )
+        st.session_state.format_job = {
+            "id": job.id, "also_check": also_check, "format_refs": format_refs, "memo": memo,
+        }
 
     # CHECK ONLY MODE
-    if mode == "Check references only":
+    else:
+        # Wall/CPU time per stage; tracemalloc peaks only when debugging.
+        timer = StageTimer(trace_memory=show_debug, mode=mode, file=uploaded.name)
+
+        with timer.stage("upload read"):
+            data = uploaded.getvalue()
+        # Paragraph text, References position and citation keys come from the
+        # content-hash cache.
+        parsed = cached_parse(data, lambda d: parse_upload(d, timer, scan_memo), get_parse_cache(), timer)
+        report = check_parsed(parsed, timer, scan_memo)
         if report is None:
-            st.info("No check report available.")
+            st.warning("No 'References' heading found. I can’t reliably check the reference list.")
+            st.info("Tip: Add a heading that is exactly 'References' at the end of the document.")
             st.stop()
 
         m1, m2, m3 = st.columns(3)
@@ -350,74 +361,32 @@ if run:
         else:
             if report["cited_not_in_refs"]:
                 st.error("Cited in text but NOT found in References (possible missing reference):")
-                st.write(report["cited_not_in_refs"])
+                st.table(citation_rows(report, report["cited_not_in_refs"]))
                 st.caption("Keys shown as (first-author-token, year). Example: ('smith', '2021')")
+                render_occurrences(report, parsed.paragraphs, report["cited_not_in_refs"], "occ_check")
 
             if report["refs_not_cited"]:
                 st.warning("In References but NOT cited in text (possible unused reference):")
                 st.write(report["refs_not_cited"])
 
+            render_suggestions(report["suggestions"])
+
         if show_debug and report is not None:
             st.divider()
             st.subheader("Debug details")
-            st.write("**Cited keys:**", report["cited_keys"][:400])
+            st.write("**Cited keys:**")
+            st.table(citation_rows(report, report["cited_keys"][:400]))
             st.write("**Reference entries (parsed):**")
             for r in report["ref_details"][:200]:
                 st.markdown(f"- `{r['key']}` → {r['entry']}")
-        st.stop()
-
-    # FORMAT MODE
-    # Apply APA-ish formatting
-    set_document_margins(doc, 1.0)
-
-    if "Times New Roman" in font_choice:
-        set_default_font(doc, "Times New Roman", 12)
-    elif "Calibri" in font_choice:
-        set_default_font(doc, "Calibri", 11)
+            render_stage_timings(timer)
+
+format_job = st.session_state.get("format_job")
+if format_job and mode != "Check references only":
+    job = get_job_runner().get(format_job["id"])
+    if job is None:
+        del st.session_state.format_job
+    elif not job.done:
+        render_job_progress(job.id)
     else:
-        set_default_font(doc, "Arial", 11)
-
-    apply_body_paragraph_formatting(doc, double_space=True, first_line_indent_in=0.5)
-
-    if add_pnums:
-        add_page_number_top_right(doc)
-
-    formatted_refs_applied = False
-    if format_refs:
-        formatted_refs_applied = rebuild_references_section_sorted(doc)
-
-    # Write output
-    out = io.BytesIO()
-    doc.save(out)
-    out.seek(0)
-
-    st.success("Formatted DOCX generated.")
-    st.download_button(
-        "Download APA-formatted document (.docx)",
-        data=out.getvalue(),
-        file_name="paper_APA_formatted.docx",
-        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-    )
-
-    # Show check report (optional)
-    if also_check and report is not None:
-        st.divider()
-        st.subheader("Citation / Reference Check (best-effort)")
-
-        m1, m2, m3 = st.columns(3)
-        m1.metric("In-text citations found", report["cited_count"])
-        m2.metric("Reference entries found", report["ref_count"])
-        m3.metric("Potential issues", len(report["cited_not_in_refs"]) + len(report["refs_not_cited"]))
-
-        if not report["cited_not_in_refs"] and not report["refs_not_cited"]:
-            st.success("Looks consistent: every in-text citation appears to have a matching reference, and vice versa.")
-        else:
-            if report["cited_not_in_refs"]:
-                st.error("Cited in text but NOT found in References:")
-                st.write(report["cited_not_in_refs"])
-            if report["refs_not_cited"]:
-                st.warning("In References but NOT cited in text:")
-                st.write(report["refs_not_cited"])
-
-        if format_refs and not formatted_refs_applied:
-            st.info("Note: I didn’t find a 'References' heading to format. (Formatting still applied to the rest of the document.)")
+        render_format_result(job, format_job)
@@ -0,0 +1,8 @@
+"""
+Throughput / peak-memory benchmarks for the check and format pipelines.
+
+Run from the repository root:
+
+    python -m benchmarks                      # compare against baseline.json
+    python -m benchmarks --update-baseline    # record a new baseline
+"""
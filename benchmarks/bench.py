@@ -0,0 +1,266 @@
+"""
+Benchmark runner: time each pipeline stage on a synthetic paper, measure its
+peak Python heap with tracemalloc, and compare against a stored baseline.
+
+Throughput is items per second, where an item is whatever the stage
+naturally iterates over. Each of `--repeat` repeats calls the stage until it
+has run for at least `--min-time` seconds (many calls for the
+sub-millisecond stages), and the median repeat is reported. Comparisons use
+throughput relative to a fixed pure-Python yardstick timed around each
+repeat, so a baseline recorded on another machine (or a busier one) still
+compares like with like.
+
+Peak memory comes from one extra traced run; allocations made by libxml2
+inside lxml are not visible to tracemalloc, so for the python-docx stages it
+is a lower bound.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+
+from benchmarks.corpus import generate_paper, make_reference_records
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# setup(ctx) -> state is not timed and runs before every call (so stages
+# that modify the document get a fresh copy); run(state) -> items processed.
+Benchmark = namedtuple("Benchmark", ["name", "unit", "setup", "run"])
+
+class Context:
+    """Everything derived once from the generated paper."""
+
+    def __init__(self, data, n_records):
+        from apa_tool.checker import find_references_start, reference_paragraphs, split_reference_entries
+        from apa_tool.reader import iter_paragraphs
+
+        self.data = data
+        self.paragraphs = list(iter_paragraphs(data))
+        self.full_text = "\n".join(p.text for p in self.paragraphs)
+        self.ref_start = find_references_start(self.paragraphs)
+        self.ref_paragraphs = reference_paragraphs(self.paragraphs, self.ref_start)
+        self.ref_entries = split_reference_entries(self.ref_paragraphs)
+        self.records = make_reference_records(n_records)
+
+    def load(self):
+        from docx import Document
+
+        return Document(io.BytesIO(self.data))
+
+def _bench_yardstick(_):
+    words = [f"w{i * 7919 % 10007}" for i in range(5000)]
+    counts = {}
+    for w in sorted(words):
+        counts[w] = counts.get(w, 0) + len(w)
+    " ".join(words).upper().split()
+    return 1
+
+def _bench_extract(ctx):
+    from apa_tool.checker import extract_intext_citations
+
+    extract_intext_citations(ctx.full_text)
+    return len(ctx.paragraphs)
+
+def _bench_split(ctx):
+    from apa_tool.checker import split_reference_entries
+
+    split_reference_entries(ctx.ref_paragraphs)
+    return len(ctx.ref_paragraphs)
+
+def _bench_sort(ctx):
+    from apa_tool.checker import sort_reference_entries_apa
+
+    sort_reference_entries_apa(ctx.ref_entries)
+    return len(ctx.ref_entries)
+
+def _bench_body_formatting(doc):
+    from apa_tool.formatting import apply_body_paragraph_formatting
+
+    apply_body_paragraph_formatting(doc, double_space=True, first_line_indent_in=0.5)
+    return len(doc.paragraphs)
+
+def _bench_rebuild(state):
+    from apa_tool.formatting import rebuild_references_section_sorted
+
+    doc, n_entries = state
+    rebuild_references_section_sorted(doc)
+    return n_entries
+
+def _bench_apa_reference_string(records):
+    from apa_tool.apa_format import apa_reference_string
+
+    for ref in records:
+        apa_reference_string(ref)
+    return len(records)
+
+def _bench_save(doc):
+    out = io.BytesIO()
+    doc.save(out)
+    return len(out.getvalue()) / 1e6
+
+# Fixed pure-Python work (sorting, dicts, strings) that every benchmark is
+# measured against; see measure().
+YARDSTICK = Benchmark("yardstick", "runs/s", lambda ctx: None, _bench_yardstick)
+
+BENCHMARKS = [
+    Benchmark("extract_intext_citations", "paragraphs/s", lambda ctx: ctx, _bench_extract),
+    Benchmark("split_reference_entries", "paragraphs/s", lambda ctx: ctx, _bench_split),
+    Benchmark("sort_reference_entries_apa", "entries/s", lambda ctx: ctx, _bench_sort),
+    Benchmark("apply_body_paragraph_formatting", "paragraphs/s", lambda ctx: ctx.load(), _bench_body_formatting),
+    Benchmark("rebuild_references_section_sorted", "entries/s", lambda ctx: (ctx.load(), len(ctx.ref_entries)), _bench_rebuild),
+    Benchmark("apa_reference_string", "references/s", lambda ctx: ctx.records, _bench_apa_reference_string),
+    Benchmark("doc.save", "MB/s", lambda ctx: ctx.load(), _bench_save),
+]
+
+def _run_once(bench, ctx):
+    state = bench.setup(ctx)
+    t0 = time.perf_counter()
+    items = bench.run(state)
+    return time.perf_counter() - t0, items
+
+def _rate(bench, ctx, min_time):
+    """Items per second over at least `min_time` seconds of calls."""
+    elapsed = items = 0
+    while elapsed < min_time:
+        seconds, n = _run_once(bench, ctx)
+        elapsed += seconds
+        items += n
+    return items / elapsed
+
+def measure(bench, ctx, repeat, min_time, yardstick=None):
+    """
+    {"unit", "throughput", "relative", "peak_kib"} for one benchmark.
+
+    throughput is the median of `repeat` repeats, each accumulating at least
+    `min_time` seconds of calls. relative is the median ratio of each
+    repeat's throughput to the `yardstick` benchmark's, run just before and
+    after it: load on the machine slows both alike, so the ratio holds still
+    where the absolute numbers drift.
+    """
+    rates, ratios = [], []
+    for _ in range(repeat):
+        before = _rate(yardstick, ctx, min_time / 4) if yardstick else None
+        rate = _rate(bench, ctx, min_time)
+        rates.append(rate)
+        if yardstick:
+            after = _rate(yardstick, ctx, min_time / 4)
+            ratios.append(rate / ((before + after) / 2))
+
+    state = bench.setup(ctx)
+    tracemalloc.start()
+    try:
+        bench.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "unit": bench.unit,
+        "throughput": statistics.median(rates),
+        "relative": statistics.median(ratios) if ratios else None,
+        "peak_kib": peak / 1024,
+    }
+
+def _delta(cur, base):
+    """Relative throughput change (None without a comparable baseline)."""
+    if cur.get("relative") and base.get("relative"):
+        return cur["relative"] / base["relative"] - 1
+    return None
+
+def compare(results, baseline, threshold):
+    """Return a list of human-readable regressions (empty if none)."""
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        delta = _delta(cur, base)
+        if delta is not None and delta < -threshold:
+            regressions.append(f"{name}: throughput down {-delta:.0%} relative to the machine yardstick "
+                               f"({cur['throughput']:.1f} {cur['unit']} now)")
+        if base["peak_kib"] and cur["peak_kib"] > base["peak_kib"] * (1 + threshold):
+            rise = cur["peak_kib"] / base["peak_kib"] - 1
+            regressions.append(f"{name}: peak memory up {rise:.0%} ({cur['peak_kib']:.0f} vs {base['peak_kib']:.0f} KiB)")
+    return regressions
+
+def print_table(results, baseline, out=sys.stdout):
+    out.write(f"{'benchmark':36} {'throughput':>22} {'vs base':>8} {'peak KiB':>10} {'vs base':>8}\n")
+    for name, cur in results.items():
+        base = baseline.get(name) or {}
+        delta = _delta(cur, base)
+        tp_delta = f"{delta:+.0%}" if delta is not None else "-"
+        mem_delta = f"{cur['peak_kib'] / base['peak_kib'] - 1:+.0%}" if base.get("peak_kib") else "-"
+        tp = f"{cur['throughput']:.1f} {cur['unit']}"
+        out.write(f"{name:36} {tp:>22} {tp_delta:>8} {cur['peak_kib']:>10.0f} {mem_delta:>8}\n")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    corpus = parser.add_argument_group("synthetic corpus")
+    corpus.add_argument("--paragraphs", type=int, default=2000)
+    corpus.add_argument("--citation-density", type=float, default=0.6, help="citations per body paragraph")
+    corpus.add_argument("--references", type=int, default=400)
+    corpus.add_argument("--tables", type=int, default=10)
+    corpus.add_argument("--images", type=int, default=5)
+    corpus.add_argument("--records", type=int, default=2000, help="reference dicts for apa_reference_string")
+    corpus.add_argument("--seed", type=int, default=0)
+
+    parser.add_argument("--repeat", type=int, default=5, help="repeats per benchmark; the median is compared")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="seconds of timed calls per repeat (default 0.2)")
+    parser.add_argument("--only", action="append", help="run just this benchmark (repeatable)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed fractional regression before failing (default 0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="write these results as the new baseline")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    params = {
+        "paragraphs": args.paragraphs,
+        "citation_density": args.citation_density,
+        "references": args.references,
+        "tables": args.tables,
+        "images": args.images,
+        "records": args.records,
+        "seed": args.seed,
+    }
+    data = generate_paper(
+        paragraphs=args.paragraphs, citation_density=args.citation_density, references=args.references,
+        tables=args.tables, images=args.images, seed=args.seed,
+    )
+    ctx = Context(data, args.records)
+
+    results = {}
+    for bench in BENCHMARKS:
+        if args.only and bench.name not in args.only:
+            continue
+        results[bench.name] = measure(bench, ctx, args.repeat, args.min_time, YARDSTICK)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("params") == params:
+            baseline = stored.get("results", {})
+        elif not args.update_baseline:
+            print(f"note: {args.baseline} was recorded with different corpus parameters; not comparing")
+
+    print_table(results, baseline)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
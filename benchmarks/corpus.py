@@ -0,0 +1,148 @@
+"""
+Synthetic .docx papers for benchmarking.
+
+Papers are deterministic for a given seed so runs are comparable: a title,
+body paragraphs with in-text citations, optional tables and images, and a
+References section whose entries match (most of) the citations.
+"""
+import io
+import random
+import struct
+import zlib
+
+from docx import Document
+from docx.shared import Inches
+
+SURNAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+    "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Lee", "Perez", "Thompson",
+    "White", "Harris", "Sanchez", "Clark", "Ramirez", "Lewis", "Robinson", "Müller",
+    "O’Brien", "Nguyen", "Kim", "Chen", "Patel", "van Dijk", "de la Cruz",
+]
+
+WORDS = (
+    "the of and to in a is that for it as was with be by on not he this are or his from at which "
+    "but have an they you were her she there been one all we their has would when if so no more "
+    "students learning outcomes analysis participants results study design measure effect model"
+).split()
+
+def _png_bytes(width=64, height=64):
+    """A small solid-colour RGB PNG, built by hand so no imaging library is needed."""
+    row = b"\x00" + b"\x40\x80\xc0" * width
+    raw = zlib.compress(row * height)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", raw) + chunk(b"IEND", b"")
+
+def _sentence(rng, n_words):
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    return " ".join(words).capitalize() + "."
+
+def _citation(rng, author, year):
+    kind = rng.random()
+    if kind < 0.4:
+        return f"({author}, {year})"
+    if kind < 0.6:
+        return f"({author} & {rng.choice(SURNAMES)}, {year})"
+    if kind < 0.75:
+        return f"({author} et al., {year})"
+    return f"{author} ({year})"
+
+def make_reference_entry(rng, author, year):
+    initials = f"{rng.choice('ABCDEFGHJKLMNPRST')}. {rng.choice('ABCDEFGHJKLMNPRST')}."
+    title = _sentence(rng, rng.randint(5, 12))
+    return (
+        f"{author}, {initials} ({year}). {title} Journal of {rng.choice(WORDS).capitalize()} Studies, "
+        f"{rng.randint(1, 60)}({rng.randint(1, 12)}), {rng.randint(1, 300)}–{rng.randint(301, 600)}. "
+        f"https://doi.org/10.{rng.randint(1000, 9999)}/{rng.randint(100000, 999999)}"
+    )
+
+def generate_paper(paragraphs=500, citation_density=0.5, references=100, tables=0, images=0, seed=0):
+    """
+    Build a synthetic paper and return it as .docx bytes.
+
+    paragraphs:       body paragraphs before the References heading
+    citation_density: expected in-text citations per body paragraph
+    references:       entries in the References section
+    tables:           3x4 tables spread evenly through the body
+    images:           small inline PNGs spread evenly through the body
+    """
+    rng = random.Random(seed)
+    doc = Document()
+    doc.add_heading("A Synthetic Paper for Benchmarking", 0)
+
+    keys = [(rng.choice(SURNAMES), str(rng.randint(1980, 2024))) for _ in range(max(references, 1))]
+    table_every = paragraphs // tables if tables else 0
+    image_every = paragraphs // images if images else 0
+    png = _png_bytes() if images else None
+
+    for i in range(paragraphs):
+        if i and i % 40 == 0:
+            doc.add_heading(f"Section {i // 40}", 1)
+        parts = [_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 5))]
+        n_cites = int(citation_density) + (1 if rng.random() < citation_density % 1 else 0)
+        for _ in range(n_cites):
+            author, year = rng.choice(keys)
+            pos = rng.randrange(len(parts))
+            parts[pos] = parts[pos][:-1] + " " + _citation(rng, author, year) + "."
+        doc.add_paragraph(" ".join(parts))
+
+        if table_every and i % table_every == table_every - 1:
+            table = doc.add_table(rows=3, cols=4)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"r{r}c{c} {rng.choice(WORDS)}"
+        if image_every and i % image_every == image_every - 1:
+            doc.add_picture(io.BytesIO(png), width=Inches(1.0))
+
+    doc.add_paragraph("References")
+    for author, year in keys[:references]:
+        doc.add_paragraph(make_reference_entry(rng, author, year))
+
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+def make_reference_records(n, seed=0):
+    """Reference dicts (the References Manager schema) covering every REF_TYPE."""
+    from apa_tool.apa_format import REF_TYPES
+
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        rtype = REF_TYPES[i % len(REF_TYPES)]
+        n_auth = rng.randint(1, 6)
+        ref = {
+            "type": rtype,
+            "authors": [
+                {"last": rng.choice(SURNAMES), "initials": f"{rng.choice('ABCDEFG')}. {rng.choice('HJKLMN')}.", "suffix": ""}
+                for _ in range(n_auth)
+            ],
+            "year": rng.randint(1980, 2024),
+            "title": _sentence(rng, rng.randint(4, 14)),
+            "auto_sentence_case": True,
+            "doi": f"https://doi.org/10.{rng.randint(1000, 9999)}/{i}" if rng.random() < 0.5 else "",
+            "url": "",
+            "journal": "Journal of Benchmarks",
+            "volume": str(rng.randint(1, 50)),
+            "issue": str(rng.randint(1, 12)),
+            "pages": f"{rng.randint(1, 100)}–{rng.randint(101, 200)}",
+            "publisher": "Bench Press",
+            "edition": "2nd" if rng.random() < 0.2 else "",
+            "book_title": "Handbook of Synthetic Data",
+            "editors": [{"last": rng.choice(SURNAMES), "initials": "E. D.", "suffix": ""}],
+            "site_name": "Example Site",
+            "report_number": str(rng.randint(1, 999)),
+            "conference_name": "Annual Benchmark Conference",
+            "conference_location": "Gainesville, FL",
+            "university": "University of Florida",
+            "thesis_type": "Dissertation",
+        }
+        if rng.random() < 0.1:
+            ref["authors"] = {"is_org": True, "org_name": "American Psychological Association"}
+        records.append(ref)
+    return records
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+from apa_tool.cache import ParseCache, ParsedUpload, content_hash, make_parsed_upload
+
+def entry(nbytes):
+    return ParsedUpload((), None, (), nbytes)
+
+def test_evicts_least_recently_used_past_max_bytes():
+    cache = ParseCache(max_entries=10, max_bytes=100)
+    cache.put("a", entry(40))
+    cache.put("b", entry(40))
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("c", entry(40))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.total_bytes == 80
+
+def test_evicts_past_max_entries():
+    cache = ParseCache(max_entries=2, max_bytes=10**9)
+    for key in "abc":
+        cache.put(key, entry(1))
+    assert len(cache) == 2
+    assert cache.get("a") is None
+
+def test_oversized_entry_is_not_cached_and_evicts_nothing():
+    cache = ParseCache(max_entries=10, max_bytes=100)
+    cache.put("small", entry(10))
+    cache.put("huge", entry(101))
+    assert cache.get("huge") is None
+    assert cache.get("small") is not None
+    assert cache.total_bytes == 10
+
+def test_replacing_an_entry_updates_the_byte_total():
+    cache = ParseCache(max_entries=10, max_bytes=100)
+    cache.put("a", entry(60))
+    cache.put("a", entry(30))
+    assert len(cache) == 1
+    assert cache.total_bytes == 30
+
+def test_get_or_parse_parses_once_per_content():
+    cache = ParseCache()
+    calls = []
+
+    def parse(data):
+        calls.append(data)
+        return make_parsed_upload([SimpleNamespace(text=data.decode())], None, ())
+
+    first = cache.get_or_parse(b"paper", parse)
+    assert cache.get_or_parse(b"paper", parse) is first
+    cache.get_or_parse(b"other", parse)
+    assert calls == [b"paper", b"other"]
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert first.nbytes > 0
+    assert cache.get(content_hash(b"paper")) is first
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from apa_tool.checker import (
+    NARRATIVE,
+    PARENTHETICAL,
+    extract_intext_citations,
+    extract_reference_keys,
+    find_references_start,
+    iter_citations,
+    scan_text_citations,
+    sort_reference_entries_apa,
+    split_reference_entries,
+)
+
+def paras(*texts):
+    return [SimpleNamespace(text=t) for t in texts]
+
+def test_parenthetical_and_narrative_in_one_pass():
+    text = "As Smith (2020) argued, others agree (Lee & Kim, 2019a)."
+    found = list(scan_text_citations(text, paragraph_index=3))
+    assert [(c.kind, c.key) for c in found] == [
+        (NARRATIVE, ("smith", "2020")),
+        (PARENTHETICAL, ("lee", "2019a")),
+    ]
+    assert all(c.paragraph_index == 3 for c in found)
+    assert [text[slice(*c.span)] for c in found] == ["Smith (2020)", "(Lee & Kim, 2019a)"]
+
+def test_first_author_of_parenthetical_lists():
+    keys = [c.key for c in scan_text_citations("(Brown et al., 2001) (Garcia and Lopez, 2002) (Jones, n.d.)")]
+    assert keys == [("brown", "2001"), ("garcia", "2002"), ("jones", "n.d.")]
+
+def test_iter_citations_keeps_paragraph_indexes():
+    found = list(iter_citations(paras("No citations here.", "", "Taylor (2015) and (Lee, 2016).")))
+    assert [(c.paragraph_index, c.key) for c in found] == [(2, ("taylor", "2015")), (2, ("lee", "2016"))]
+
+def test_extract_intext_citations_is_the_key_set():
+    assert extract_intext_citations("Smith (2020) (Smith, 2020) (Lee, 2021)") == {("smith", "2020"), ("lee", "2021")}
+
+def test_reference_section_split_and_keys():
+    doc = paras(
+        "Intro (Smith, 2020).",
+        "References",
+        "Smith, J. (2020). A title that",
+        "continues on a second line.",
+        "",
+        "American Psychological Association. (2019). Publication manual.",
+    )
+    start = find_references_start(doc)
+    assert start == 1
+    entries = split_reference_entries(doc[start + 1 :])
+    assert entries == [
+        "Smith, J. (2020). A title that continues on a second line.",
+        "American Psychological Association. (2019). Publication manual.",
+    ]
+    keys, detailed = extract_reference_keys(entries)
+    assert keys == {("smith", "2020"), ("american", "2019")}
+    assert [d["entry"] for d in detailed] == entries
+
+def test_particle_led_entries_start_new_entries():
+    entries = split_reference_entries(paras(
+        "Smith, J. (2020). First title.",
+        "van Dijk, J. (2018). Second title.",
+        "de la Cruz, M. (2020). Third title.",
+    ))
+    assert entries == [
+        "Smith, J. (2020). First title.",
+        "van Dijk, J. (2018). Second title.",
+        "de la Cruz, M. (2020). Third title.",
+    ]
+    keys, _ = extract_reference_keys(entries)
+    assert keys == {("smith", "2020"), ("dijk", "2018"), ("cruz", "2020")}
+    assert extract_intext_citations("van Dijk (2018) (de la Cruz, 2020)") <= keys
+    assert sort_reference_entries_apa(entries) == [entries[2], entries[1], entries[0]]
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from apa_tool.cli import iter_finished, output_collisions, submit_files, unique_names
+
+def test_unique_names_number_repeats_case_insensitively():
+    names = ["a/paper.docx", "b/paper.docx", "Paper.docx", "notes.docx", "paper (2).docx"]
+    assert unique_names(names) == ["paper.docx", "paper (2).docx", "Paper (3).docx", "notes.docx", "paper (2) (2).docx"]
+
+def test_output_collisions_compare_output_names_case_insensitively():
+    assert output_collisions(["a/paper.docx", "b/Paper.docx", "c/other.docx"]) == {
+        "paper_APA_formatted.docx": ["a/paper.docx", "b/Paper.docx"],
+    }
+    assert output_collisions(["a/one.docx", "a/two.docx"]) == {}
+
+def check(path, suffix):
+    if path == "bad":
+        raise ValueError("not a .docx")
+    return {"file": path, "checked": path + suffix}
+
+def test_shared_pool_results_and_failures():
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first = list(iter_finished(submit_files(pool, check, ["a", "bad"], "!")))
+        second = list(iter_finished(submit_files(pool, check, ["b"], "?")))
+    assert sorted(first, key=lambda r: r["file"]) == [
+        {"file": "a", "checked": "a!"},
+        {"file": "bad", "error": "ValueError: not a .docx"},
+    ]
+    assert second == [{"file": "b", "checked": "b?"}]
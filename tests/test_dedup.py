@@ -0,0 +1,90 @@
+from apa_tool.dedup import (
+    MAX_BUCKET,
+    doi_key,
+    find_duplicates,
+    jaccard,
+    merge_records,
+    minhash_bands,
+    normalize_title,
+    shingles,
+)
+
+def test_title_and_doi_keys():
+    assert normalize_title("The Self-Report: A Study.") == "the self report a study"
+    assert normalize_title("Café & Culture") == "cafe and culture"
+    assert doi_key("https://doi.org/10.1/ABC") == doi_key("doi: 10.1/abc") == "10.1/abc"
+    assert shingles("the a of") == frozenset({"the", "a", "of"})
+    assert jaccard(frozenset("ab"), frozenset("bc")) == 1 / 3
+
+def test_same_doi_groups_whatever_the_title():
+    rows = [
+        (1, "smith", "2020", "Learning to read", "https://doi.org/10.1/ABC"),
+        (2, "jones", "2019", "Something else", ""),
+        (3, "smyth", "2021", "Completely different", "10.1/abc"),
+    ]
+    assert find_duplicates(rows) == [{"ids": [1, 3], "reason": "doi", "score": 1.0}]
+
+def test_same_title_needs_same_author_and_year():
+    rows = [
+        (1, "smith", "2020", "Learning to Read: A Study", ""),
+        (2, "Smith", "2020", "learning to read -- a study!", ""),
+        (3, "jones", "2015", "Learning to read: a study", ""),
+        (4, "lee", "2021", "Learning to read: a study", ""),
+    ]
+    # 3 and 4 share the title but neither the author nor the year with anyone.
+    assert find_duplicates(rows) == [{"ids": [1, 2], "reason": "title", "score": 1.0}]
+
+def test_same_title_in_another_year_is_similar():
+    rows = [(1, "smith", "2020", "Learning to read", ""), (2, "smith", "2015", "Learning to read", "")]
+    assert find_duplicates(rows) == [{"ids": [1, 2], "reason": "similar", "score": 1.0}]
+
+def test_similar_titles_are_found_by_lsh():
+    title = "Effects of reading interventions on vocabulary growth in primary schools"
+    rows = [
+        (1, "smith", "2020", title, ""),
+        (2, "other", "2020", title + " revisited", ""),
+        (3, "smith", "2020", "Introduction", ""),
+        (4, "lee", "2001", "Introduction", ""),
+    ]
+    groups = find_duplicates(rows)
+    assert [g["ids"] for g in groups] == [[1, 2]]
+    assert groups[0]["reason"] == "similar" and 0.7 <= groups[0]["score"] < 1.0
+    # Near-identical shingle sets share LSH bands.
+    a, b = shingles(normalize_title(title)), shingles(normalize_title(title + " revisited"))
+    assert set(minhash_bands(a)) & set(minhash_bands(b))
+
+def test_groups_join_transitively_and_sort_best_first():
+    rows = [
+        (1, "smith", "2020", "Reading fluency in adolescents", ""),
+        (2, "smith", "2020", "Reading fluency in adolescents", "10.1/x"),
+        (3, "smyth", "2018", "Unrelated", "10.1/X"),
+        (4, "kim", "2019", "Assessing reading fluency in older adolescents today", ""),
+        (5, "kim", "2019", "Assessing reading fluency in adolescents today", ""),
+    ]
+    groups = find_duplicates(rows)
+    assert groups[0] == {"ids": [1, 2, 3], "reason": "doi", "score": 1.0}
+    assert groups[1]["ids"] == [4, 5] and groups[1]["score"] < 1.0
+
+def test_exact_duplicates_group_past_max_bucket():
+    n = MAX_BUCKET + 50
+    rows = [(i, "smith", "2020", "Reading fluency in adolescents", f"10.1/{i % 2}") for i in range(1, n + 1)]
+    rows.append((n + 1, "lee", "2001", "Unrelated study of something else", ""))
+    groups = find_duplicates(rows)
+    assert groups == [{"ids": list(range(1, n + 1)), "reason": "doi", "score": 1.0}]
+
+def test_merge_records_fills_empty_fields_in_order():
+    first = {"type": "Journal article", "title": "T", "doi": "", "volume": "", "authors": [], "org_name": ""}
+    second = {"doi": "https://doi.org/10.1/a", "volume": "4", "pages": "1–2", "authors": [{"last": "Smith"}]}
+    third = {"doi": "https://doi.org/10.1/b", "issue": "2", "title": "Other"}
+    merged = merge_records([first, second, third])
+    assert merged == {
+        "type": "Journal article",
+        "title": "T",
+        "doi": "https://doi.org/10.1/a",
+        "volume": "4",
+        "authors": [{"last": "Smith"}],
+        "org_name": "",
+        "pages": "1–2",
+        "issue": "2",
+    }
+    assert first["doi"] == ""  # inputs untouched
@@ -0,0 +1,93 @@
+import io
+
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
+from docx.shared import Inches
+
+from apa_tool.formatting import (
+    APA_BODY_STYLE,
+    APA_REFERENCE_STYLE,
+    append_reference_paragraphs,
+    apply_apa_formatting,
+    rebuild_references_section_sorted,
+    truncate_body_after,
+)
+
+def test_truncate_body_after_keeps_the_section_properties():
+    doc = Document()
+    doc.add_paragraph("Body")
+    heading = doc.add_paragraph("References")
+    doc.add_paragraph("Old entry")
+    doc.add_table(rows=1, cols=1)
+    truncate_body_after(heading)
+    assert [child.tag for child in doc.element.body] == [qn("w:p"), qn("w:p"), qn("w:sectPr")]
+
+def test_appended_entries_are_separate_copies_of_the_template():
+    doc = Document()
+    doc.add_paragraph("References")
+    append_reference_paragraphs(doc, ["B entry", "A entry"])
+    assert doc.element.body[-1].tag == qn("w:sectPr")
+    heading, b, a = doc.paragraphs
+    assert [b.text, a.text] == ["B entry", "A entry"]
+    for p in (b, a):
+        fmt = p.paragraph_format
+        assert (fmt.left_indent, fmt.first_line_indent, fmt.line_spacing) == (Inches(0.5), Inches(-0.5), 2.0)
+    assert b._p.pPr is not a._p.pPr
+
+def test_rebuild_sorts_entries_and_drops_what_followed_them():
+    doc = Document()
+    doc.add_paragraph("Body (Brown, 2019).")
+    doc.add_paragraph("References")
+    doc.add_paragraph("Smith, J. (2020). Second.")
+    doc.add_paragraph("Brown, A. (2019). First.")
+    doc.add_table(rows=1, cols=1).cell(0, 0).text = "Appendix table"
+    assert rebuild_references_section_sorted(doc)
+    assert [p.text for p in doc.paragraphs] == [
+        "Body (Brown, 2019).",
+        "References",
+        "Brown, A. (2019). First.",
+        "Smith, J. (2020). Second.",
+    ]
+    assert not doc.tables
+    assert doc.element.body[-1].tag == qn("w:sectPr")
+
+def make_paper():
+    doc = Document()
+    doc.add_paragraph("Body text citing Smith (2020).")
+    doc.add_paragraph("")
+    doc.add_paragraph("References")
+    doc.add_paragraph("Smith, J. (2020). Second title.")
+    doc.add_paragraph("Brown, A. (2019). First title.")
+    return doc
+
+def reload(doc):
+    buf = io.BytesIO()
+    doc.save(buf)
+    buf.seek(0)
+    return Document(buf)
+
+def test_style_mode_leaves_heading_centered_and_unindented():
+    doc = make_paper()
+    assert apply_apa_formatting(doc, add_pnums=False, use_styles=True)
+    body, spacer, heading, *entries = reload(doc).paragraphs
+
+    assert body.style.name == APA_BODY_STYLE
+    assert heading.text == "References"
+    assert heading.style.name != APA_BODY_STYLE
+    assert heading.alignment == WD_ALIGN_PARAGRAPH.CENTER
+    assert heading.paragraph_format.first_line_indent == Inches(0)
+    assert spacer.style.name != APA_BODY_STYLE
+    assert spacer.paragraph_format.line_spacing == 2.0
+    assert [p.text for p in entries] == ["Brown, A. (2019). First title.", "Smith, J. (2020). Second title."]
+    assert {p.style.name for p in entries} == {APA_REFERENCE_STYLE}
+
+def test_direct_mode_matches_style_mode_layout():
+    doc = make_paper()
+    assert apply_apa_formatting(doc, add_pnums=False)
+    body, spacer, heading, *entries = reload(doc).paragraphs
+
+    assert body.paragraph_format.first_line_indent == Inches(0.5)
+    assert spacer.paragraph_format.first_line_indent is None
+    assert heading.paragraph_format.first_line_indent == Inches(0)
+    assert all(p.paragraph_format.first_line_indent == Inches(-0.5) for p in entries)
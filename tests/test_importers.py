@@ -0,0 +1,130 @@
+import io
+import json
+
+import pytest
+
+from apa_tool import importers
+from apa_tool.apa_format import apa_reference_string
+from apa_tool.importers import importer_for, iter_bibtex, iter_chunks, iter_csl_json, iter_ris
+
+BIBTEX = r"""
+@string{jed = "Journal of Education"}
+% A comment line between entries.
+@article{smith2020,
+  author  = {Smith, John Adam and M{\"u}ller, Jean-Paul},
+  title   = {Learning to {Read}: A study},
+  journal = jed,
+  year    = {2020},
+  volume  = {12},
+  number  = {3},
+  pages   = {1--20},
+  doi     = {10.1000/ABC}
+}
+@book(jones2019,
+  author = "Jones, K.",
+  title = "Other things",
+  publisher = "Acme Press",
+  year = 2019
+)
+"""
+
+RIS = """TY  - JOUR
+AU  - Smith, John Adam
+AU  - Müller, Jean-Paul
+TI  - Learning to Read: A study
+JO  - Journal of Education
+PY  - 2020
+VL  - 12
+IS  - 3
+SP  - 1
+EP  - 20
+DO  - https://doi.org/10.1000/ABC
+ER  - 
+TY  - BOOK
+AU  - Jones, K.
+TI  - Other things
+PB  - Acme Press
+PY  - 2019
+ER  - 
+"""
+
+CSL = [
+    {
+        "type": "article-journal",
+        "author": [{"family": "Smith", "given": "John Adam"}, {"family": "Müller", "given": "Jean-Paul"}],
+        "title": "Learning to Read: A study",
+        "container-title": "Journal of Education",
+        "issued": {"date-parts": [[2020, 5]]},
+        "volume": 12,
+        "issue": "3",
+        "page": "1-20",
+        "DOI": "doi:10.1000/ABC",
+    },
+    {
+        "type": "book",
+        "author": [{"family": "Jones", "given": "K."}],
+        "title": "Other things",
+        "publisher": "Acme Press",
+        "issued": {"date-parts": [[2019]]},
+    },
+]
+
+ARTICLE = {
+    "type": "Journal article",
+    "authors": [
+        {"last": "Smith", "initials": "J. A.", "suffix": ""},
+        {"last": "Müller", "initials": "J.-P.", "suffix": ""},
+    ],
+    "org_author": False,
+    "org_name": "",
+    "year": 2020,
+    "title": "Learning to Read: A study",
+    "auto_sentence_case": True,
+    "doi": "https://doi.org/10.1000/ABC",
+    "url": "",
+    "journal": "Journal of Education",
+    "volume": "12",
+    "issue": "3",
+    "pages": "1–20",
+}
+
+def test_bibtex_ris_and_csl_give_the_same_records():
+    bib = list(iter_bibtex(io.StringIO(BIBTEX)))
+    ris = list(iter_ris(io.StringIO(RIS)))
+    csl = list(iter_csl_json(io.StringIO(json.dumps(CSL))))
+    assert bib[0] == ARTICLE
+    assert ris == bib
+    assert csl == bib
+    assert bib[1]["type"] == "Book" and bib[1]["publisher"] == "Acme Press"
+    assert [apa_reference_string(r) for r in ris] == [apa_reference_string(r) for r in bib]
+
+def test_app_json_export_round_trips():
+    records = list(iter_bibtex(io.StringIO(BIBTEX)))
+    exported = json.dumps(records, indent=2)
+    assert list(iter_csl_json(io.StringIO(exported))) == records
+
+def test_parsers_stream_across_block_boundaries(monkeypatch):
+    whole = list(iter_bibtex(io.StringIO(BIBTEX)))
+    monkeypatch.setattr(importers, "BLOCK_SIZE", 7)
+    assert list(iter_bibtex(io.StringIO(BIBTEX))) == whole
+    assert list(iter_csl_json(io.StringIO(json.dumps(CSL)))) == whole
+
+def test_unbalanced_bibtex_entry_raises_with_its_line(monkeypatch):
+    src = "@misc{a, title={One}}\n\n@article{b,\n  title = {Two {open},\n}\n@misc{c, title={Three}}\n"
+    monkeypatch.setattr(importers, "BLOCK_SIZE", 5)
+    records = iter_bibtex(io.StringIO(src))
+    assert next(records)["title"] == "One"
+    with pytest.raises(ValueError, match="line 3"):
+        list(records)
+
+def test_bad_json_is_rejected():
+    with pytest.raises(ValueError, match="JSON array"):
+        list(iter_csl_json(io.StringIO('{"type": "book"}')))
+    with pytest.raises(ValueError, match="Unterminated"):
+        list(iter_csl_json(io.StringIO(json.dumps(CSL)[:-1])))
+
+def test_importer_for_and_chunks():
+    assert importer_for("refs.BIB") is iter_bibtex
+    assert importer_for("refs.ris") is iter_ris
+    assert importer_for("refs.txt") is None
+    assert [len(c) for c in iter_chunks(range(7), size=3)] == [3, 3, 1]
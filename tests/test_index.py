@@ -0,0 +1,42 @@
+import io
+
+from docx import Document
+
+from apa_tool.formatting import apply_body_paragraph_styles, rebuild_references_section_sorted
+from apa_tool.index import DocumentIndex
+from apa_tool.reader import iter_paragraphs
+
+def paper():
+    doc = Document()
+    doc.add_heading("Method", level=1)
+    doc.add_paragraph("Body text citing Smith (2020).")
+    doc.add_paragraph("References")
+    doc.add_paragraph("Smith, J. (2020). Second title.")
+    doc.add_paragraph("Brown, A. (2019). First title.")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def assert_same_index(index, fresh):
+    assert index.paragraphs == fresh.paragraphs
+    assert index.style_names == fresh.style_names
+    assert index.references_idx == fresh.references_idx
+    assert all(a._p is b._p for a, b in zip(index.elements, fresh.elements))
+    assert len(index.elements) == len(fresh.elements)
+
+def test_index_matches_the_streamed_paragraphs():
+    data = paper()
+    index = DocumentIndex(Document(io.BytesIO(data)))
+    assert [(p.text, p.style_id) for p in index.paragraphs] == [(p.text, p.style_id) for p in iter_paragraphs(data)]
+    assert [e.text for e in index.elements] == [p.text for p in index.paragraphs]
+    assert index.style_names == ["Heading 1", "Normal", "Normal", "Normal", "Normal"]
+    assert index.references_idx == 2
+
+def test_index_stays_in_step_with_the_passes():
+    doc = Document(io.BytesIO(paper()))
+    index = DocumentIndex(doc)
+    apply_body_paragraph_styles(doc, index=index)
+    assert_same_index(index, DocumentIndex(doc))
+    assert rebuild_references_section_sorted(doc, index=index)
+    assert_same_index(index, DocumentIndex(doc))
+    assert [p.text for p in index.paragraphs[3:]] == ["Brown, A. (2019). First title.", "Smith, J. (2020). Second title."]
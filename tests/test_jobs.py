@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from apa_tool.jobs import CANCELLED, DONE, FAILED, QUEUED, JobRunner
+from apa_tool.timing import timed
+
+def wait(job, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not job.done:
+        assert time.monotonic() < deadline, f"job still {job.state} in {job.stage!r}"
+        time.sleep(0.01)
+
+def staged(*names, gate=None, fail_in=None):
+    """A job function timing `names` in turn; waits on `gate` inside the first stage."""
+    def run(timer):
+        for i, name in enumerate(names):
+            with timed(timer, name):
+                if i == 0 and gate is not None:
+                    gate.wait(5)
+                if name == fail_in:
+                    raise RuntimeError("boom")
+        return len(names)
+    return run
+
+@pytest.fixture
+def runner():
+    return JobRunner(max_workers=1, keep=2)
+
+def test_progress_follows_expected_stages(runner):
+    gate = threading.Event()
+    job = runner.submit(staged("a", "b", "c", gate=gate), expected_stages=["a", "b", "c", "d"])
+    while job.stage != "a":
+        time.sleep(0.01)
+    assert job.progress == 0.0
+    gate.set()
+    wait(job)
+    assert job.state == DONE and job.result == 3
+    assert job.stages_done == ["a", "b", "c"]
+    assert job.progress == 1.0
+    assert [r["stage"] for r in job.timer.records] == ["a", "b", "c"]
+
+def test_cancel_stops_at_the_next_stage(runner):
+    gate = threading.Event()
+    job = runner.submit(staged("a", "b", gate=gate), expected_stages=["a", "b"])
+    while job.stage != "a":
+        time.sleep(0.01)
+    job.cancel()
+    gate.set()  # the running stage finishes; "b" never starts
+    wait(job)
+    assert job.state == CANCELLED
+    assert job.stages_done == ["a"] and job.result is None
+
+def test_cancelled_queued_job_never_starts(runner):
+    gate = threading.Event()
+    first = runner.submit(staged("a", gate=gate))
+    second = runner.submit(staged("x"))
+    assert second.state == QUEUED
+    runner.discard(second.id)
+    assert runner.get(second.id) is None
+    gate.set()
+    wait(first)
+    wait(second)
+    assert second.state == CANCELLED and second.stages_done == []
+
+def test_failure_is_recorded(runner):
+    job = runner.submit(staged("a", "b", fail_in="b"))
+    wait(job)
+    assert job.state == FAILED
+    assert job.error == "RuntimeError: boom"
+    assert job.stages_done == ["a"]
+
+def test_finished_jobs_are_evicted_beyond_keep(runner):
+    jobs = []
+    for _ in range(4):
+        jobs.append(runner.submit(staged("a")))
+        wait(jobs[-1])
+    runner.submit(staged("a"))
+    assert [runner.get(j.id) is not None for j in jobs] == [False, False, True, True]
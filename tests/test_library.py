@@ -0,0 +1,150 @@
+import sqlite3
+
+import pytest
+
+from apa_tool.apa_format import FORMATTER_VERSION, apa_reference_string
+from apa_tool.importers import year_value
+from apa_tool.library import _FTS_SCHEMA, DEFAULT_PROJECT, ReferenceLibrary, fts_query
+
+def ref(last, year, title, ref_type="Journal article", **fields):
+    return {"type": ref_type, "authors": [{"last": last, "initials": "J."}], "year": year, "title": title, **fields}
+
+@pytest.fixture
+def library(tmp_path):
+    lib = ReferenceLibrary(str(tmp_path / "lib.sqlite3"))
+    yield lib
+    lib.close()
+
+def test_stored_strings_follow_the_records(library):
+    smith = library.add(ref("Smith", "2020", "B"))
+    library.add(ref("Brown", "2021", "A"))
+    assert [r["authors"][0]["last"] for r in library.all(order="apa")] == ["Brown", "Smith"]
+    assert library.formatted() == [apa_reference_string(r) for r in library.all(order="apa")]
+    library.update(smith, ref("Smith", "2020", "Changed"))
+    assert library.formatted(order="position")[0] == apa_reference_string(library.get(smith))
+    assert [f for _, f in library.entries()] == library.formatted(order="position")
+
+def test_formatter_version_change_recomputes_stored_strings(tmp_path):
+    path = str(tmp_path / "lib.sqlite3")
+    lib = ReferenceLibrary(path)
+    ref_id = lib.add(ref("Smith", "2020", "A title"))
+    lib.close()
+
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE refs SET formatted = 'stale', author_key = 'stale'")
+        conn.execute("UPDATE meta SET value = '0' WHERE key = 'formatter_version'")
+    conn.close()
+
+    lib = ReferenceLibrary(path)
+    assert lib.formatted() == [apa_reference_string(lib.get(ref_id))]
+    assert lib.count("stale") == 0
+    lib.close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT value FROM meta WHERE key = 'formatter_version'").fetchone()[0] == str(FORMATTER_VERSION)
+    conn.close()
+
+def test_suffixed_year_survives_an_edit(library):
+    # The editor shows str(record["year"]) and stores year_value(field).
+    ref_id = library.add(ref("Smith", year_value("2020a"), "A title"))
+    for _ in range(2):
+        record = library.get(ref_id)
+        library.update(ref_id, {**record, "year": year_value(str(record["year"]))})
+    assert library.get(ref_id)["year"] == "2020a"
+    assert "(2020a)" in library.formatted()[0]
+    assert [year_value(y) for y in ("2020", "n.d.", "")] == [2020, "n.d.", "n.d."]
+
+def test_pages_cover_the_matches_once_in_order(library):
+    ids = [library.add(ref("Author", "2020", f"Title {i}")) for i in range(7)]
+    library.add(ref("Other", "2020", "A book", ref_type="Book"))
+    pages = [library.search(ref_type="Journal article", limit=3, offset=offset) for offset in (0, 3, 6)]
+    assert [[ref_id for ref_id, _ in page] for page in pages] == [ids[:3], ids[3:6], ids[6:]]
+    assert library.count(ref_type="Journal article") == 7
+    assert library.count("title") == 7 and len(library) == 8
+    assert library.search("title", limit=3, offset=9) == []
+
+def test_ids_are_never_reused(library):
+    first = library.add(ref("A", "2000", "a"))
+    last = library.add(ref("B", "2000", "b"))
+    library.delete(last)
+    assert library.get(last) is None
+    assert library.add(ref("C", "2000", "c")) > last
+    assert library.get(first)["title"] == "a"
+
+def test_insert_after_and_duplicate_keep_list_order(library):
+    a = library.add(ref("A", "2000", "a"))
+    c = library.add(ref("C", "2000", "c"))
+    library.insert_after(a, ref("B", "2000", "b"))
+    copy_id = library.duplicate(c)
+    assert [r["title"] for r in library.all()] == ["a", "b", "c", "c"]
+    assert library.get(copy_id) == library.get(c)
+    assert library.formatted(order="position")[-1] == library.formatted(order="position")[-2]
+    assert library.duplicate(10_000) is None
+
+def test_fts_prefix_search_needs_every_word(library):
+    smith = library.add(ref("Smith", "2020", "Learning outcomes"))
+    library.add(ref("Smithers", "2019", "Study design"))
+    library.add(ref("Müller", "2018", "Learning models"))
+    assert fts_query("smi 2020") == '"smi"* "2020"*'
+    assert [i for i, _ in library.search("smi 2020")] == [smith]
+    assert library.count("smi") == 2
+    assert library.count("muller") == 1  # diacritics folded by the FTS tokenizer
+    assert library.count("learn", ref_type="Book") == 0
+
+def test_failed_import_rolls_back_and_replace_drops_old_records(library):
+    keep = library.add(ref("Smith", "2020", "Kept"))
+    before = library.max_id()
+    library.add_many([ref("Lee", "2001", "One"), ref("Kim", "2002", "Two")])
+    library.delete_ids(above=before)
+    assert [i for i, _ in library.search()] == [keep]
+
+    before = library.max_id()
+    library.add_many([ref("Lee", "2001", "One")])
+    library.delete_ids(upto=before)
+    assert [r["title"] for r in library.all()] == ["One"]
+    assert library.max_id() > before  # ids are never reused
+
+def test_projects_are_isolated(tmp_path):
+    path = str(tmp_path / "lib.sqlite3")
+    base = ReferenceLibrary(path)
+    mine, theirs = base.scoped("mine"), base.scoped("theirs")
+    mine_id = mine.add(ref("Smith", "2020", "Mine"))
+    theirs_id = theirs.add(ref("Smith", "2020", "Theirs"))
+    before = theirs.max_id()
+    mine.add_many([ref("Lee", "2001", "Imported")])
+
+    theirs.delete_ids(upto=before)  # "Replace library" in the other project
+    theirs.delete(mine_id)
+    theirs.update(mine_id, ref("X", "1999", "Overwritten"))
+    assert theirs.duplicate(mine_id) is None
+    assert theirs.get(mine_id) is None
+    assert [r["title"] for r in mine.all()] == ["Mine", "Imported"]
+    assert mine.count("smith") == 1
+
+    mine.clear()  # "New project"
+    assert len(mine) == 0
+    assert theirs.get(theirs_id) is None  # removed by its own replace above
+    theirs.add(ref("Kim", "2002", "Still here"))
+    mine.clear()
+    assert [r["title"] for r in theirs.all()] == ["Still here"]
+    base.close()
+
+def test_library_from_before_projects_is_migrated(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.executescript(
+            "CREATE TABLE refs (id INTEGER PRIMARY KEY AUTOINCREMENT, position REAL NOT NULL, type TEXT NOT NULL,"
+            " author_key TEXT NOT NULL, year TEXT NOT NULL, formatted TEXT NOT NULL, data TEXT NOT NULL);"
+            "CREATE INDEX refs_position ON refs (position);" + _FTS_SCHEMA +
+            "INSERT INTO refs (position, type, author_key, year, formatted, data)"
+            " VALUES (1, 'Book', 'smith', '2020', 'Smith, J. (2020).', '{\"type\": \"Book\", \"title\": \"Old\"}');"
+        )
+    conn.close()
+
+    lib = ReferenceLibrary(path)
+    assert lib.project == DEFAULT_PROJECT
+    assert [r["title"] for r in lib.all()] == ["Old"]
+    assert lib.count("old") == 1
+    assert lib.scoped("other").all() == []
+    lib.close()
@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+from apa_tool.checker import iter_citations
+from apa_tool.matching import bounded_edit_distance, fold_surname, soundex, suggest_matches
+from apa_tool.report import build_report
+
+def test_fold_and_soundex():
+    assert fold_surname("Müller-Lyer") == "mullerlyer"
+    assert fold_surname("O’Brien") == "obrien"
+    assert soundex("robert") == soundex("rupert") == "R163"
+    assert soundex("smith") == soundex("smtih") == "S530"
+    assert soundex("") == ""
+
+def test_osa_distance_counts_a_swap_as_one_edit():
+    assert bounded_edit_distance("smith", "smtih", 2) == 1
+    assert bounded_edit_distance("smith", "smyth", 2) == 1
+    assert bounded_edit_distance("smith", "johnson", 2) is None
+
+def test_suggestions_rank_typos_suffixes_and_wrong_years():
+    refs = [("smith", "2020"), ("muller", "2018"), ("lee", "2015a")]
+    cited = [("smtih", "2020"), ("mueller", "2018"), ("lee", "2015"), ("smith", "2021"), ("zhang", "2001")]
+    pairs = {(s["cited"], s["reference"]): s["score"] for s in suggest_matches(cited, refs)}
+    assert set(pairs) == {
+        (("smtih", "2020"), ("smith", "2020")),
+        (("mueller", "2018"), ("muller", "2018")),
+        (("lee", "2015"), ("lee", "2015a")),
+        (("smith", "2021"), ("smith", "2020")),
+    }
+    assert pairs[(("lee", "2015"), ("lee", "2015a"))] == 0.95
+    assert pairs[(("smith", "2021"), ("smith", "2020"))] == 0.8
+
+def test_typo_is_matched_to_a_reference_that_is_also_cited_correctly():
+    paragraphs = [SimpleNamespace(text="Smith (2020) and later Smtih (2020) agree.")]
+    report = build_report(list(iter_citations(paragraphs)), [{"entry": "Smith, J. (2020).", "key": ("smith", "2020")}])
+    assert report["cited_not_in_refs"] == [("smtih", "2020")]
+    assert report["refs_not_cited"] == []
+    assert [(s["cited"], s["reference"]) for s in report["suggestions"]] == [(("smtih", "2020"), ("smith", "2020"))]
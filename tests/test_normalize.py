@@ -0,0 +1,47 @@
+import unicodedata
+
+import pytest
+
+from apa_tool import normalize
+from apa_tool.normalize import author_key, fold, name_words
+
+def test_fold_drops_marks_apostrophes_and_case():
+    assert fold("Müller") == fold(unicodedata.normalize("NFD", "Müller")) == "muller"
+    assert fold("O’Brien") == fold("O'Brien") == fold("OʼBrien") == "obrien"
+    assert fold("Smith–Jones") == fold("Smith‐Jones") == "smith-jones"
+    assert fold("STRASSE") == fold("Straße") == "strasse"
+    assert fold(None) == ""
+
+def test_name_words():
+    assert name_words("Smith-Jones, J.") == ["smith-jones", "j"]
+    assert name_words("Lee 2019") == ["lee"]
+
+@pytest.mark.parametrize(
+    "written, key",
+    [
+        ("Müller", "muller"),
+        ("Müller et al.", "muller"),
+        (unicodedata.normalize("NFD", "Müller, K."), "muller"),
+        ("O’Brien, P.", "obrien"),
+        ("van Dijk", "dijk"),
+        ("Van Dijk, J. A.", "dijk"),
+        ("de la Cruz", "cruz"),
+        ("Van", "van"),  # a particle alone is the surname
+        ("Smith–Jones, A.", "smith-jones"),
+        ("Smith & Lee", "smith"),
+        ("", "unknown"),
+        (None, "unknown"),
+        ("1999", "unknown"),
+    ],
+)
+def test_author_key(written, key):
+    assert author_key(written) == key
+
+def test_author_key_memo_interns_and_stays_bounded(monkeypatch):
+    monkeypatch.setattr(normalize, "MEMO_SIZE", 3)
+    monkeypatch.setattr(normalize, "_author_keys", normalize._AuthorKeys())
+    first = author_key("Müller")
+    assert author_key("MÜLLER") is first
+    for name in ("A", "B", "C", "D"):
+        author_key(name)
+    assert len(normalize._author_keys) <= 3
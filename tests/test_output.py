@@ -0,0 +1,37 @@
+import io
+import zipfile
+
+from docx import Document
+
+from apa_tool.output import human_size, save_docx_spooled, spooled_reader, spooled_size, zip_files_spooled
+
+def test_spooled_docx_round_trips_and_moves_to_disk_when_large():
+    doc = Document()
+    doc.add_paragraph("Hello")
+    small = save_docx_spooled(doc)
+    assert not small._rolled
+    assert Document(io.BytesIO(spooled_reader(small)())).paragraphs[0].text == "Hello"
+
+    big = save_docx_spooled(doc, max_memory=1024)
+    assert big._rolled
+    big.seek(10)
+    assert spooled_size(big) == len(spooled_reader(big)())
+    big.seek(10)
+    spooled_size(big)
+    assert big.tell() == 10
+
+def test_human_size():
+    assert [human_size(n) for n in (200, 48 * 1024, 3 * 1024 * 1024 + 100 * 1024)] == ["1 KB", "48 KB", "3.1 MB"]
+
+def test_reader_rereads_from_the_start(tmp_path):
+    paths = []
+    for name in ("a.docx", "b.docx"):
+        path = tmp_path / name
+        path.write_bytes(name.encode())
+        paths.append((str(path), name))
+    read = spooled_reader(zip_files_spooled(paths))
+    assert read() == read()
+    with zipfile.ZipFile(io.BytesIO(read())) as zf:
+        assert zf.namelist() == ["a.docx", "b.docx"]
+        assert zf.read("b.docx") == b"b.docx"
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in zf.infolist())
@@ -0,0 +1,26 @@
+import os
+import pkgutil
+import subprocess
+import sys
+
+import pytest
+
+import apa_tool
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = sorted(m.name for m in pkgutil.iter_modules(apa_tool.__path__) if not m.name.startswith("_"))
+
+# Only the passes that edit documents need python-docx.
+DOCX_MODULES = {"formatting", "index"}
+
+def modules_loaded_by(module):
+    code = f"import sys, apa_tool.{module}; print(' '.join(sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return {name.split(".")[0] for name in out.stdout.split()}
+
+@pytest.mark.parametrize("module", MODULES)
+def test_engine_modules_stay_light(module):
+    loaded = modules_loaded_by(module)
+    assert "streamlit" not in loaded
+    if module not in DOCX_MODULES:
+        assert "docx" not in loaded
@@ -0,0 +1,63 @@
+import io
+
+from docx import Document
+
+from apa_tool.pipeline import build_formatted_docx, build_stages, format_document, format_stages
+from apa_tool.rescan import ScanMemo
+from apa_tool.timing import StageTimer
+
+class FakeLibrary:
+    """The two ReferenceLibrary reads build_formatted_docx makes."""
+
+    def __init__(self, records):
+        from apa_tool.apa_format import apa_reference_string
+
+        self.records = [(r, apa_reference_string(r)) for r in records]
+
+    def entries(self, order="position"):
+        return list(self.records)
+
+    def formatted(self, order="position"):
+        return [f for _, f in self.records]
+
+SMITH = {"type": "Book", "authors": [{"last": "Smith", "initials": "J.", "suffix": ""}], "year": 2020,
+         "title": "A book", "publisher": "Press"}
+
+def paper():
+    doc = Document()
+    doc.add_paragraph("As Smith (2020) and Lee (2019) argued.")
+    doc.add_paragraph("References")
+    doc.add_paragraph("Smith, J. (2020). A book. Press.")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def announced_stages_run(timer, announced):
+    """The announced stages a run timed, in order (it may time others too)."""
+    return [r["stage"] for r in timer.records if r["stage"] in announced]
+
+def test_format_document_times_the_stages_it_announces():
+    timer = StageTimer()
+    result = format_document(paper(), check=True, timer=timer)
+    announced = format_stages(check=True)
+    assert announced_stages_run(timer, announced) == announced
+    assert result["report"]["cited_not_in_refs"] == [("lee", "2019")]
+
+def test_build_times_the_stages_it_announces_and_rebuilds_references():
+    timer = StageTimer()
+    memo = ScanMemo()
+    result = build_formatted_docx(paper(), FakeLibrary([SMITH]), "Times New Roman 12", memo=memo, timer=timer)
+    announced = build_stages()
+    assert announced_stages_run(timer, announced) == announced
+    assert result["report"]["cited_not_in_refs"] == [("lee", "2019")]
+    assert (memo.scanned, memo.reused) == (3, 0)
+
+    texts = [p.text for p in Document(result["output"]).paragraphs]
+    assert texts[texts.index("References") + 1 :] == ["Smith, J. (2020). A book. Press."]
+
+def test_build_without_references_or_checks():
+    timer = StageTimer()
+    result = build_formatted_docx(paper(), None, "Arial 11", refs=False, pagenum=False, timer=timer)
+    announced = build_stages(pagenum=False, refs=False)
+    assert announced_stages_run(timer, announced) == announced
+    assert result["report"] is None and result["parsed"] is None
@@ -0,0 +1,141 @@
+import io
+import zipfile
+
+from docx import Document
+from docx.oxml import parse_xml
+
+from apa_tool.index import DocumentIndex
+from apa_tool.reader import (
+    BODY,
+    ENDNOTE,
+    FOOTER,
+    FOOTNOTE,
+    HEADER,
+    TABLE,
+    TEXTBOX,
+    StreamParagraph,
+    iter_paragraphs,
+)
+
+HYPERLINK = (
+    '<w:hyperlink xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+    "<w:r><w:t>linked text</w:t></w:r></w:hyperlink>"
+)
+
+W_NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+CT = "application/vnd.openxmlformats-officedocument.wordprocessingml."
+
+# A text box as Word writes it: the DrawingML shape, with a VML copy in mc:Fallback.
+TEXT_BOX = (
+    '<mc:AlternateContent xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006">'
+    '<mc:Choice Requires="wps"><w:drawing>'
+    '<wps:wsp xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape"><wps:txbx>'
+    "<w:txbxContent><w:p><w:r><w:t>Text box cites (Box, 2015).</w:t></w:r></w:p></w:txbxContent>"
+    "</wps:txbx></wps:wsp></w:drawing></mc:Choice>"
+    '<mc:Fallback><w:pict><v:shape xmlns:v="urn:schemas-microsoft-com:vml"><v:textbox>'
+    "<w:txbxContent><w:p><w:r><w:t>Text box cites (Box, 2015).</w:t></w:r></w:p></w:txbxContent>"
+    "</v:textbox></v:shape></w:pict></mc:Fallback></mc:AlternateContent>"
+)
+
+def body_docx():
+    doc = Document()
+    doc.add_heading("A heading", level=1)
+    p = doc.add_paragraph("Tab\there, ")
+    p.add_run("a break").add_break()
+    p.add_run("and more (Smith, 2020).")
+    doc.add_paragraph("")
+    doc.add_paragraph("See ")._p.append(parse_xml(HYPERLINK))
+    doc.add_paragraph("References", style="Heading 1")
+    doc.add_paragraph("Smith, J. (2020). A title. Publisher.")
+    buf = io.BytesIO()
+    doc.save(buf)
+    return buf.getvalue()
+
+def test_text_and_style_match_python_docx():
+    data = body_docx()
+    expected = [(p.text, p._p.style) for p in Document(io.BytesIO(data)).paragraphs]
+    assert [(p.text, p.style_id) for p in iter_paragraphs(data)] == expected
+    assert ("See linked text", None) in expected
+
+def test_reader_accepts_bytes_paths_and_file_objects(tmp_path):
+    data = body_docx()
+    path = tmp_path / "paper.docx"
+    path.write_bytes(data)
+    expected = list(iter_paragraphs(data))
+    assert list(iter_paragraphs(str(path))) == expected
+    assert list(iter_paragraphs(io.BytesIO(data))) == expected
+
+def notes_part(kind):
+    return (
+        f"<w:{kind}s {W_NS}>"
+        f'<w:{kind} w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:{kind}>'
+        f'<w:{kind} w:id="1"><w:p><w:r><w:t>{kind.title()} cites Note (2011).</w:t></w:r></w:p></w:{kind}>'
+        f"</w:{kind}s>"
+    ).encode()
+
+def multi_story_docx():
+    """A paper with a table, a text box, a content control, header, footer, footnotes and endnotes."""
+    doc = Document()
+    doc.add_paragraph("Intro cites Smith (2019).")
+    doc.add_table(rows=1, cols=2).rows[0].cells[0].text = "Table cell cites (Jones, 2020)."
+    doc.add_paragraph("Anchor TEXTBOX")
+    doc.add_paragraph("References")
+    doc.add_paragraph("Smith, J. (2019). A title. Publisher.")
+    doc.sections[0].header.paragraphs[0].text = "Header text."
+    doc.sections[0].footer.paragraphs[0].text = "Footer text."
+    buf = io.BytesIO()
+    doc.save(buf)
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(buf) as zin, zipfile.ZipFile(out, "w") as zout:
+        for item in zin.infolist():
+            data = zin.read(item.filename)
+            if item.filename == "word/document.xml":
+                data = data.decode()
+                data = data.replace("<w:t>Anchor TEXTBOX</w:t></w:r>", f"<w:t>Anchor</w:t></w:r><w:r>{TEXT_BOX}</w:r>")
+                sdt = "<w:sdt><w:sdtContent><w:p><w:r><w:t>Content control.</w:t></w:r></w:p></w:sdtContent></w:sdt>"
+                data = data.replace("<w:body>", "<w:body>" + sdt, 1)
+            elif item.filename == "word/_rels/document.xml.rels":
+                data = data.decode().replace(
+                    "</Relationships>",
+                    f'<Relationship Id="rIdFn" Type="{REL}footnotes" Target="footnotes.xml"/>'
+                    f'<Relationship Id="rIdEn" Type="{REL}endnotes" Target="endnotes.xml"/></Relationships>',
+                )
+            elif item.filename == "[Content_Types].xml":
+                data = data.decode().replace(
+                    "</Types>",
+                    f'<Override PartName="/word/footnotes.xml" ContentType="{CT}footnotes+xml"/>'
+                    f'<Override PartName="/word/endnotes.xml" ContentType="{CT}endnotes+xml"/></Types>',
+                )
+            zout.writestr(item, data)
+        zout.writestr("word/footnotes.xml", notes_part("footnote"))
+        zout.writestr("word/endnotes.xml", notes_part("endnote"))
+    return out.getvalue()
+
+def test_every_story_is_read_once_in_order():
+    paragraphs = list(iter_paragraphs(multi_story_docx()))
+    assert [(p.text, p.story) for p in paragraphs if p.text] == [
+        ("Content control.", BODY),
+        ("Intro cites Smith (2019).", BODY),
+        ("Table cell cites (Jones, 2020).", TABLE),
+        ("Text box cites (Box, 2015).", TEXTBOX),
+        ("Anchor", BODY),
+        ("References", BODY),
+        ("Smith, J. (2019). A title. Publisher.", BODY),
+        ("Header text.", HEADER),
+        ("Footer text.", FOOTER),
+        ("Footnote cites Note (2011).", FOOTNOTE),
+        ("Endnote cites Note (2011).", ENDNOTE),
+    ]
+    assert all(isinstance(p, StreamParagraph) for p in paragraphs)
+
+def test_document_index_agrees_with_the_stream_reader():
+    data = multi_story_docx()
+    streamed = list(iter_paragraphs(data))
+    index = DocumentIndex(Document(io.BytesIO(data)))
+    assert index.paragraphs == streamed
+    assert index.body_end == sum(p.story in (BODY, TABLE, TEXTBOX) for p in streamed)
+    assert len(index.elements) == index.body_end
+    assert [e.text for e in index.elements] == [p.text for p in streamed[: index.body_end]]
+    assert streamed[index.references_idx].text == "References"
@@ -0,0 +1,69 @@
+import csv
+import io
+from types import SimpleNamespace
+
+from apa_tool.checker import iter_citations
+from apa_tool.report import (
+    ISSUE_FIELDS,
+    citation_context,
+    index_citations,
+    issues_csv,
+    iter_occurrences,
+    occurrence_paragraphs,
+    occurrence_rows,
+)
+
+def paras(*texts):
+    return [SimpleNamespace(text=t, story="body") for t in texts]
+
+PAPER = paras(
+    "Smith (2020) opened the field.",
+    "No citations here.",
+    "Later work (Smith, 2020) agreed with Lee (2019), and Smith (2020) said so again.",
+)
+
+def test_index_citations_keeps_every_occurrence_in_order():
+    occurrences = index_citations(iter_citations(PAPER))
+    smith = occurrences[("smith", "2020")]
+    assert [p for p, _, _ in iter_occurrences(smith)] == [0, 2, 2]
+    assert occurrence_paragraphs(smith) == [0, 2]
+    p, start, end = list(iter_occurrences(smith))[-1]
+    assert PAPER[p].text[start:end] == "Smith (2020)"
+    assert list(iter_occurrences(occurrences[("lee", "2019")]))[0][0] == 2
+
+def test_citation_context_cuts_at_word_boundaries():
+    text = "word " * 30 + "(Lee, 2019)" + " more" * 30
+    start = text.index("(Lee")
+    before, cited, after = citation_context(text, start, start + len("(Lee, 2019)"), width=20)
+    assert cited == "(Lee, 2019)"
+    assert before.startswith("…") and before.endswith("word ")
+    assert after.endswith("…") and after.startswith(" more")
+    assert len(before) <= 21 and len(after) <= 21
+    assert citation_context("See (Lee, 2019).", 4, 15) == ("See ", "(Lee, 2019)", ".")
+
+def test_occurrence_rows_are_numbered_from_one_and_limited():
+    occurrences = index_citations(iter_citations(PAPER))
+    rows = occurrence_rows(occurrences, PAPER, ("smith", "2020"))
+    assert [(r["Paragraph"], r["Citation"]) for r in rows] == [(1, "Smith (2020)"), (3, "(Smith, 2020)"), (3, "Smith (2020)")]
+    assert rows[0]["Before"] == "" and rows[0]["After"] == " opened the field."
+    assert len(occurrence_rows(occurrences, PAPER, ("smith", "2020"), limit=1)) == 1
+    assert occurrence_rows(occurrences, PAPER, ("nobody", "2000")) == []
+
+def test_issues_csv_has_a_row_per_problem():
+    results = [
+        {"file": "/tmp/in/a.docx", "name": "Müller.docx", "cited_not_in_refs": [("lee", "2019")],
+         "refs_not_cited": [("kim", "2001")], "suggestions": [{"cited": ["lee", "2019"], "reference": ["lee", "2018"]}]},
+        {"file": "/tmp/in/b.docx", "references_found": False},
+        {"file": "/tmp/in/c.docx", "name": "c.docx", "error": "ValueError: bad"},
+        {"file": "/tmp/in/d.docx", "name": "d.docx", "cited_not_in_refs": [], "refs_not_cited": []},
+    ]
+    data = issues_csv(results)
+    assert data.startswith("\ufeff".encode("utf-8"))
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+    assert list(rows[0]) == ISSUE_FIELDS
+    assert [(r["File"], r["Issue"], r["Author"], r["Year"], r["Detail"]) for r in rows] == [
+        ("Müller.docx", "cited, not in References", "lee", "2019", "did you mean lee (2018)?"),
+        ("Müller.docx", "in References, not cited", "kim", "2001", ""),
+        ("/tmp/in/b.docx", "no References heading", "", "", ""),
+        ("c.docx", "could not be processed", "", "", "ValueError: bad"),
+    ]
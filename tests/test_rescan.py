@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from apa_tool.checker import extract_reference_keys, iter_citations
+from apa_tool.rescan import ScanMemo
+
+def paras(*texts):
+    return [SimpleNamespace(text=t) for t in texts]
+
+DRAFT = [
+    "Introduction",
+    "As Smith (2020) argued, others agree (Lee & Kim, 2019a).",
+    "",
+    "Repeated text (Brown, 2018).",
+    "Repeated text (Brown, 2018).",
+    "No citations here.",
+]
+ENTRIES = [
+    "Brown, A. (2018). A book. Publisher.",
+    "Lee, J., & Kim, S. (2019a). An article. Journal, 1(2), 3–4.",
+    "Smith, J. (2020). Another article. Journal, 5, 6–7.",
+]
+
+def test_rescan_after_an_edit_matches_a_fresh_scan():
+    memo = ScanMemo()
+    assert memo.citations(paras(*DRAFT)) == tuple(iter_citations(paras(*DRAFT)))
+    assert memo.reference_keys(ENTRIES) == extract_reference_keys(ENTRIES)
+
+    # Edit one paragraph, insert another (shifting indexes) and drop one.
+    revised = list(DRAFT)
+    revised[1] = "As Smith (2021) argued, others agree (Lee & Kim, 2019a)."
+    revised.insert(2, "A new paragraph citing Jones et al. (2017).")
+    del revised[5]
+    assert memo.citations(paras(*revised)) == tuple(iter_citations(paras(*revised)))
+    assert (memo.scanned, memo.reused) == (2, 3)
+
+    entries = ENTRIES[:2] + ["Smith, J. (2021). Another article. Journal, 5, 6–7.", "Jones, P. (2017). New. Press."]
+    assert memo.reference_keys(entries) == extract_reference_keys(entries)
+    assert (memo.refs_parsed, memo.refs_reused) == (2, 2)
+
+def test_memo_only_keeps_the_last_scan():
+    memo = ScanMemo()
+    memo.citations(paras("Old (Brown, 2018)."))
+    memo.citations(paras("New (Lee, 2019)."))
+    assert memo.citations(paras("Old (Brown, 2018).")) == tuple(iter_citations(paras("Old (Brown, 2018).")))
+    assert (memo.scanned, memo.reused) == (1, 0)
+
+def test_copy_scans_independently():
+    memo = ScanMemo()
+    memo.citations(paras(*DRAFT))
+    job_memo = memo.copy()
+    job_memo.citations(paras("Something else (Kim, 2001)."))
+    assert memo.citations(paras(*DRAFT)) == tuple(iter_citations(paras(*DRAFT)))
+    assert memo.scanned == 0
@@ -0,0 +1,58 @@
+import threading
+import tracemalloc
+
+from apa_tool.timing import StageTimer, timed
+
+def test_stages_are_recorded_in_order():
+    timer = StageTimer(run="t")
+    with timed(timer, "first"):
+        pass
+    timer.note("cache hit", entries=3)
+    with timed(timer, "second"):
+        pass
+    assert [r["stage"] for r in timer.records] == ["first", "cache hit", "second"]
+    assert timer.records[1]["entries"] == 3
+    assert all(r["peak_kib"] is None for r in timer.records)
+    with timed(None, "no timer"):
+        pass
+
+def test_traced_stage_measures_its_own_allocations():
+    timer = StageTimer(trace_memory=True)
+    with timer.stage("allocate"):
+        block = bytearray(512 * 1024)
+    del block
+    assert timer.records[0]["peak_kib"] >= 512
+    assert not tracemalloc.is_tracing()
+
+def test_only_one_stage_traces_at_a_time():
+    outer_timer, inner_timer = StageTimer(trace_memory=True), StageTimer(trace_memory=True)
+    entered, release = threading.Event(), threading.Event()
+
+    def other_job():
+        with inner_timer.stage("concurrent"):
+            entered.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=other_job)
+    worker.start()
+    entered.wait(5)
+    with outer_timer.stage("while another traces"):
+        block = bytearray(256 * 1024)
+    release.set()
+    worker.join()
+    del block
+
+    assert outer_timer.records[0]["peak_kib"] is None
+    assert inner_timer.records[0]["peak_kib"] >= 256
+    assert not tracemalloc.is_tracing()
+
+def test_outside_tracing_is_left_alone():
+    tracemalloc.start()
+    try:
+        timer = StageTimer(trace_memory=True)
+        with timer.stage("nested"):
+            pass
+        assert tracemalloc.is_tracing()
+        assert timer.records[0]["peak_kib"] is None
+    finally:
+        tracemalloc.stop()